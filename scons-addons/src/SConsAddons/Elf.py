@@ -0,0 +1,305 @@
+"""
+Reading of ELF shared libraries and ar archives of ELF objects.
+
+Used to validate library candidates with a few file reads instead of a link
+test: the ELF class and machine tell whether a library can be linked into the
+target architecture, and the dynamic symbol table (or the symbol index of an
+archive) whether it defines a symbol.  Anything that can not be read (linker
+scripts, thin archives, other object formats) is reported as unknown so the
+caller can fall back to a real link test.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, re, struct, glob
+import SCons.Util
+from Util import GetArch
+
+ELF_MAGIC = "\x7fELF"
+AR_MAGIC = "!<arch>\n"
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+SHT_SYMTAB = 2
+SHT_DYNSYM = 11
+SHN_UNDEF = 0
+STB_LOCAL = 0
+
+# Target arch -> (ELF class, ELF machine)
+archMachines = {"ia32":(ELFCLASS32, 3),      # EM_386
+                "x64":(ELFCLASS64, 62),      # EM_X86_64
+                "ia64":(ELFCLASS64, 50),     # EM_IA_64
+                "ppc":(ELFCLASS32, 20),      # EM_PPC
+                "ppc64":(ELFCLASS64, 21)}    # EM_PPC64
+
+# Compilers that build for the host unless they are prefixed with the triplet of another target
+hostCompilers = ["gcc", "g++", "cc", "c++", "clang", "clang++", "icc", "icpc"]
+
+# First part of a GNU target triplet -> arch
+tripletArchs = {"i386":"ia32", "i486":"ia32", "i586":"ia32", "i686":"ia32",
+                "x86_64":"x64", "amd64":"x64", "ia64":"ia64",
+                "powerpc":"ppc", "ppc":"ppc", "powerpc64":"ppc64", "ppc64":"ppc64"}
+
+compiler_re = re.compile(r'^(?:(.+)-)?(%s)(?:-[\d.]+)?$' %
+                         "|".join([re.escape(c) for c in hostCompilers]))
+
+# Directories the linker searches without being told
+systemLibDirs = ['/lib', '/usr/lib', '/lib64', '/usr/lib64', '/usr/local/lib', '/usr/local/lib64',
+                 '/lib32', '/usr/lib32']
+
+_info_cache = {}      # (path, mtime, size) -> LibraryInfo or None
+
+
+class ElfError(Exception):
+   pass
+
+
+class LibraryInfo(object):
+   """ What is known about a library file: ELF class, machine and defined symbols. """
+   def __init__(self, path, elfClass, machine, symbols):
+      self.path = path
+      self.elfClass = elfClass
+      self.machine = machine
+      self.symbols = symbols       # dict of defined global symbol names
+
+   def matchesArch(self, arch):
+      """ Return false if the library can not be linked into arch.  Unknown archs match. """
+      wanted = archMachines.get(arch)
+      if wanted is None:
+         return True
+      return (self.elfClass, self.machine) == wanted
+
+   def hasSymbol(self, symbol):
+      return self.symbols.has_key(symbol)
+
+
+def _readElfHeader(fh, base=0):
+   """ Return (elf class, byte order prefix, header fields) of the ELF object at base. """
+   fh.seek(base)
+   ident = fh.read(16)
+   if len(ident) < 16 or ident[:4] != ELF_MAGIC:
+      raise ElfError("not an ELF file")
+   elf_class = ord(ident[4])
+   order = {1:"<", 2:">"}.get(ord(ident[5]))
+   if order is None or elf_class not in (ELFCLASS32, ELFCLASS64):
+      raise ElfError("unsupported ELF encoding")
+   if ELFCLASS32 == elf_class:
+      fmt = order + "HHIIIIIHHHHHH"
+   else:
+      fmt = order + "HHIQQQIHHHHHH"
+   data = fh.read(struct.calcsize(fmt))
+   if len(data) < struct.calcsize(fmt):
+      raise ElfError("truncated ELF header")
+   return (elf_class, order, struct.unpack(fmt, data))
+
+def _readElfSymbols(fh, elf_class, order, header):
+   """ Return dict of the defined global symbols of an ELF shared object. """
+   (e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags, e_ehsize,
+    e_phentsize, e_phnum, e_shentsize, e_shnum, e_shstrndx) = header
+   if ELFCLASS32 == elf_class:
+      sh_fmt = order + "IIIIIIIIII"
+      sym_fmt = order + "IIIBBH"
+   else:
+      sh_fmt = order + "IIQQQQIIQQ"
+      sym_fmt = order + "IBBHQQ"
+   sh_size = struct.calcsize(sh_fmt)
+   sections = []
+   for i in range(e_shnum):
+      fh.seek(e_shoff + i * e_shentsize)
+      data = fh.read(sh_size)
+      if len(data) < sh_size:
+         raise ElfError("truncated section header")
+      sections.append(struct.unpack(sh_fmt, data))
+
+   # Exported symbols are in .dynsym.  Only use .symtab if there is no .dynsym.
+   tables = [s for s in sections if SHT_DYNSYM == s[1]] or [s for s in sections if SHT_SYMTAB == s[1]]
+   symbols = {}
+   sym_size = struct.calcsize(sym_fmt)
+   for s in tables:
+      (offset, size, link) = (s[4], s[5], s[6])
+      if link >= len(sections):
+         continue
+      fh.seek(sections[link][4])
+      strtab = fh.read(sections[link][5])
+      fh.seek(offset)
+      data = fh.read(size)
+      for pos in range(0, len(data) - sym_size + 1, sym_size):
+         sym = struct.unpack(sym_fmt, data[pos:pos + sym_size])
+         if ELFCLASS32 == elf_class:
+            (st_name, st_info, st_shndx) = (sym[0], sym[3], sym[5])
+         else:
+            (st_name, st_info, st_shndx) = (sym[0], sym[1], sym[3])
+         if SHN_UNDEF == st_shndx or STB_LOCAL == (st_info >> 4):
+            continue
+         end = strtab.find("\0", st_name)
+         if end < 0:
+            end = len(strtab)
+         symbols[strtab[st_name:end]] = True
+   return symbols
+
+def _readArchive(fh):
+   """ Return (elf class, machine, symbols) of an ar archive of ELF objects. """
+   symbols = {}
+   elf = None
+   pos = len(AR_MAGIC)
+   fh.seek(0, 2)
+   file_size = fh.tell()
+   while pos + 60 <= file_size and (elf is None or not symbols):
+      fh.seek(pos)
+      hdr = fh.read(60)
+      if len(hdr) < 60 or hdr[58:60] != "`\n":
+         raise ElfError("bad archive member header")
+      name = hdr[:16].strip()
+      size = int(hdr[48:58].strip())
+      data_pos = pos + 60
+      if name in ("/", "/SYM64/"):
+         # GNU symbol index: count, member offsets, then the names
+         if "/" == name:
+            (width, fmt) = (4, ">I")
+         else:
+            (width, fmt) = (8, ">Q")
+         data = fh.read(size)
+         count = struct.unpack(fmt, data[:width])[0]
+         names = data[width + count * width:].split("\0")
+         for n in names[:count]:
+            symbols[n] = True
+      elif name not in ("//", "__.SYMDEF", "__.SYMDEF SORTED") and elf is None:
+         (elf_class, order, header) = _readElfHeader(fh, data_pos)
+         elf = (elf_class, header[1])
+      pos = data_pos + size + (size % 2)
+   if elf is None:
+      raise ElfError("archive has no ELF members")
+   return (elf[0], elf[1], symbols)
+
+def readLibrary(path):
+   """ Return LibraryInfo for the library file at path or None if it can not be read. """
+   try:
+      st = os.stat(path)
+   except OSError:
+      return None
+   key = (path, st.st_mtime, st.st_size)
+   if _info_cache.has_key(key):
+      return _info_cache[key]
+
+   info = None
+   try:
+      fh = open(path, "rb")
+      try:
+         magic = fh.read(8)
+         if magic == AR_MAGIC:
+            (elf_class, machine, symbols) = _readArchive(fh)
+            info = LibraryInfo(path, elf_class, machine, symbols)
+         elif magic[:4] == ELF_MAGIC:
+            (elf_class, order, header) = _readElfHeader(fh)
+            info = LibraryInfo(path, elf_class, header[1],
+                               _readElfSymbols(fh, elf_class, order, header))
+      finally:
+         fh.close()
+   except (IOError, ElfError, struct.error, ValueError, OverflowError, MemoryError):
+      info = None
+   _info_cache[key] = info
+   return info
+
+def getCompilerArch(cc):
+   """ Return the arch of the host if the compiler command cc builds for the host, otherwise
+       (cross compilers, unknown compilers) None.  Compilers prefixed with a target triplet
+       build for the host if the arch of the triplet is the arch of the host.
+   """
+   if not SCons.Util.is_String(cc) or not cc.split():
+      return None
+   name = os.path.basename(cc.split()[-1]).lower()
+   if name.endswith(".exe"):
+      name = name[:-4]
+   match = compiler_re.match(name)
+   host_arch = GetArch() or None
+   if match is None or host_arch is None:
+      return None
+   if match.group(1) is not None and \
+      tripletArchs.get(match.group(1).split("-")[0]) != host_arch:
+      return None
+   return host_arch
+
+def getEnvArch(env):
+   """ Return the arch env builds for, based on the -m32/-m64 flags set by EnvironmentBuilder.
+       Returns None unless the compilers of env build for the host, the libraries of the host
+       say nothing about the ones of other targets.
+   """
+   arch = None
+   for v in ('CC', 'CXX'):
+      if env.get(v):
+         arch = getCompilerArch(env.subst(str(env[v])))
+         if arch is None:
+            return None
+   if arch is None:
+      return None
+   flags = []
+   for v in ('CCFLAGS', 'LINKFLAGS'):
+      flags.extend(SCons.Util.Split(env.get(v, [])))
+   if "-m32" in flags:
+      return {"x64":"ia32", "ppc64":"ppc"}.get(arch, arch)
+   if "-m64" in flags:
+      return {"ia32":"x64", "ppc":"ppc64"}.get(arch, arch)
+   return arch
+
+def getLibDirs(env):
+   """ Return the directories the linker of env searches for libraries. """
+   dirs = []
+   dirs.extend([env.subst(str(d)) for d in SCons.Util.Split(env.get('LIBPATH', []))])
+   dirs.extend(systemLibDirs)
+   dirs.extend(glob.glob('/usr/lib/*-linux-gnu*') + glob.glob('/lib/*-linux-gnu*'))
+   return dirs
+
+def findLibraryFiles(name, dirs):
+   """ Return the files in dirs the linker could use for -l<name>. """
+   if os.sep in name or name.endswith(".so") or name.endswith(".a"):
+      return []
+   found = []
+   seen = {}
+   for d in dirs:
+      for f in ("lib%s.so" % name, "lib%s.a" % name):
+         p = os.path.join(d, f)
+         if os.path.isfile(p) and not seen.has_key(os.path.realpath(p)):
+            seen[os.path.realpath(p)] = True
+            found.append(p)
+   return found
+
+def checkLibrary(name, dirs, arch, symbol=None):
+   """
+   Check the library name with the files in dirs.
+   Returns (result, reason).  result is False if every file the linker could use for the
+   library is for another arch or lacks symbol, True if one of them is usable and None if
+   the files could not be read.
+   """
+   files = findLibraryFiles(name, dirs)
+   infos = [readLibrary(f) for f in files]
+   if not files or None in infos:
+      return (None, None)
+   reasons = []
+   for info in infos:
+      if not info.matchesArch(arch):
+         reasons.append("%s is not for arch %s" % (info.path, arch))
+      elif symbol and not info.hasSymbol(symbol):
+         reasons.append("%s does not define %s" % (info.path, symbol))
+      else:
+         return (True, None)
+   return (False, "; ".join(reasons))
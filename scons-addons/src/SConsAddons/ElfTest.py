@@ -0,0 +1,121 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SConsAddons.Elf as Elf
+from SConsAddons.Util import GetArch, WhereIs, runCommand
+
+
+class ElfTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.host = GetArch()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_getCompilerArch(self):
+        """Test which compilers are known to build for the host"""
+        for cc in ("gcc", "/usr/bin/g++", "ccache gcc", "gcc-4.8", "clang++", "cc"):
+            assert Elf.getCompilerArch(cc) == (self.host or None), cc
+        for cc in ("arm-linux-gnueabihf-gcc", "aarch64-linux-gnu-g++", "mycc", "", None):
+            assert Elf.getCompilerArch(cc) is None, cc
+        if "x64" == self.host:
+            assert Elf.getCompilerArch("x86_64-linux-gnu-gcc-9") == "x64"
+            assert Elf.getCompilerArch("powerpc64-linux-gnu-gcc") is None
+
+    def test_getEnvArch(self):
+        """Test the arch of environments"""
+        if "x64" != self.host:
+            return
+        env = SCons.Environment.Environment(CC="gcc", CXX="g++")
+        assert Elf.getEnvArch(env) == "x64"
+        env.Append(CCFLAGS=["-m32"])
+        assert Elf.getEnvArch(env) == "ia32"
+        # Nothing is known about the target of a cross compiler
+        env = SCons.Environment.Environment(CC="arm-linux-gnueabihf-gcc", CXX="g++")
+        assert Elf.getEnvArch(env) is None
+
+    def _build(self, source):
+        """ Build libfoo.so and libfoo.a from source.  Returns false if there is no compiler. """
+        if not WhereIs("gcc") or not WhereIs("ar"):
+            return False
+        src = os.path.join(self.tmpdir, "foo.c")
+        fh = open(src, "w")
+        fh.write(source)
+        fh.close()
+        obj = os.path.join(self.tmpdir, "foo.o")
+        for argv in (["gcc", "-fPIC", "-c", "-o", obj, src],
+                     ["gcc", "-shared", "-o", os.path.join(self.tmpdir, "libfoo.so"), obj],
+                     ["ar", "rcs", os.path.join(self.tmpdir, "libfoo.a"), obj]):
+            if not runCommand(argv).succeeded():
+                return False
+        return True
+
+    def test_readLibrary(self):
+        """Test reading the arch and symbols of shared libraries and archives"""
+        if not self._build("int foo_symbol(void) { return 1; }\nstatic int hidden(void) { return 0; }\n"):
+            return
+        for f in ("libfoo.so", "libfoo.a"):
+            info = Elf.readLibrary(os.path.join(self.tmpdir, f))
+            assert info is not None, f
+            assert info.hasSymbol("foo_symbol"), f
+            assert not info.hasSymbol("hidden"), f
+            if Elf.archMachines.has_key(self.host):
+                assert info.matchesArch(self.host), f
+                other = [a for a in Elf.archMachines.keys()
+                         if Elf.archMachines[a] != Elf.archMachines[self.host]]
+                assert not info.matchesArch(other[0]), f
+
+    def test_readLibraryOther(self):
+        """Test that files that are not ELF libraries can not be read"""
+        script = os.path.join(self.tmpdir, "libbar.so")
+        fh = open(script, "w")
+        fh.write("/* GNU ld script */\nGROUP ( libbar.so.1 )\n")
+        fh.close()
+        assert Elf.readLibrary(script) is None
+        assert Elf.readLibrary(os.path.join(self.tmpdir, "nosuch.so")) is None
+
+    def test_checkLibrary(self):
+        """Test ruling out libraries by symbol"""
+        if not self._build("int foo_symbol(void) { return 1; }\n"):
+            return
+        arch = Elf.getCompilerArch("gcc")
+        dirs = [self.tmpdir]
+        assert Elf.findLibraryFiles("foo", dirs) == [os.path.join(self.tmpdir, "libfoo.so"),
+                                                   os.path.join(self.tmpdir, "libfoo.a")]
+        assert Elf.checkLibrary("foo", dirs, arch, "foo_symbol") == (True, None)
+        (result, reason) = Elf.checkLibrary("foo", dirs, arch, "other_symbol")
+        assert result is False and reason.find("other_symbol") >= 0, reason
+        assert Elf.checkLibrary("nosuch", dirs, arch) == (None, None)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ElfTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -19,11 +19,13 @@
 #
 
 import os, sys, string, copy, re
+import threading, tempfile, shutil
 import SCons.Environment
 import SCons.Platform
 import SCons
 import Options
-from Util import GetPlatform, GetArch
+from Options import CacheFile, CheckCache, ResultCache
+from Util import GetPlatform, GetArch, runCommand
 default_funcs = []
 
 class EnvironmentBuilder(object):
@@ -578,18 +580,53 @@ default_funcs.append([[], [], default_debug_define])
 
 
 # ---- Helpers ---- #
+def getCompilerIdentity(env):
+   """ Return path, modification time and version output of the C compiler of env. """
+   cc = env["CC"]
+   cc_path = env.WhereIs(cc) or cc
+   try:
+      mtime = os.path.getmtime(cc_path)
+   except OSError:
+      mtime = None
+   if 'cl' == cc:
+      # cl prints its version banner without arguments
+      version = runCommand([cc_path], mergeStderr=True).output
+   else:
+      version = runCommand([cc_path, "--version"], mergeStderr=True).output
+   return (cc_path, mtime, version)
+
+class ArchProbe(threading.Thread):
+   """ Compiles a test program with the flags of an environment built for arch. """
+   def __init__(self, arch, env):
+      threading.Thread.__init__(self)
+      self.arch = arch
+      self.passed = False
+      cc = env.WhereIs(env["CC"]) or env["CC"]
+      flags = env.subst("$CCFLAGS $CFLAGS").split()
+      if 'cl' == env["CC"]:
+         self.argv = [cc, "/nologo"] + flags + ["/c", "conftest.c", "/Foconftest.obj"]
+      else:
+         self.argv = [cc] + flags + ["-c", "conftest.c", "-o", "conftest.o"]
+
+   def run(self):
+      tmp_dir = tempfile.mkdtemp(prefix="sca_arch")
+      try:
+         src = open(os.path.join(tmp_dir, "conftest.c"), "w")
+         try:
+            src.write("int main() { return 0; }\n")
+         finally:
+            src.close()
+         self.passed = runCommand(self.argv, cwd=tmp_dir, mergeStderr=True).succeeded()
+      finally:
+         shutil.rmtree(tmp_dir, True)
+
 def detectValidArchs():
-   """ Helper method that uses environment builder and SCon Confs to detect valid
+   """ Helper method that uses environment builder and test compiles to detect valid
        arch targets for the current system.
        Returns list of valid archs with the default first.
+       The candidate archs are probed concurrently and the result is cached per compiler
+       (path, modification time and version).
    """
-   def CheckArch(context, archName):
-      """ Custom config context check for checking arch in this method. """
-      context.Message( 'Checking for arch [%s] ...'%archName )
-      ret = context.TryCompile("""int main() { return 0; }""", '.c')
-      context.Result( ret )
-      return ret
-
    valid_archs = []
    cur_arch = GetArch()
    if "ia32" == cur_arch:
@@ -625,15 +662,40 @@ def detectValidArchs():
       arch_checks = [EnvironmentBuilder.PPC_ARCH,
                      EnvironmentBuilder.PPC64_ARCH]
 
+   arch_checks = [a for a in arch_checks if a not in valid_archs]
+   if not arch_checks:
+      return valid_archs
+
+   # The result only depends on the compiler, so a warm startup reads it from the cache
+   cache_file = os.path.join(CheckCache.getUserCacheDir(), "archs")
+   key = getCompilerIdentity(test_env)
+   key = ResultCache.md5_new(repr([key, cur_arch, arch_checks])).hexdigest()
+   try:
+      cached = CacheFile.load(cache_file, legacy=False) or {}
+   except CacheFile.CacheFileError:
+      cached = {}
+   if cached.has_key(key):
+      return valid_archs + list(cached[key])
+
+   # Environments are built here since SCons is not thread safe.  The probes themselves
+   # only run the compiler, each in its own directory, and run concurrently.
+   probes = []
    for test_arch in arch_checks:
-      if test_arch not in valid_archs:
-         env_bldr = EnvironmentBuilder()
-         env_bldr.setCpuArch(test_arch)
-         conf_env = env_bldr.buildEnvironment()
-         conf_ctxt = conf_env.Configure(custom_tests = {"CheckArch":CheckArch})
-         passed_test = conf_ctxt.CheckArch(test_arch)
-         conf_ctxt.Finish()
-         if passed_test:
-            valid_archs.append(test_arch)
-
-   return valid_archs
+      env_bldr = EnvironmentBuilder()
+      env_bldr.setCpuArch(test_arch)
+      probes.append(ArchProbe(test_arch, env_bldr.buildEnvironment()))
+   for p in probes:
+      p.start()
+   for p in probes:
+      p.join()
+      print "Checking for arch [%s] ... %s" % (p.arch, (p.passed and "yes") or "no")
+
+   found = [p.arch for p in probes if p.passed]
+   cached[key] = found
+   try:
+      if not os.path.isdir(os.path.dirname(cache_file)):
+         os.makedirs(os.path.dirname(cache_file))
+      CacheFile.save(cache_file, cached)
+   except (IOError, OSError), ex:
+      print "Could not write arch cache [%s]: %s" % (cache_file, ex)
+   return valid_archs + found
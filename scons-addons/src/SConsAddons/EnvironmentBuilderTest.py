@@ -0,0 +1,74 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SConsAddons.EnvironmentBuilder as EnvironmentBuilder
+import SConsAddons.Options.CheckCache as CheckCache
+from SConsAddons.Util import GetArch
+
+
+class EnvironmentBuilderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_dir = os.environ.get(CheckCache.cacheDirEnvVar)
+        os.environ[CheckCache.cacheDirEnvVar] = self.tmpdir
+        self.saved_probe = EnvironmentBuilder.ArchProbe
+        self.probed = []
+        def probe(arch, env):
+            self.probed.append(arch)
+            return self.saved_probe(arch, env)
+        EnvironmentBuilder.ArchProbe = probe
+
+    def tearDown(self):
+        EnvironmentBuilder.ArchProbe = self.saved_probe
+        if self.saved_dir is None:
+            del os.environ[CheckCache.cacheDirEnvVar]
+        else:
+            os.environ[CheckCache.cacheDirEnvVar] = self.saved_dir
+        shutil.rmtree(self.tmpdir)
+
+    def test_detectValidArchs(self):
+        """Test that the archs are probed once per compiler"""
+        if GetArch() not in ("ia32", "x64"):
+            return
+        if EnvironmentBuilder.EnvironmentBuilder().buildEnvironment()["CC"] != "gcc":
+            return
+        archs = EnvironmentBuilder.detectValidArchs()
+        # The host arch is always valid and comes first
+        assert archs[0] == {"ia32":EnvironmentBuilder.EnvironmentBuilder.IA32_ARCH,
+                            "x64":EnvironmentBuilder.EnvironmentBuilder.X64_ARCH}[GetArch()]
+        assert archs.count(archs[0]) == 1, archs
+        assert len(self.probed) == 1, self.probed
+        self.probed = []
+        assert EnvironmentBuilder.detectValidArchs() == archs
+        assert self.probed == []
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(EnvironmentBuilderTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
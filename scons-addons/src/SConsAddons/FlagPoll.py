@@ -0,0 +1,275 @@
+"""
+In process answers to flagpoll queries.
+
+Every flagpoll query spawns a Python interpreter, and each FlagPollParser makes
+several of them.  This module reads the .fpc files on the flagpoll search path
+once, resolves variables and Requires chains in memory, and answers the
+queries FlagPollParser makes.  Anything it does not handle (pkg-config .pc
+files, unsatisfied requirements, unknown flags) raises Unsupported so the
+caller can fall back to running flagpoll.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, sys, re, threading
+
+# Directories flagpoll searches after the ones in FLAGPOLL_PATH
+defaultSearchDirs = ['/usr/lib/flagpoll', '/usr/lib64/flagpoll', '/usr/share/flagpoll',
+                     '/usr/local/lib/flagpoll', '/usr/local/lib64/flagpoll',
+                     '/usr/local/share/flagpoll']
+
+var_re = re.compile(r'\$\{([^}]*)\}')
+token_re = re.compile(r'"[^"]*"|\S+')
+requires_re = re.compile(r'([^\s,<>=!]+)(?:\s*(<=|>=|!=|=|<|>)\s*([^\s,]+))?')
+
+_indexes = {}                 # search path -> FpcIndex
+_files = {}                   # (path, mtime) -> FpcFile
+_lock = threading.Lock()
+
+
+class Unsupported(Exception):
+   """ The query can not be answered here and should be passed on to flagpoll. """
+   pass
+
+
+def getSearchPath():
+   dirs = [d for d in os.environ.get("FLAGPOLL_PATH", "").split(os.pathsep) if d]
+   return tuple(dirs + defaultSearchDirs)
+
+def versionKey(version):
+   """ Return key that sorts version strings numerically. """
+   key = []
+   for part in re.split(r'[.\-_]', version or ""):
+      if part.isdigit():
+         key.append((int(part), ""))
+      else:
+         key.append((-1, part))
+   return key
+
+def versionMatches(version, op, required):
+   if not op:
+      return True
+   c = cmp(versionKey(version), versionKey(required))
+   return {"=":c == 0, "!=":c != 0, "<":c < 0, "<=":c <= 0, ">":c > 0, ">=":c >= 0}[op]
+
+
+class FpcFile(object):
+   """ Variables and fields of one .fpc file (or pkg-config .pc file, the format is the same). """
+   def __init__(self, path):
+      self.path = path
+      file_dir = os.path.dirname(os.path.abspath(path))
+      self.variables = {"fp_file_cwd":file_dir, "pcfiledir":file_dir}
+      self.fields = {}           # lower case field name -> raw value
+      fh = open(path)
+      try:
+         for line in fh.readlines():
+            line = line.split("#", 1)[0].strip()
+            if not line:
+               continue
+            colon = line.find(":")
+            equals = line.find("=")
+            if equals > 0 and (colon < 0 or equals < colon):
+               self.variables[line[:equals].strip()] = line[equals+1:].strip()
+            elif colon > 0:
+               self.fields[line[:colon].strip().lower()] = line[colon+1:].strip()
+      finally:
+         fh.close()
+
+   def expand(self, value, depth=0):
+      if depth > 20:
+         raise Unsupported("recursive variable in %s" % self.path)
+      def repl(match):
+         name = match.group(1)
+         if not self.variables.has_key(name):
+            raise Unsupported("undefined variable %s in %s" % (name, self.path))
+         return self.expand(self.variables[name], depth + 1)
+      return var_re.sub(repl, value)
+
+   def get(self, name, default=""):
+      value = self.fields.get(name.lower())
+      if value is None:
+         return default
+      return self.expand(value)
+
+   def getVersion(self):
+      return self.get("version")
+
+   def getNames(self):
+      names = [os.path.splitext(os.path.basename(self.path))[0]]
+      names.extend(self.get("provides").replace(",", " ").split())
+      return names
+
+   def getRequires(self, fields=("requires",)):
+      """ Return list of (module, operator, version) this file requires. """
+      requires = []
+      for f in fields:
+         requires.extend(requires_re.findall(self.get(f)))
+      return requires
+
+def readFpcFile(path):
+   """ Return the FpcFile for path.  Files are only parsed again when they change. """
+   key = (os.path.abspath(path), os.path.getmtime(path))
+   fpc = _files.get(key)
+   if fpc is None:
+      fpc = FpcFile(path)
+      _files[key] = fpc
+   return fpc
+
+
+class FpcIndex(object):
+   """ All the .fpc files in the search path by the module names they provide. """
+   def __init__(self, searchPath, suffix=".fpc"):
+      self.modules = {}          # module name -> list of FpcFile
+      for d in searchPath:
+         if not os.path.isdir(d):
+            continue
+         for f in os.listdir(d):
+            if not f.endswith(suffix):
+               continue
+            try:
+               fpc = readFpcFile(os.path.join(d, f))
+            except (IOError, OSError, Unsupported):
+               continue
+            for n in fpc.getNames():
+               self.modules.setdefault(n, []).append(fpc)
+
+   def find(self, moduleName, op=None, version=None):
+      """ Return the newest FpcFile for moduleName satisfying the version requirement. """
+      candidates = []
+      for fpc in self.modules.get(moduleName, []):
+         try:
+            fpc_ver = fpc.getVersion()
+         except Unsupported:
+            continue
+         if versionMatches(fpc_ver, op, version):
+            candidates.append((versionKey(fpc_ver), fpc))
+      if not candidates:
+         return None
+      candidates.sort()
+      return candidates[-1][1]
+
+def getIndex():
+   """ Return the index of the current search path.  It is only built once. """
+   search_path = getSearchPath()
+   _lock.acquire()
+   try:
+      index = _indexes.get(search_path)
+      if index is None:
+         index = FpcIndex(search_path)
+         _indexes[search_path] = index
+      return index
+   finally:
+      _lock.release()
+
+
+def _dedupe(tokens, keepLast=False):
+   if keepLast:
+      tokens = tokens[:]
+      tokens.reverse()
+   seen = {}
+   result = []
+   for t in tokens:
+      if not seen.has_key(t):
+         seen[t] = True
+         result.append(t)
+   if keepLast:
+      result.reverse()
+   return result
+
+def getClosure(index, fpc, requireFields=("requires",)):
+   """ Return fpc followed by everything it requires, each file once.
+       requireFields are the fields that list requirements.
+   """
+   closure = []
+   seen = {}
+   stack = [fpc]
+   while stack:
+      f = stack.pop(0)
+      if seen.has_key(f.path):
+         continue
+      seen[f.path] = True
+      closure.append(f)
+      for (name, op, version) in f.getRequires(requireFields):
+         req = index.find(name, op, version)
+         if req is None:
+            raise Unsupported("requirement %s %s %s of %s not found" % (name, op, version, f.path))
+         stack.append(req)
+   return closure
+
+def query(moduleName, fpcFile, flag):
+   """
+   Return the output flagpoll would give for 'flagpoll moduleName [--from-file=fpcFile] flag'.
+   Raises Unsupported if the answer is not known.
+   """
+   index = getIndex()
+   if fpcFile:
+      fpc = readFpcFile(fpcFile)
+   else:
+      fpc = index.find(moduleName)
+   if fpc is None:
+      raise Unsupported("no .fpc file for %s" % moduleName)
+
+   flag = flag.strip()
+   if "--exists" == flag:
+      getClosure(index, fpc)
+      return "yes"
+   if "--modversion" == flag:
+      return fpc.getVersion()
+   if flag.startswith("--get-"):
+      name = flag[len("--get-"):]
+      for n in (name, name.replace("-", "_")):
+         if fpc.fields.has_key(n.lower()):
+            return fpc.get(n)
+         if fpc.variables.has_key(n):
+            return fpc.expand(fpc.variables[n])
+      raise Unsupported("%s has no %s" % (fpc.path, name))
+
+   if "win32" == sys.platform and flag.find("-only-") >= 0:
+      # Splitting MSVC style flags is left to flagpoll
+      raise Unsupported(flag)
+   closure = getClosure(index, fpc)
+   if flag.startswith("--libs"):
+      tokens = []
+      for f in closure:
+         tokens.extend(token_re.findall(f.get("libs")))
+      libs = [t for t in tokens if t.startswith("-l")]
+      paths = [t for t in tokens if t.startswith("-L")]
+      other = [t for t in tokens if not (t.startswith("-l") or t.startswith("-L"))]
+      parts = {"--libs":None, "--libs-only-l":libs, "--libs-only-L":paths,
+               "--libs-only-other":other}
+      if not parts.has_key(flag):
+         raise Unsupported(flag)
+      if parts[flag] is None:
+         return " ".join(_dedupe(paths) + other + _dedupe(libs, True))
+      return " ".join(_dedupe(parts[flag], flag == "--libs-only-l"))
+   if flag.startswith("--cflags"):
+      tokens = []
+      for f in closure:
+         tokens.extend(token_re.findall(f.get("cflags")))
+      incs = [t for t in tokens if t.startswith("-I")]
+      other = [t for t in tokens if not t.startswith("-I")]
+      parts = {"--cflags":tokens, "--cflags-only-I":incs, "--cflags-only-other":other}
+      if not parts.has_key(flag):
+         raise Unsupported(flag)
+      return " ".join(_dedupe(parts[flag]))
+   raise Unsupported(flag)
@@ -0,0 +1,154 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SConsAddons.FlagPoll as FlagPoll
+import SConsAddons.Util as sca_util
+
+
+class FlagPollTestCase(unittest.TestCase):
+    def setUp(self):
+        # Each test has its own search path, the indexes are kept per search path
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_path = os.environ.get("FLAGPOLL_PATH")
+        os.environ["FLAGPOLL_PATH"] = self.tmpdir
+        self._write("bar", "prefix=/opt/bar\nVersion: 2.0\nCflags: -I${prefix}/include -DBAR\n"
+                    "Libs: -L${prefix}/lib -lbar -lm\n")
+        self._write("foo", "prefix=/opt/foo\nlibdir=${prefix}/lib  # comment\n"
+                    "Version: 1.2.3\nProvides: foolib\nRequires: bar >= 1.5\n"
+                    "Cflags: -I${prefix}/include\nLibs: -L${libdir} -lfoo -lm -pthread\n")
+        self._write("foo-old", "Version: 1.0\nProvides: foo\nLibs: -lfoo_old\n")
+
+    def tearDown(self):
+        if self.saved_path is None:
+            del os.environ["FLAGPOLL_PATH"]
+        else:
+            os.environ["FLAGPOLL_PATH"] = self.saved_path
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name + ".fpc")
+        fh = open(path, "w")
+        fh.write(text)
+        fh.close()
+        return path
+
+    def test_versionMatches(self):
+        """Test comparing version strings"""
+        assert FlagPoll.versionMatches("1.10", ">", "1.9")
+        assert FlagPoll.versionMatches("1.2.3", ">=", "1.2")
+        assert FlagPoll.versionMatches("1.2", "=", "1.2")
+        assert not FlagPoll.versionMatches("1.2", "!=", "1.2")
+        assert not FlagPoll.versionMatches("1.2", "<", "1.2")
+        assert FlagPoll.versionMatches("anything", None, None)
+
+    def test_fpcFile(self):
+        """Test reading variables and fields"""
+        fpc = FlagPoll.readFpcFile(os.path.join(self.tmpdir, "foo.fpc"))
+        assert fpc.getVersion() == "1.2.3"
+        assert fpc.get("libs") == "-L/opt/foo/lib -lfoo -lm -pthread"
+        assert fpc.get("LIBS") == fpc.get("libs")
+        assert fpc.get("missing", "default") == "default"
+        assert fpc.getNames() == ["foo", "foolib"]
+        assert fpc.getRequires() == [("bar", ">=", "1.5")]
+        assert fpc.variables["fp_file_cwd"] == self.tmpdir
+        # Files are only parsed again when they change
+        assert FlagPoll.readFpcFile(os.path.join(self.tmpdir, "foo.fpc")) is fpc
+
+    def test_undefinedVariable(self):
+        """Test that undefined variables can not be expanded"""
+        path = self._write("broken", "Version: ${undefined}\n")
+        try:
+            FlagPoll.readFpcFile(path).getVersion()
+        except FlagPoll.Unsupported:
+            pass
+        else:
+            assert False, "undefined variable was expanded"
+
+    def test_index(self):
+        """Test finding the newest module that satisfies the version requirement"""
+        index = FlagPoll.getIndex()
+        assert index is FlagPoll.getIndex()
+        assert index.find("foo").getVersion() == "1.2.3"
+        assert index.find("foolib").getVersion() == "1.2.3"
+        assert index.find("foo", "<", "1.2").getVersion() == "1.0"
+        assert index.find("foo", ">", "2") is None
+        assert index.find("nosuch") is None
+
+    def test_closure(self):
+        """Test collecting a module and its requirements"""
+        index = FlagPoll.getIndex()
+        closure = FlagPoll.getClosure(index, index.find("foo"))
+        assert [os.path.basename(f.path) for f in closure] == ["foo.fpc", "bar.fpc"]
+        path = self._write("qux", "Version: 1\nRequires: bar > 5\n")
+        try:
+            FlagPoll.getClosure(index, FlagPoll.readFpcFile(path))
+        except FlagPoll.Unsupported:
+            pass
+        else:
+            assert False, "missing requirement was not reported"
+
+    def test_query(self):
+        """Test answering flagpoll queries"""
+        assert FlagPoll.query("foo", None, "--modversion") == "1.2.3"
+        assert FlagPoll.query("foo", None, "--exists") == "yes"
+        assert FlagPoll.query("foo", None, "--get-prefix") == "/opt/foo"
+        assert FlagPoll.query("foo", None, "--cflags-only-I") == \
+               "-I/opt/foo/include -I/opt/bar/include"
+        assert FlagPoll.query("foo", None, "--cflags") == "-I/opt/foo/include -I/opt/bar/include -DBAR"
+        assert FlagPoll.query("foo", None, "--libs-only-l") == "-lfoo -lbar -lm"
+        assert FlagPoll.query("foo", None, "--libs-only-L") == "-L/opt/foo/lib -L/opt/bar/lib"
+        assert FlagPoll.query("foo", None, "--libs-only-other") == "-pthread"
+        old = os.path.join(self.tmpdir, "foo-old.fpc")
+        assert FlagPoll.query("foo", old, "--libs") == "-lfoo_old"
+        for (module, flag) in (("nosuch", "--modversion"), ("foo", "--get-nosuch"),
+                               ("foo", "--variable-list")):
+            try:
+                FlagPoll.query(module, None, flag)
+            except FlagPoll.Unsupported:
+                pass
+            else:
+                assert False, "%s %s was answered" % (module, flag)
+
+    def test_flagPollParser(self):
+        """Test that the parser is answered from the .fpc files"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        parser = sca_util.FlagPollParser("foolib")
+        assert parser.valid
+        assert parser.getVersion() == "1.2.3"
+        assert parser.findIncludes() == ["/opt/foo/include", "/opt/bar/include"]
+        assert parser.findCXXFlags() == ["BAR"]
+        assert parser.findLibs() == ["foo", "bar", "m"]
+        assert parser.findLibPaths() == ["/opt/foo/lib", "/opt/bar/lib"]
+        assert parser.findLinkFlags() == ["-pthread"]
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(FlagPollTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -11,6 +11,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment
 import SCons
 import SConsAddons.Options
+import SConsAddons.Options.Checks as Checks
 import SConsAddons.Util as sca_util
 import SCons.Util
 import distutils.sysconfig
@@ -24,12 +25,125 @@ pj = os.path.join
 
 from SCons.Util import WhereIs
 
-import SCons.SConf
-Configure = SCons.SConf.SConf
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
+_boostVersionTagRe = re.compile(r'^\d+_\d+(_\d+)?$')
+_boostRuntimeTagRe = re.compile(r'^[sgydpn]+$')
+
+def parseBoostLibName(filename):
+   """ Parse the name of a boost library file into a dictionary with the parts of the name:
+       lib, toolset, mt, runtime, version, shared, and name (the name to link with).
+       Returns None if filename is not a boost library.
+   """
+   i = filename.find('.')
+   if i < 0:
+      base, ext = filename, ""
+   else:
+      base, ext = filename[:i], filename[i+1:]
+   if ext.startswith("so") or ext in ("dylib",):
+      shared = True
+   elif ext == "a":
+      shared = False
+   elif ext == "lib":
+      shared = not base.startswith("lib")    # static libraries have a lib prefix on windows
+   else:
+      return None
+
+   stem = base
+   if stem.startswith("lib"):
+      stem = stem[3:]
+   if not stem.startswith("boost_"):
+      return None
+
+   parts = stem.split('-')
+   info = {"lib":parts[0][len("boost_"):], "toolset":"", "mt":False, "runtime":"",
+           "version":"", "shared":shared, "name":stem}
+   if sca_util.GetPlatform() == "win32":
+      info["name"] = base
+   for tag in parts[1:]:
+      if "mt" == tag:
+         info["mt"] = True
+      elif _boostVersionTagRe.match(tag):
+         info["version"] = tag
+      elif _boostRuntimeTagRe.match(tag):
+         info["runtime"] = tag
+      else:
+         info["toolset"] = tag
+   return info
+
+def debugRuntimeLibName(name):
+   """ Return the debug runtime counterpart of the boost library name to link with.
+       The 'd' runtime tag is added to the name, keeping all the other tags.
+       Returns None if name is not a boost library or already uses the debug runtime.
+   """
+   info = parseBoostLibName(name + ".a")
+   if info is None or 'd' in info["runtime"]:
+      return None
+   runtime = "".join([c for c in "sgydpn" if c in info["runtime"] + "d"])
+   parts = name.split('-')
+   if info["runtime"]:
+      parts[parts.index(info["runtime"], 1)] = runtime
+   elif info["version"]:
+      parts.insert(parts.index(info["version"], 1), runtime)
+   else:
+      parts.append(runtime)
+   return "-".join(parts)
+
+
+class BoostLibraryIndex(object):
+   """ Index of the boost library files found in a list of directories. """
+   def __init__(self, libPaths):
+      self.libs = {}           # library name -> list of parsed file names
+      seen = {}
+      for d in libPaths:
+         try:
+            files = sca_util.listDir(d)
+         except TypeError:
+            continue
+         files.sort()
+         for f in files:
+            info = parseBoostLibName(f)
+            if info is not None and not seen.has_key(info["name"]):
+               seen[info["name"]] = True
+               self.libs.setdefault(info["lib"], []).append(info)
+
+   def findBest(self, libname, wanted, preferShared=True, allowFallbacks=True):
+      """ Return the name to link with for the best match of libname or None.
+          wanted - Parsed name (see parseBoostLibName) of the preferred library name.
+          allowFallbacks - If true, names lacking the toolset, threading or version tags
+                           that are wanted are acceptable too.
+      """
+      def score(wantedPart, part):
+         if wantedPart == part:
+            return 2
+         if allowFallbacks and not part:
+            return 1
+         return 0
+
+      best = None
+      best_key = None
+      for info in self.libs.get(libname, []):
+         # Never mix debug and release runtimes
+         if ('d' in info["runtime"]) != ('d' in wanted["runtime"]):
+            continue
+         key = (score(wanted["toolset"], info["toolset"]), score(wanted["mt"], info["mt"]),
+                score(wanted["version"], info["version"]))
+         if 0 in key:
+            continue
+         key = key + (info["runtime"] == wanted["runtime"], info["shared"] == preferShared)
+         if best_key is None or key > best_key:
+            best = info
+            best_key = key
+      if best is None:
+         return None
+      return best["name"]
+
+
 # ##############################################
 # Options
 # ##############################################
 class Boost(SConsAddons.Options.PackageOption):
+   variantKeys = ["type"]       # debugrt variants link against different library names
+
    def __init__(self, name, requiredVersion, 
                 useDebug=False, useMt=True, libs=[], 
                 required=True, useCppPath=False, 
@@ -165,10 +279,12 @@ class Boost(SConsAddons.Options.PackageOption):
 
          self.thread_extra_libs = []
       
-   def _getLibNameGenerators(self, env):
+   def _getLibNameGenerators(self, env, debugRuntime=None):
       """
       Constructs a list of callables that can be used to generate variants for a given Boost
       library name. This takes into account whether we can strip off parts of the name.
+      debugRuntime - If set, overrides whether the names are for the debug runtime, which is
+                     otherwise determined by useDebug and the variant of env.
 
       @rtype: list of callables
       @return: A list of callable objects is returned to the caller. Each takes a single string
@@ -200,12 +316,10 @@ class Boost(SConsAddons.Options.PackageOption):
          if self.toolset:
             toolset_part = "-" + self.toolset
 
-         if self.use_debug:
+         if debugRuntime is None:
+            debugRuntime = self._usesDebugRuntime(env)
+         if debugRuntime:
             runtime_part = debug_ext
-         elif env and env.has_key("variant") and env["variant"].has_key("type"):
-            var_type = env["variant"]["type"]
-            if "debugrt" == var_type:
-               runtime_part = debug_ext
 
       generators = [lambda n: generateName(n, toolset_part + threading_part + runtime_part + version_part)]
 
@@ -227,8 +341,55 @@ class Boost(SConsAddons.Options.PackageOption):
           to get the symbols for the library named "libname" """
       if not self.found_libs.has_key(libname):
          return libname
-      else:
+      elif env is None:
          return self.found_libs[libname]
+      else:
+         return self.getVariantResult(env).get(libname, self.found_libs[libname])
+
+   def _usesDebugRuntime(self, env):
+      " Return true if the libraries for env are the ones for the debug runtime. "
+      if self.use_debug:
+         return True
+      return env and env.has_key("variant") and env["variant"].has_key("type") and \
+             "debugrt" == env["variant"]["type"]
+
+   def resolveVariant(self, env):
+      """ Return map of library name to the full library name to use for the variant of env.
+          The names validated during processing are used unless the variant calls for the
+          debug runtime.  Then the debug runtime name of the validated library is used if it
+          exists in the library path.  Names picked from the installed libraries that no
+          generator gives get the debug runtime tag added to them.
+      """
+      if not self.found_libs or self.use_debug or not self._usesDebugRuntime(env):
+         return dict(self.found_libs)
+      # Pair up the name each generator gave during validation with its debug runtime name,
+      # so only the runtime part of the validated name changes
+      generators = zip(self._getLibNameGenerators(env, False),
+                       self._getLibNameGenerators(env, True))
+      variant_libs = {}
+      for (libname, found_name) in self.found_libs.iteritems():
+         variant_libs[libname] = found_name
+         for (generator, debug_generator) in generators:
+            if generator(libname) == found_name:
+               test_name = debug_generator(libname)
+               break
+         else:
+            # Found through the BoostLibraryIndex
+            test_name = debugRuntimeLibName(found_name)
+         if test_name and self._libraryExists(test_name, env):
+            variant_libs[libname] = test_name
+      return variant_libs
+
+   def _libraryExists(self, libFilename, env):
+      " Return true if there is a library file for libFilename in our library path. "
+      names = []
+      for (prefix, suffix) in (("$LIBPREFIX", "$LIBSUFFIX"), ("$SHLIBPREFIX", "$SHLIBSUFFIX")):
+         names.append(env.subst(prefix) + libFilename + env.subst(suffix))
+      for d in self.found_lib_paths:
+         for n in names:
+            if sca_util.isFile(pj(d, n)):
+               return True
+      return False
       
          #if useDebug is None:
          #   if self.use_debug:
@@ -296,9 +457,19 @@ class Boost(SConsAddons.Options.PackageOption):
       directories_to_check = [env.Dictionary().get("CPPPATH"), pj("/","usr","include"),
                               pj("/","usr","local","include")]
 
+      def find_file(d):
+         # FindFile goes through the SCons node cache which is not thread safe
+         SConsAddons.Options.Options.sconsLock.acquire()
+         try:
+            node = env.FindFile(boost_header, d)
+         finally:
+            SConsAddons.Options.Options.sconsLock.release()
+         return node and str(node)
+
       for d in directories_to_check:
          if None != d:
-            ver_header = env.FindFile(boost_header, d)
+            ver_header = sca_util.probe("findfile", (boost_header, str(d)),
+                                        lambda d=d: find_file(d))
             if ver_header:
                break
 
@@ -323,7 +494,7 @@ class Boost(SConsAddons.Options.PackageOption):
          self.checkRequired("Boost base dir not set")
          return
       
-      if not os.path.isdir(self.baseDir):    # If we don't have a directory
+      if not sca_util.isDir(self.baseDir):    # If we don't have a directory
          self.checkRequired("Boost base dir is not a directory: %s" % self.baseDir)
          return
 
@@ -331,7 +502,7 @@ class Boost(SConsAddons.Options.PackageOption):
       if self.incDir:
          # Check the version header is there         
          version_header = pj(self.incDir, 'boost', 'version.hpp')         
-         if not os.path.isfile(version_header):
+         if not sca_util.isFile(version_header):
             self.checkRequired("Boost version.hpp header does not exist:%s"%version_header)
             return
          
@@ -342,14 +513,14 @@ class Boost(SConsAddons.Options.PackageOption):
          print "   Searching for correct boost include dir...",
          base_include_dir = pj(self.baseDir, 'include')
          potential_dirs = [base_include_dir, self.baseDir]
-         if os.path.isdir(base_include_dir):
-            inc_dirs = [pj(base_include_dir,d) for d in os.listdir(base_include_dir)]
+         if sca_util.isDir(base_include_dir):
+            inc_dirs = [pj(base_include_dir,d) for d in sca_util.listDir(base_include_dir)]
             inc_dirs.sort()
             inc_dirs.reverse()
             potential_dirs.extend(inc_dirs)
          
          for d in potential_dirs:
-            if os.path.isfile(pj(d,'boost','version.hpp')):
+            if sca_util.isFile(pj(d,'boost','version.hpp')):
                self.incDir = d
                break
          
@@ -365,8 +536,7 @@ class Boost(SConsAddons.Options.PackageOption):
       
       # --- Check version requirement --- #
       version_header = pj(self.incDir, 'boost', 'version.hpp')
-      ver_file = file(version_header)
-      ver_file_contents = ver_file.read()
+      ver_file_contents = sca_util.readFile(version_header) or ""
       ver_match = re.search("define\s+?BOOST_VERSION\s+?(\d*)",
                             ver_file_contents)
       if not ver_match:
@@ -404,7 +574,7 @@ class Boost(SConsAddons.Options.PackageOption):
       self.found_lib_paths = [pj(self.baseDir, 'lib')] 
       if re.search(r'64', arch_str):
          lib64_dir = pj(self.baseDir, 'lib64')
-         if os.path.exists(lib64_dir):
+         if sca_util.pathExists(lib64_dir):
             self.found_lib_paths = [lib64_dir]
 
       if self.version_int_list[1] >= 35:
@@ -453,8 +623,10 @@ class Boost(SConsAddons.Options.PackageOption):
             conf_env.Append(CXXFLAGS = ["/MD"])
 
          conf_ctxt = Configure(conf_env)
-         result = conf_ctxt.CheckLibWithHeader(lib_filename, header_to_check, "c++")
-         conf_ctxt.Finish()         
+         try:
+            result = conf_ctxt.CheckLibWithHeader(lib_filename, header_to_check, "c++")
+         finally:
+            conf_ctxt.Finish()
          return result
 
       # XXX: Hack to account for the fact that boost_python did not support
@@ -471,6 +643,27 @@ class Boost(SConsAddons.Options.PackageOption):
       generators = self._getLibNameGenerators(env)
       possible_lib_names = []
 
+      # Pick the library names from the library files that are actually installed and
+      # confirm them with a single compile and link.
+      batch_libs = [l for l in libs_to_find if "python" != l]
+      if batch_libs:
+         lib_names = self._findLibNames(batch_libs + self._extraBoostLibs, generators[0])
+         if len([l for l in batch_libs if lib_names.has_key(l)]) == len(batch_libs):
+            name_for = lambda l, names=lib_names, g=generators[0]: names.get(l) or g(l)
+            for libname in self._checkLibBatch(batch_libs, name_for, env):
+               self.found_libs[libname] = name_for(libname)
+               print "  %s: %s" % (libname, self.found_libs[libname])
+            libs_to_find = [l for l in libs_to_find if not self.found_libs.has_key(l)]
+            batch_libs = [l for l in libs_to_find if "python" != l]
+
+      # Check the preferred names of all the libraries with a single compile and link.
+      # Only the libraries that fail are searched for one name at a time.
+      if len(batch_libs) > 1:
+         for libname in self._checkLibBatch(batch_libs, generators[0], env):
+            self.found_libs[libname] = generators[0](libname)
+            print "  %s: %s" % (libname, self.found_libs[libname])
+         libs_to_find = [l for l in libs_to_find if not self.found_libs.has_key(l)]
+
       for libname in libs_to_find:
          found_full_name = None
 
@@ -509,6 +702,50 @@ class Boost(SConsAddons.Options.PackageOption):
          self.available = True
 
 
+   def _findLibNames(self, libnames, generator):
+      """ Return map from library name to the name of the best matching library file in
+          our library path.  Libraries without a matching file are left out.
+      """
+      index = BoostLibraryIndex(self.found_lib_paths)
+      names = {}
+      for l in libnames:
+         wanted = parseBoostLibName(generator(l) + ".a")
+         name = index.findBest(l, wanted, self.preferDynamic, self.allowLibNameFallbacks)
+         if name:
+            names[l] = name
+      return names
+
+   def _checkLibBatch(self, libnames, generator, env):
+      """ Check all the given libraries using the names from generator with a single
+          compile and link.  Returns the list of library names that work.
+      """
+      conf_env = env.Clone()
+      conf_env.Append(CPPPATH = self.found_incs,
+                      LIBPATH = self.found_lib_paths,
+                      CPPDEFINES = self.found_defines)
+      if self.preferDynamic and sca_util.GetPlatform() == "win32":
+         conf_env.Append(CXXFLAGS = ["/MD"])
+
+      extra_libs = [generator(l) for l in self._extraBoostLibs]
+      if "thread" in libnames:
+         extra_libs.extend(self.thread_extra_libs)
+
+      headers = []
+      for l in libnames:
+         h = self.headerMap.get(l, pj('boost','config.hpp'))
+         if h not in headers:
+            headers.append(h)
+
+      conf_ctxt = Configure(conf_env)
+      try:
+         (bad_headers, bad_libs) = Checks.checkBatch(conf_ctxt, headers,
+                                                     [generator(l) for l in libnames],
+                                                     "C++", extra_libs)
+      finally:
+         conf_ctxt.Finish()
+      return [l for l in libnames if generator(l) not in bad_libs and
+              self.headerMap.get(l, pj('boost','config.hpp')) not in bad_headers]
+
    def apply(self, env, libs=None, useCppPath=False, useDebug=None):
       """ Add environment options for building against Boost libraries.
           Apply the options and take into account any variant information
@@ -585,6 +822,18 @@ class Boost(SConsAddons.Options.PackageOption):
          if int(gcc_version[0]) >= 4:         
             env.AppendUnique(CXXFLAGS = ['-fvisibility=hidden', '-fvisibility-inlines-hidden'])
 
+   def getCacheDependencies(self, optDict):
+      deps = []
+      inc_dirs = [optDict.get(self.incDirKey)]
+      base_dir = optDict.get(self.baseDirKey)
+      if base_dir:
+         inc_dirs.extend([pj(base_dir, 'include'), base_dir])
+         deps.extend([pj(base_dir, 'lib'), pj(base_dir, 'lib64')])
+      else:
+         inc_dirs.extend([pj("/","usr","include"), pj("/","usr","local","include")])
+      deps.extend([pj(d, 'boost', 'version.hpp') for d in inc_dirs if d])
+      return deps
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir), (self.incDirKey, self.incDir)]
    
@@ -0,0 +1,152 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SConsAddons.Util as sca_util
+from SConsAddons.Options.Boost import Boost, BoostLibraryIndex, parseBoostLibName, \
+     debugRuntimeLibName
+
+
+class BoostTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = SCons.Environment.Environment()
+        self.boost = Boost("Boost", "1.30.0", libs=["system"], toolset="gcc")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _install(self, *names):
+        for n in names:
+            open(os.path.join(self.tmpdir, "lib%s.so" % n), "w").close()
+
+    def _validated(self, name):
+        self.boost.found_lib_paths = [self.tmpdir]
+        self.boost.found_libs = {"system":name}
+        self.boost.available = True
+
+    def _variantEnv(self, varType):
+        env = self.env.Clone()
+        env["variant"] = {"type":varType}
+        return env
+
+    def test_parseBoostLibName(self):
+        """Test parsing the parts of boost library file names"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        info = parseBoostLibName("libboost_filesystem-gcc43-mt-d-1_38.so.1.38.0")
+        assert info == {"lib":"filesystem", "toolset":"gcc43", "mt":True, "runtime":"d",
+                        "version":"1_38", "shared":True,
+                        "name":"boost_filesystem-gcc43-mt-d-1_38"}, info
+        info = parseBoostLibName("libboost_system.a")
+        assert (info["lib"], info["shared"], info["mt"], info["name"]) == \
+               ("system", False, False, "boost_system")
+        for f in ("libfoo.so", "libboost_system.la", "boost_system.txt"):
+            assert parseBoostLibName(f) is None, f
+
+    def test_libraryIndex(self):
+        """Test picking the installed library that matches the wanted name best"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        self._install("boost_system", "boost_system-gcc-mt", "boost_system-gcc-mt-d",
+                      "boost_thread-mt")
+        open(os.path.join(self.tmpdir, "libboost_thread-mt.a"), "w").close()
+        index = BoostLibraryIndex([self.tmpdir, os.path.join(self.tmpdir, "nosuch")])
+        wanted = parseBoostLibName("libboost_system-gcc-mt.so")
+        assert index.findBest("system", wanted) == "boost_system-gcc-mt"
+        # Debug and release runtimes are never mixed
+        wanted = parseBoostLibName("libboost_system-gcc-mt-d.so")
+        assert index.findBest("system", wanted) == "boost_system-gcc-mt-d"
+        wanted = parseBoostLibName("libboost_system-gcc-mt-gd.so")
+        assert index.findBest("system", wanted) == "boost_system-gcc-mt-d"
+        # Names lacking tags only match with fallbacks
+        wanted = parseBoostLibName("libboost_thread-gcc-mt.so")
+        assert index.findBest("thread", wanted) == "boost_thread-mt"
+        assert index.findBest("thread", wanted, allowFallbacks=False) is None
+        wanted = parseBoostLibName("libboost_system-msvc-mt.so")
+        assert index.findBest("system", wanted) == "boost_system"
+        assert index.findBest("regex", wanted) is None
+
+    def test_keepValidatedName(self):
+        """Test that variants with the same runtime use the validated names"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        # boost_system-gcc-mt is installed but failed the link test
+        self._install("boost_system-gcc-mt", "boost_system-mt")
+        self._validated("boost_system-mt")
+        assert self.boost.getFullLibName("system", self._variantEnv("optimized")) == "boost_system-mt"
+
+    def test_debugRuntime(self):
+        """Test that debug runtime variants only change the runtime part of the name"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        self._install("boost_system-gcc-mt", "boost_system-mt", "boost_system-gcc-mt-d")
+        self._validated("boost_system-mt")
+        env = self._variantEnv("debugrt")
+        # boost_system-mt-d is not installed
+        assert self.boost.getFullLibName("system", env) == "boost_system-mt"
+        self._install("boost_system-mt-d")
+        self.boost.clearVariantResults()
+        assert self.boost.getFullLibName("system", env) == "boost_system-mt-d"
+
+    def test_debugRuntimeLibName(self):
+        """Test adding the debug runtime tag to library names"""
+        assert debugRuntimeLibName("boost_system") == "boost_system-d"
+        assert debugRuntimeLibName("boost_system-gcc43-mt-1_38") == "boost_system-gcc43-mt-d-1_38"
+        assert debugRuntimeLibName("boost_system-gcc43-mt-s-1_38") == "boost_system-gcc43-mt-sd-1_38"
+        assert debugRuntimeLibName("boost_system-mt-gd") is None
+        assert debugRuntimeLibName("foo") is None
+
+    def test_debugRuntimeIndexed(self):
+        """Test the debug runtime of names that were picked from the installed libraries"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        self._install("boost_system-gcc43-mt-1_38")
+        self._validated("boost_system-gcc43-mt-1_38")
+        env = self._variantEnv("debugrt")
+        assert self.boost.getFullLibName("system", env) == "boost_system-gcc43-mt-1_38"
+        self._install("boost_system-gcc43-mt-d-1_38")
+        self.boost.clearVariantResults()
+        assert self.boost.getFullLibName("system", env) == "boost_system-gcc43-mt-d-1_38"
+
+    def test_variantResultsShared(self):
+        """Test that the names are resolved once per variant"""
+        self._validated("boost_system-mt")
+        calls = []
+        resolve = self.boost.resolveVariant
+        self.boost.resolveVariant = lambda env: calls.append(env) or resolve(env)
+        for i in range(3):
+            self.boost.getFullLibName("system", self._variantEnv("debug"))
+        self.boost.getFullLibName("system", self._variantEnv("debugrt"))
+        assert len(calls) == 2, calls
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(BoostTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -0,0 +1,184 @@
+"""SConsAddons.Options.CacheFile
+
+Reading and writing of the files options and detection results are saved in.
+
+Files are written as a header followed by a marshalled payload:
+
+   SCA-OPTIONS <format version> <md5 of payload>\\n<payload>
+
+This loads without executing any code and a truncated or corrupted file is
+detected by the checksum.  Files are replaced atomically and are not touched
+at all when their contents would not change.  Option files in the old format
+(python assignments, one per line) can still be loaded.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, sys, re, marshal
+
+try:
+   import hashlib
+   md5_new = hashlib.md5
+except ImportError:
+   import md5
+   md5_new = md5.new
+
+try:
+   from ast import literal_eval
+except ImportError:
+   literal_eval = None
+
+MAGIC = "SCA-OPTIONS"
+FORMAT_VERSION = 1
+
+_assign_re = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*)$')
+
+
+class CacheFileError(Exception):
+   """ Raised when a cache file exists but can not be used. """
+   pass
+
+
+def encode(data):
+   """ Return the file contents for data. """
+   payload = marshal.dumps(data)
+   return "%s %d %s\n%s" % (MAGIC, FORMAT_VERSION, md5_new(payload).hexdigest(), payload)
+
+def decode(contents):
+   """ Return the data stored in contents.  Raises CacheFileError if it is not valid. """
+   (header, sep, payload) = _partition(contents, "\n")
+   fields = header.split()
+   if len(fields) != 3 or fields[0] != MAGIC:
+      raise CacheFileError("not a cache file")
+   if fields[1] != str(FORMAT_VERSION):
+      raise CacheFileError("unsupported format version %s" % fields[1])
+   if md5_new(payload).hexdigest() != fields[2]:
+      raise CacheFileError("checksum mismatch, file is corrupt")
+   try:
+      return marshal.loads(payload)
+   except (EOFError, ValueError, TypeError), ex:
+      raise CacheFileError(str(ex))
+
+def _partition(s, sep):
+   i = s.find(sep)
+   if i < 0:
+      return (s, "", "")
+   return (s[:i], sep, s[i+len(sep):])
+
+def isCacheFile(filename):
+   """ Return true if filename is in the cache file format. """
+   try:
+      fh = open(filename, 'rb')
+      try:
+         return fh.read(len(MAGIC)) == MAGIC
+      finally:
+         fh.close()
+   except IOError:
+      return False
+
+
+def loadLegacy(filename):
+   """
+   Load an options file written in the old python format.
+   Every line is expected to be 'key = literal'.  If the file contains anything else
+   it is executed like it used to be, with a notice that it will be migrated.
+   """
+   values = {}
+   fh = open(filename, 'r')
+   try:
+      lines = fh.readlines()
+   finally:
+      fh.close()
+
+   if literal_eval is not None:
+      try:
+         for l in lines:
+            l = l.strip()
+            if not l or l.startswith('#'):
+               continue
+            m = _assign_re.match(l)
+            if not m:
+               raise ValueError(l)
+            values[m.group(1)] = literal_eval(m.group(2))
+         return values
+      except (ValueError, SyntaxError):
+         values = {}
+
+   print "Executing old options file %s, it is migrated when the options are saved." % filename
+   execfile(filename, values)
+   if values.has_key('__builtins__'):
+      del values['__builtins__']
+   return values
+
+def load(filename, legacy=True):
+   """
+   Return the data stored in filename or None if the file does not exist.
+   legacy - If true, files in the old python options format are loaded as well.
+   Raises CacheFileError if the file can not be used.
+   """
+   if not os.path.exists(filename):
+      return None
+   if legacy and not isCacheFile(filename):
+      return loadLegacy(filename)
+   try:
+      fh = open(filename, 'rb')
+      try:
+         contents = fh.read()
+      finally:
+         fh.close()
+   except IOError, ex:
+      raise CacheFileError(str(ex))
+   return decode(contents)
+
+def save(filename, data):
+   """
+   Write data to filename unless the file already holds exactly this data.
+   The file is written to a temporary file first and then renamed into place.
+   Returns true if the file was written.  IOError/OSError are passed on.
+   """
+   contents = encode(data)
+   if os.path.exists(filename):
+      try:
+         fh = open(filename, 'rb')
+         try:
+            if fh.read() == contents:
+               return False
+         finally:
+            fh.close()
+      except IOError:
+         pass
+
+   tmp_name = "%s.tmp%d" % (filename, os.getpid())
+   fh = open(tmp_name, 'wb')
+   try:
+      fh.write(contents)
+   finally:
+      fh.close()
+   try:
+      if sys.platform.startswith('win') and os.path.exists(filename):
+         os.remove(filename)    # rename does not replace files on windows
+      os.rename(tmp_name, filename)
+   except OSError:
+      os.remove(tmp_name)
+      raise
+   return True
@@ -0,0 +1,109 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import StringIO
+import sys
+import os
+
+import SConsAddons.Options.CacheFile as CacheFile
+
+
+class CacheFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "options.cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, contents):
+        fh = open(self.filename, "wb")
+        fh.write(contents)
+        fh.close()
+
+    def test_saveLoad(self):
+        """Test that saved data loads back the same"""
+        data = {"CXX":"g++", "LIBS":["m", "z"], "jobs":4, "debug":True, "path":None}
+        assert CacheFile.save(self.filename, data)
+        assert CacheFile.isCacheFile(self.filename)
+        assert CacheFile.load(self.filename) == data
+        assert CacheFile.load(self.filename, legacy=False) == data
+
+    def test_saveUnchanged(self):
+        """Test that files are only written when the data changed"""
+        assert CacheFile.save(self.filename, {"a":1})
+        os.utime(self.filename, (1000, 1000))
+        assert not CacheFile.save(self.filename, {"a":1})
+        assert os.path.getmtime(self.filename) == 1000
+        assert CacheFile.save(self.filename, {"a":2})
+        assert os.listdir(self.tmpdir) == ["options.cache"]
+
+    def test_missing(self):
+        """Test that missing files load as None"""
+        assert CacheFile.load(self.filename) is None
+
+    def test_corrupt(self):
+        """Test that corrupt and truncated files are detected"""
+        CacheFile.save(self.filename, {"a":"value"})
+        contents = open(self.filename, "rb").read()
+        for bad in (contents[:-2], contents[:-1] + "x", "SCA-OPTIONS 99 0\n",
+                    "SCA-OPTIONS garbage"):
+            self._write(bad)
+            try:
+                CacheFile.load(self.filename)
+            except CacheFile.CacheFileError:
+                pass
+            else:
+                assert False, "corrupt file %r was loaded" % bad
+
+    def test_legacy(self):
+        """Test loading options files in the old python format"""
+        self._write("# Options\nCXX = 'g++'\nLIBS = ['m', 'z']\n\nJOBS = 2\n")
+        assert CacheFile.load(self.filename) == {"CXX":"g++", "LIBS":["m", "z"], "JOBS":2}
+        try:
+            CacheFile.load(self.filename, legacy=False)
+        except CacheFile.CacheFileError:
+            pass
+        else:
+            assert False, "old format was loaded"
+
+    def test_legacyCode(self):
+        """Test that old options files with code in them still load"""
+        self._write("import os\nPREFIX = os.path.join('/opt', 'foo')\n")
+        saved = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            out = sys.stdout
+            values = CacheFile.load(self.filename)
+        finally:
+            sys.stdout = saved
+        assert values["PREFIX"] == "/opt/foo"
+        assert out.getvalue().find(self.filename) >= 0, out.getvalue()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(CacheFileTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
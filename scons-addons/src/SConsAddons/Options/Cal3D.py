@@ -28,6 +28,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment   # Get the environment crap
 import SCons
 import SConsAddons.Options   # Get the modular options stuff
+import SConsAddons.Util
 import SCons.Util
 import sys
 import os
@@ -111,7 +112,7 @@ class Cal3D(SConsAddons.Options.PackageOption):
 
          # find base dir
          self.baseDir = os.path.dirname(os.path.dirname(os.path.dirname(ver_header)))
-         if not os.path.isdir(self.baseDir):
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"% self.baseDir)
             self.baseDir = None
          else:
@@ -125,22 +126,22 @@ class Cal3D(SConsAddons.Options.PackageOption):
       if not self.baseDir:
          self.checkRequired("Cal3D base dir not set")
          return
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          self.checkRequired("Cal3D base dir does not exist:%s"%self.baseDir);
          return
-      if not os.path.isfile(pj(self.baseDir, 'include', 'cal3d', 'cal3d.h')):
+      if not SConsAddons.Util.isFile(pj(self.baseDir, 'include', 'cal3d', 'cal3d.h')):
          self.checkRequired("cal3d.h:%s"%self.baseDir);
          return
 
       # Check the version header is there         
       version_header = pj(self.baseDir, 'include', 'cal3d', 'global.h')
-      if not os.path.isfile(version_header):
+      if not SConsAddons.Util.isFile(version_header):
          self.checkRequired("Cal3D global.h header does not exist:%s"%version_header)
          return
 
       # --- Check version requirement --- #
-      ver_file = file(version_header)
-      ver_match = re.search("LIBRARY_VERSION\s=\s(\d*)", ver_file.read())
+      ver_file_contents = SConsAddons.Util.readFile(version_header) or ""
+      ver_match = re.search("LIBRARY_VERSION\s=\s(\d*)", ver_file_contents)
       if not ver_match:
          self.checkRequired("   could not find LIBRARY_VERSION in file: %s"%version_header)
          return
@@ -0,0 +1,253 @@
+"""SConsAddons.Options.CheckCache
+
+Shared cache of configure check results.
+
+The same header and library checks get run for every environment, variant and
+checkout on a build host.  When the cache is active, the checks run through
+SConsAddons.Options.Configure are looked up in a user level directory first.
+Entries are addressed by a hash of everything the check depends on: the
+compiler identity, the relevant construction variables, the state of the
+search directories, the check and its arguments, and the SCons version.
+Only successful checks are stored.  A failed check is run again every time,
+the directory state in the key can not tell when the missing header or
+library gets installed.
+
+The cache directory defaults to ~/.scons-addons/checks and can be set with the
+SCONSADDONS_CACHE_DIR environment variable.  Writers take a lock file in that
+directory and the least recently used entries are evicted once there are more
+than maxEntries of them.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, time, errno
+import SCons
+import SCons.Util
+import ResultCache
+import CacheFile
+
+cacheDirEnvVar = "SCONSADDONS_CACHE_DIR"
+cacheEnableEnvVar = "SCONSADDONS_CHECK_CACHE"
+
+# Construction variables that go into the key of each check
+keyVars = ['CPPPATH', 'LIBPATH', 'LIBS', 'CPPDEFINES', 'LINKFLAGS', 'CCFLAGS', 'CXXFLAGS', 'CFLAGS']
+
+# Directories searched by the compiler and linker without being in CPPPATH/LIBPATH
+systemDirs = ['/usr/include', '/usr/local/include', '/usr/lib', '/usr/lib64',
+              '/usr/local/lib', '/usr/local/lib64']
+
+# Checks that can be cached: name -> (index, name) of the autoadd argument or None
+cachedChecks = {'CheckLib':(4, 'autoadd'),
+                'CheckLibWithHeader':(4, 'autoadd'),
+                'CheckHeader':None, 'CheckCHeader':None, 'CheckCXXHeader':None,
+                'CheckFunc':None, 'CheckType':None, 'CheckDeclaration':None,
+                'TryCompile':None, 'TryLink':None}
+
+# The cache in use, if any
+activeCache = None
+
+
+def getUserCacheDir():
+   """ Return the user level directory that scons-addons caches data in. """
+   d = os.environ.get(cacheDirEnvVar)
+   if not d:
+      d = os.path.join(os.path.expanduser("~"), ".scons-addons")
+   return d
+
+def getCacheDir():
+   """ Return the directory the shared check cache is stored in. """
+   return os.path.join(getUserCacheDir(), "checks")
+
+def isEnabledByEnvironment():
+   return os.environ.get(cacheEnableEnvVar, "").lower() in ("1", "yes", "true", "on")
+
+def activate(directory=None):
+   """ Start serving configure checks from the cache in directory. """
+   global activeCache
+   if directory is None:
+      directory = getCacheDir()
+   if activeCache is None or activeCache.directory != directory:
+      activeCache = CheckCache(directory)
+   return activeCache
+
+def deactivate(previous=None):
+   """ Stop serving configure checks from the cache, making previous the active cache again. """
+   global activeCache
+   activeCache = previous
+
+
+class CheckCache(object):
+   """ Directory of check results, one file per check named by its key. """
+   label = "cached"        # Shown with the results served from the cache
+   maxEntries = 5000
+   lockTimeout = 30        # seconds to wait for the lock
+   staleLockAge = 120      # locks older than this are assumed to be left over
+
+   def __init__(self, directory):
+      self.directory = directory
+      self.lockFile = os.path.join(directory, ".lock")
+
+   def getKey(self, env, checkName, args, kw):
+      edict = env.Dictionary()
+      dirs = []
+      for v in ('CPPPATH', 'LIBPATH'):
+         dirs.extend([str(d) for d in SCons.Util.Split(edict.get(v, []))])
+      dirs.extend(systemDirs)
+      parts = [getattr(SCons, "__version__", None),
+               ResultCache.getToolchainIdentity(env),
+               [(v, ResultCache.canonical(edict.get(v))) for v in keyVars],
+               [(d, ResultCache.statPath(d)) for d in dirs],
+               checkName,
+               ResultCache.canonical(list(args)),
+               ResultCache.canonical(kw)]
+      return ResultCache.md5_new(repr(parts)).hexdigest()
+
+   def _path(self, key):
+      return os.path.join(self.directory, key)
+
+   def lookup(self, key):
+      """ Return (found, result) for the check with the given key. """
+      path = self._path(key)
+      try:
+         result = CacheFile.load(path, legacy=False)
+      except (CacheFile.CacheFileError, OSError, IOError):
+         return (False, None)
+      if result is None:
+         return (False, None)
+      try:
+         os.utime(path, None)        # Mark as recently used
+      except OSError:
+         pass
+      return (True, result)
+
+   def store(self, key, result):
+      # Failures are not stored so installing the package is noticed right away
+      if not result:
+         return
+      if not self._lock():
+         return
+      try:
+         try:
+            CacheFile.save(self._path(key), result)
+            self._evict()
+         except (IOError, OSError, ValueError), ex:
+            print "Could not write to check cache [%s]: %s" % (self.directory, ex)
+      finally:
+         self._unlock()
+
+   def _evict(self):
+      entries = [f for f in os.listdir(self.directory) if not f.startswith(".")]
+      if len(entries) <= self.maxEntries:
+         return
+      aged = []
+      for f in entries:
+         try:
+            aged.append((os.path.getmtime(self._path(f)), f))
+         except OSError:
+            pass
+      aged.sort()
+      for (mtime, f) in aged[:len(aged) - self.maxEntries]:
+         try:
+            os.remove(self._path(f))
+         except OSError:
+            pass
+
+   def _lock(self):
+      if not os.path.isdir(self.directory):
+         try:
+            os.makedirs(self.directory)
+         except OSError:
+            if not os.path.isdir(self.directory):
+               return False
+      deadline = time.time() + self.lockTimeout
+      while True:
+         try:
+            os.close(os.open(self.lockFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+         except OSError, ex:
+            if ex.errno != errno.EEXIST:
+               return False
+         try:
+            if time.time() - os.path.getmtime(self.lockFile) > self.staleLockAge:
+               os.remove(self.lockFile)
+               continue
+         except OSError:
+            continue
+         if time.time() > deadline:
+            return False
+         time.sleep(0.05)
+
+   def _unlock(self):
+      try:
+         os.remove(self.lockFile)
+      except OSError:
+         pass
+
+
+class CachedCheck(object):
+   """ Wraps a check of a configure context to serve its result from the cache. """
+   def __init__(self, cache, context, name, check):
+      self.cache = cache
+      self.context = context
+      self.name = name
+      self.check = check
+
+   def __call__(self, *args, **kw):
+      if not isCacheable(self.name, args, kw):
+         return self.check(*args, **kw)
+      env = self.context.env
+      key = self.cache.getKey(env, self.name, args, kw)
+      (found, result) = self.cache.lookup(key)
+      if not found:
+         result = self.check(*args, **kw)
+         if ResultCache.isPlainData(result):
+            self.cache.store(key, result)
+         return result
+
+      if self.name.startswith("Check"):
+         # Try* do not print anything themselves, their callers do
+         print "%s%s... (%s) %s" % (self.name, tuple(args), self.cache.label,
+                                     (result and "yes") or "no")
+      # Do what the check would have done to the environment
+      autoadd = cachedChecks.get(self.name)
+      if result and autoadd is not None:
+         (index, arg_name) = autoadd
+         if len(args) > index:
+            add = args[index]
+         else:
+            add = kw.get(arg_name, 1)
+         libs = args and args[0] or kw.get('library', kw.get('libs'))
+         if add and libs:
+            env.Append(LIBS = SCons.Util.Split(libs))
+      return result
+
+def isCacheable(name, args, kw):
+   """ Return true if the check name called with args can be served from the cache. """
+   if not cachedChecks.has_key(name):
+      return False
+   if 'CheckLib' == name:
+      # With several candidate libraries we would not know which one to add
+      libs = args and args[0] or kw.get('library')
+      if SCons.Util.is_List(libs) and len(libs) != 1:
+         return False
+   return True
@@ -0,0 +1,101 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+
+import SCons.Environment
+import SConsAddons.Options.CheckCache as CheckCache
+
+
+class Context:
+    def __init__(self, env):
+        self.env = env
+
+class Check:
+    """ Check that returns the given result and counts its calls. """
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+    def __call__(self, *args, **kw):
+        self.calls += 1
+        return self.result
+
+
+class CheckCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = CheckCache.CheckCache(self.tmpdir)
+        self.env = SCons.Environment.Environment()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_store(self):
+        """Test that only successful results are stored"""
+        key = self.cache.getKey(self.env, "CheckCHeader", ("foo.h",), {})
+        self.cache.store(key, 0)
+        assert self.cache.lookup(key) == (False, None)
+        self.cache.store(key, 1)
+        assert self.cache.lookup(key) == (True, 1)
+
+    def test_getKey(self):
+        """Test that the key covers the check, its arguments and the environment"""
+        key = self.cache.getKey(self.env, "CheckCHeader", ("foo.h",), {})
+        assert key == self.cache.getKey(self.env, "CheckCHeader", ("foo.h",), {})
+        assert key != self.cache.getKey(self.env, "CheckCHeader", ("bar.h",), {})
+        assert key != self.cache.getKey(self.env, "CheckCXXHeader", ("foo.h",), {})
+        env = self.env.Clone(CPPDEFINES=["FOO"])
+        assert key != self.cache.getKey(env, "CheckCHeader", ("foo.h",), {})
+
+    def test_failedCheck(self):
+        """Test that failed checks are run every time"""
+        check = Check(0)
+        cached = CheckCache.CachedCheck(self.cache, Context(self.env), "CheckCHeader", check)
+        assert not cached("foo.h")
+        assert not cached("foo.h")
+        assert check.calls == 2
+
+    def test_passedCheck(self):
+        """Test that passed checks are served from the cache"""
+        check = Check(1)
+        context = Context(self.env)
+        assert CheckCache.CachedCheck(self.cache, context, "CheckLib", check)("m")
+        assert CheckCache.CachedCheck(self.cache, context, "CheckLib", check)("m")
+        assert check.calls == 1
+        # The library is added like CheckLib would
+        assert self.env["LIBS"] == ["m"], self.env["LIBS"]
+
+    def test_isCacheable(self):
+        """Test which checks can be cached"""
+        assert CheckCache.isCacheable("CheckLib", ("m",), {})
+        assert CheckCache.isCacheable("CheckLib", (["m"],), {})
+        assert not CheckCache.isCacheable("CheckLib", (["m", "z"],), {})
+        assert not CheckCache.isCacheable("CheckProg", ("gcc",), {})
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(CheckCacheTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
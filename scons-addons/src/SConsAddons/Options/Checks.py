@@ -0,0 +1,210 @@
+"""SConsAddons.Options.Checks
+
+Batched configure checks.
+
+Instead of running one compile or link test per header and library, checkBatch()
+builds a single translation unit that includes all the headers and links it
+against all the libraries.  Only when that fails are the headers and libraries
+bisected to find the ones that do not work.  When everything is present (the
+common case) N checks turn into a single compiler and linker run.
+
+checkHeader() checks that a header is available without generating code.  With
+compilers that support it the test source is only syntax checked or only
+preprocessed, which is much faster for headers full of templates.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os
+import SCons.Util
+
+extensions = {"C":".c", "C++":".cpp", "CXX":".cpp"}
+
+# Header check modes
+FULL_COMPILE = "compile"        # Compile an object file, like CheckCXXHeader
+SYNTAX_ONLY = "syntax"          # Parse the source but do not generate code
+PREPROCESS_ONLY = "preprocess"  # Only run the preprocessor (finds the headers, nothing more)
+
+# Mode used by checkHeader() and for the header checks of checkBatch() when none is given
+headerCheckMode = SYNTAX_ONLY
+
+# Compiler flags for each mode by compiler family
+modeFlags = {"gcc":{SYNTAX_ONLY:["-fsyntax-only"], PREPROCESS_ONLY:["-E"]},
+             "msvc":{SYNTAX_ONLY:["/Zs"], PREPROCESS_ONLY:["/Zs"]}}
+
+
+def getSource(headers):
+   """ Return source of a program that includes all the given headers. """
+   lines = ['#include "%s"\n' % h for h in headers]
+   lines.append("\nint main(int argc, char** argv)\n{\n   return 0;\n}\n")
+   return "".join(lines)
+
+def getCompilerFamily(env, language="C++"):
+   """ Return the family of the compiler env uses for language, or None if it is unknown. """
+   if extensions.get(language.upper(), ".cpp") == ".c":
+      cc = env.get('CC')
+   else:
+      cc = env.get('CXX')
+   if not SCons.Util.is_String(cc) or not cc.split():
+      return None
+   name = os.path.basename(cc.split()[-1]).lower()
+   if name.endswith(".exe"):
+      name = name[:-4]
+   if "cl" == name:
+      return "msvc"
+   for n in ("gcc", "g++", "c++", "cc", "clang", "clang++", "icc", "icpc"):
+      if name == n or name.startswith(n + "-"):
+         return "gcc"
+   return None
+
+def getModeFlags(env, mode, language="C++"):
+   """ Return the flags that make the compiler of env check in mode, or None if it can not. """
+   if FULL_COMPILE == mode:
+      return []
+   return modeFlags.get(getCompilerFamily(env, language), {}).get(mode)
+
+def tryCompileMode(context, source, ext, mode):
+   """ TryCompile source in context using mode.  Falls back to a full compile when the
+       compiler has no flags for mode.
+   """
+   env = context.env
+   flags = getModeFlags(env, mode, (".c" == ext and "C") or "C++")
+   if not flags:
+      return context.TryCompile(source, ext)
+   saved_flags = env.get('CCFLAGS')
+   env.Append(CCFLAGS = flags)
+   try:
+      return context.TryCompile(source, ext)
+   finally:
+      if saved_flags is None:
+         del env['CCFLAGS']
+      else:
+         env['CCFLAGS'] = saved_flags
+
+def checkHeader(context, header, language="C++", mode=None):
+   """
+   Check that header (or list of headers) can be included.
+
+   Use in place of context.CheckCXXHeader/CheckCHeader when only the availability of the
+   header matters.  mode is one of SYNTAX_ONLY, PREPROCESS_ONLY and FULL_COMPILE and
+   defaults to headerCheckMode.
+   """
+   if mode is None:
+      mode = headerCheckMode
+   headers = SCons.Util.Split(header)
+   print "Checking for %s header file %s... " % (language, ", ".join(headers)),
+   ret = tryCompileMode(context, getSource(headers), extensions.get(language.upper(), ".cpp"),
+                        mode)
+   print (ret and "yes") or "no"
+   return ret
+
+def bisect(items, test):
+   """ Return the items for which test fails.  test is called with lists of items and is
+       expected to pass for a list if it passes for each of its items.
+   """
+   if not items or test(items):
+      return []
+   if len(items) == 1:
+      return list(items)
+   mid = len(items) / 2
+   return bisect(items[:mid], test) + bisect(items[mid:], test)
+
+
+class BatchChecker(object):
+   """ Runs compile and link tests for sets of headers and libraries in a configure context. """
+   def __init__(self, context, libs, language="C++", extraLibs=None, headerMode=None):
+      self.context = context
+      self.headerMode = headerMode or headerCheckMode
+      self.env = context.env
+      self.ext = extensions.get(language.upper(), ".cpp")
+      self.extraLibs = extraLibs or []
+      # Libraries under test are taken out of the environment so each test only links the
+      # subset it is given.
+      libs_under_test = {}
+      for l in libs:
+         libs_under_test[l] = True
+      self.baseLibs = [l for l in SCons.Util.Split(self.env.get('LIBS', []))
+                       if not libs_under_test.has_key(l)]
+
+   def tryCompile(self, headers):
+      return tryCompileMode(self.context, getSource(headers), self.ext, self.headerMode)
+
+   def tryLink(self, headers, libs):
+      saved_libs = self.env.get('LIBS')
+      self.env['LIBS'] = self.baseLibs + list(libs) + self.extraLibs
+      try:
+         return self.context.TryLink(getSource(headers), self.ext)
+      finally:
+         if saved_libs is None:
+            del self.env['LIBS']
+         else:
+            self.env['LIBS'] = saved_libs
+
+
+def checkBatch(context, headers=None, libs=None, language="C++", extraLibs=None, headerMode=None):
+   """
+   Check that a program including all headers compiles and links against all libs.
+
+   context   - Configure context to run the tests in.
+   headers   - List of headers to include.
+   libs      - List of libraries to link against.  Any of these that are already in the
+               LIBS of the context environment are taken out during the checks.
+   extraLibs - Libraries that are always linked in (not checked themselves).
+   headerMode - Mode of the compile tests that find failed headers (see checkHeader).
+   Returns (failed headers, failed libs).  Both are empty if everything worked.
+   """
+   headers = list(headers or [])
+   libs = list(libs or [])
+   checker = BatchChecker(context, libs, language, extraLibs, headerMode)
+   if not libs:
+      # Nothing to link, so the headers only need to be found
+      return (checkHeaders(checker, headers), [])
+
+   print "Checking for %s... " % ", ".join(headers + libs),
+   if checker.tryLink(headers, libs):
+      print "yes"
+      return ([], [])
+   print "no"
+
+   bad_headers = bisect(headers, checker.tryCompile)
+   good_headers = [h for h in headers if h not in bad_headers]
+   bad_libs = bisect(libs, lambda l: checker.tryLink(good_headers, l))
+   if not bad_headers and not bad_libs:
+      # Each works alone but not all together, so none of them can be trusted
+      (bad_headers, bad_libs) = (headers, libs)
+   if bad_headers:
+      print "   failed headers: %s" % ", ".join(bad_headers)
+   if bad_libs:
+      print "   failed libraries: %s" % ", ".join(bad_libs)
+   return (bad_headers, bad_libs)
+
+def checkHeaders(checker, headers):
+   """ Return the headers that fail to compile with checker. """
+   if not headers:
+      return []
+   print "Checking for %s... " % ", ".join(headers),
+   bad_headers = bisect(headers, checker.tryCompile)
+   print (bad_headers and "no") or "yes"
+   if bad_headers:
+      print "   failed headers: %s" % ", ".join(bad_headers)
+   return bad_headers
@@ -0,0 +1,134 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SCons.Node.FS
+import SCons.SConf
+import SConsAddons.Options as Options
+import SConsAddons.Options.Checks as Checks
+from SConsAddons.Util import WhereIs
+
+
+class ChecksTestCase(unittest.TestCase):
+    """ Runs configure checks in a scratch directory, they write to the cwd. """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        # Start with a new file system, SCons keeps the first one it makes for good
+        SCons.Node.FS.default_fs = None
+        SCons.SConf.SConfFS = None
+        self.env = SCons.Environment.Environment(CPPPATH=[self.tmpdir])
+        self.hasCompiler = WhereIs("gcc") and WhereIs("g++")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_bisect(self):
+        """Test finding the failing items with as few tests as possible"""
+        tests = []
+        def test(items):
+            tests.append(list(items))
+            return not [i for i in items if i.startswith("bad")]
+        assert Checks.bisect([], test) == []
+        assert Checks.bisect(["a", "b", "c"], test) == []
+        assert len(tests) == 1
+        tests = []
+        items = ["a", "bad1", "c", "d", "e", "f", "g", "bad2"]
+        assert Checks.bisect(items, test) == ["bad1", "bad2"]
+        assert len(tests) < 2 * len(items), tests
+
+    def test_getSource(self):
+        """Test the source of the batched checks"""
+        source = Checks.getSource(["a.h", "b/c.h"])
+        assert source.startswith('#include "a.h"\n#include "b/c.h"\n'), source
+        assert source.find("int main(") >= 0, source
+
+    def test_checkBatch(self):
+        """Test that the failing headers and libraries are found"""
+        if not self.hasCompiler:
+            return
+        conf = Options.Configure(self.env)
+        try:
+            assert Checks.checkBatch(conf, ["stdio.h", "stdlib.h"], ["m"]) == ([], [])
+            assert Checks.checkBatch(conf, ["stdio.h", "Batch_missing.h"], ["m", "batch_missing"]) == \
+                   (["Batch_missing.h"], ["batch_missing"])
+            assert Checks.checkBatch(conf, ["stdio.h", "Batch_missing.h"]) == (["Batch_missing.h"], [])
+            # The libraries under test are taken out of LIBS while checking
+            self.env["LIBS"] = ["batch_missing", "m"]
+            assert Checks.checkBatch(conf, ["stdio.h"], ["batch_missing"]) == ([], ["batch_missing"])
+            assert self.env["LIBS"] == ["batch_missing", "m"]
+        finally:
+            conf.Finish()
+
+    def test_getCompilerFamily(self):
+        """Test recognizing compilers by name"""
+        for (cxx, family) in (("g++", "gcc"), ("/usr/bin/g++-9", "gcc"), ("ccache clang++", "gcc"),
+                              ("icpc", "gcc"), ("cl", "msvc"), ("CL.EXE", "msvc"),
+                              ("mycxx", None), ("", None)):
+            env = SCons.Environment.Environment(tools=[], CXX=cxx, CC="gcc")
+            assert Checks.getCompilerFamily(env) == family, cxx
+            assert Checks.getCompilerFamily(env, "C") == "gcc", cxx
+
+    def test_getModeFlags(self):
+        """Test the flags of the header check modes"""
+        env = SCons.Environment.Environment(tools=[], CXX="g++")
+        assert Checks.getModeFlags(env, Checks.FULL_COMPILE) == []
+        assert Checks.getModeFlags(env, Checks.SYNTAX_ONLY) == ["-fsyntax-only"]
+        assert Checks.getModeFlags(env, Checks.PREPROCESS_ONLY) == ["-E"]
+        env = SCons.Environment.Environment(tools=[], CXX="mycxx")
+        assert Checks.getModeFlags(env, Checks.SYNTAX_ONLY) is None
+
+    def test_checkHeader(self):
+        """Test what each header check mode finds"""
+        if not self.hasCompiler:
+            return
+        fh = open(os.path.join(self.tmpdir, "Broken.h"), "w")
+        fh.write("int broken = undeclared_name;\n")
+        fh.close()
+        self.env["CCFLAGS"] = ["-O0"]
+        conf = Options.Configure(self.env)
+        try:
+            for mode in (Checks.FULL_COMPILE, Checks.SYNTAX_ONLY, Checks.PREPROCESS_ONLY):
+                assert Checks.checkHeader(conf, "stdio.h", mode=mode), mode
+                assert not Checks.checkHeader(conf, "Header_missing.h", mode=mode), mode
+            # Only the preprocessor does not see the error
+            assert not Checks.checkHeader(conf, "Broken.h", mode=Checks.FULL_COMPILE)
+            assert not Checks.checkHeader(conf, "Broken.h", mode=Checks.SYNTAX_ONLY)
+            assert Checks.checkHeader(conf, "Broken.h", mode=Checks.PREPROCESS_ONLY)
+            assert Checks.checkHeader(conf, "stdio.h stdlib.h", "C")
+            assert self.env["CCFLAGS"] == ["-O0"]
+        finally:
+            conf.Finish()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ChecksTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -35,8 +35,8 @@ import sys, os, re, string
 from SCons.Util import WhereIs
 pj = os.path.join;
 
-import SCons.SConf
-Configure = SCons.SConf.SConf     # Use same alias as SConsctruct sees
+import SConsAddons.Options.Checks as Checks
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 
 class CppDom(SConsAddons.Options.PackageOption):
@@ -92,14 +92,14 @@ class CppDom(SConsAddons.Options.PackageOption):
       
       # Find cppdom-config and call it to get the other arguments
       sys.stdout.write("searching...\n");
-      self.cppdomconfig_cmd = WhereIs('cppdom-config');
+      self.cppdomconfig_cmd = SConsAddons.Util.whereIs('cppdom-config');
       if None == self.cppdomconfig_cmd:
          self.checkRequired("   could not find cppdom-config.");
       else:
          sys.stdout.write("   found cppdom-config: %s"%self.cppdomconfig_cmd);
          # find base dir
-         self.baseDir = os.popen(self.cppdomconfig_cmd + " --prefix").read().strip();
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = SConsAddons.Util.readCommand([self.cppdomconfig_cmd, "--prefix"]);
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"% self.baseDir);
             self.baseDir = None;
          else:
@@ -112,12 +112,12 @@ class CppDom(SConsAddons.Options.PackageOption):
       # Check that an include file: include/vpr/vprConfig.h  exists
       # Update the temps for later usage
       passed = True
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("cppdom base dir does not exist:%s"%self.baseDir)
       
       # If cppdom-config exists and we are not on windows, use it.
-      has_config_cmd = os.path.isfile(self.cppdomconfig_cmd) and \
+      has_config_cmd = SConsAddons.Util.isFile(self.cppdomconfig_cmd) and \
          not SConsAddons.Util.GetPlatform() == "win32"
 
       if not has_config_cmd:
@@ -130,16 +130,16 @@ class CppDom(SConsAddons.Options.PackageOption):
       header_file = pj('cppdom', 'cppdom.h')
       base_include = pj(self.baseDir,'include')
       # check standard directory first
-      if os.path.isfile(pj(base_include, header_file)):
+      if SConsAddons.Util.isFile(pj(base_include, header_file)):
          inc_dir = base_include
       # check versioned directories by building a list and sorting them
-      elif os.path.exists(base_include):
-         pot_dirs = [pj(base_include,d) for d in os.listdir(base_include)\
+      elif SConsAddons.Util.pathExists(base_include):
+         pot_dirs = [pj(base_include,d) for d in SConsAddons.Util.listDir(base_include)\
                                               if d.count("cppdom")]
          pot_dirs.sort()
          pot_dirs.reverse()         
          for d in pot_dirs:
-            if os.path.isfile(pj(d,header_file)):
+            if SConsAddons.Util.isFile(pj(d,header_file)):
                inc_dir = d
                break
          
@@ -152,7 +152,7 @@ class CppDom(SConsAddons.Options.PackageOption):
       # --- Check version requirement --- #
       req_ver = [int(n) for n in self.requiredVersion.split(".")]
       version_header = pj(inc_dir,'cppdom','version.h')
-      if not os.path.isfile(version_header):
+      if not SConsAddons.Util.isFile(version_header):
          passed = False
          self.checkRequired("%s does not exist.  Can not determin gmtl version."%version_header)
       found_ver = GetCppDomVersion(version_header)
@@ -185,15 +185,16 @@ class CppDom(SConsAddons.Options.PackageOption):
       conf_env = env.Clone();                     # Make a copy of the env
       self.apply(conf_env);                  # Update it with the guessed values
       conf_ctxt = Configure(conf_env);
-      if not conf_ctxt.CheckCXXHeader(pj("cppdom", "cppdom.h")):
-         passed = False;
-         self.checkRequired("Can't compile with cppdom.h");
+      try:
+         if not Checks.checkHeader(conf_ctxt, pj("cppdom", "cppdom.h")):
+            passed = False;
+            self.checkRequired("Can't compile with cppdom.h");
 #      if not conf_ctxt.CheckLibWithHeader(library=None, header="cppdom/cppdom.h", language="c++",
 #                                          call = "cppdom::ContextPtr ctx( new cppdom::Context );", autoadd=0):
 #         passed = False;
 #         self.checkRequired("Can't compile with cppdom.");
-         
-      conf_ctxt.Finish();
+      finally:
+         conf_ctxt.Finish()
      
       # If we don't pass, then clear everything out
       if not passed:
@@ -223,6 +224,14 @@ class CppDom(SConsAddons.Options.PackageOption):
          if self.preferDynamic:
             env.AppendUnique(CPPDEFINES = ['CPPDOM_DYN_LINK'])
    
+   def getCacheDependencies(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         return [WhereIs('cppdom-config')]
+      return [pj(base_dir, 'bin', 'cppdom-config'),
+              pj(base_dir, 'include', 'cppdom', 'version.h'),
+              pj(base_dir, 'lib')]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
@@ -238,7 +247,7 @@ def GetCppDomVersion(versionHeader):
    """Gets the CppDom version from cppdom/version.h.
       Returns version as tuple (major,minor,patch)
    """
-   contents = open(versionHeader, 'r').read()
+   contents = SConsAddons.Util.readFile(versionHeader) or ""
    major = re.compile('.*(#define *CPPDOM_VERSION_MAJOR *(\d+)).*', re.DOTALL).sub(r'\2', contents)
    minor = re.compile('.*(#define *CPPDOM_VERSION_MINOR *(\d+)).*', re.DOTALL).sub(r'\2', contents)
    patch = re.compile('.*(#define *CPPDOM_VERSION_PATCH *(\d+)).*', re.DOTALL).sub(r'\2', contents)
@@ -34,11 +34,13 @@ import sys, os, re, string
 from SCons.Util import WhereIs
 pj = os.path.join
 
-import SCons.SConf
-Configure = SCons.SConf.SConf     # Use same alias as SConsctruct sees
+import SConsAddons.Options.Checks as Checks
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 
 class CppUnit(SConsAddons.Options.PackageOption):
+   variantKeys = ["type"]       # The windows library depends on the runtime type
+
    def __init__(self, name, requiredVersion, required=True, useCppPath=False):
       """
          name - The name to use for this option
@@ -89,18 +91,18 @@ class CppUnit(SConsAddons.Options.PackageOption):
       
       # Find cppunit-config and call it to get the other arguments
       sys.stdout.write("searching...\n");
-      self.cppunitconfig_cmd = WhereIs('cppunit-config');
+      self.cppunitconfig_cmd = SConsAddons.Util.whereIs('cppunit-config');
       if None == self.cppunitconfig_cmd:
          self.checkRequired("   could not find cppunit-config. Use %s to specify it: Ex: %s=/usr/local"% 
                            (self.baseDirKey, self.baseDirKey) );
       else:
          sys.stdout.write("   found cppunit-config.\n");
-         found_ver_str = os.popen(self.cppunitconfig_cmd + " --version").read().strip();
+         found_ver_str = SConsAddons.Util.readCommand([self.cppunitconfig_cmd, "--version"]);
          sys.stdout.write("   version:%s"%found_ver_str);
          
          # find base dir
-         self.baseDir = os.popen(self.cppunitconfig_cmd + " --prefix").read().strip();
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = SConsAddons.Util.readCommand([self.cppunitconfig_cmd, "--prefix"]);
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"% self.baseDir);
             self.baseDir = None;
          else:
@@ -116,11 +118,11 @@ class CppUnit(SConsAddons.Options.PackageOption):
       if not self.baseDir:
          self.checkRequired("cppunit base dir not found");
          return
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("cppunit base dir does not exist:%s"%self.baseDir);
          return
-      has_config_cmd = os.path.isfile(self.cppunitconfig_cmd)
+      has_config_cmd = SConsAddons.Util.isFile(self.cppunitconfig_cmd)
       
       if not has_config_cmd:
          print "Can not find %s. Limping along without it."%self.cppunitconfig_cmd
@@ -140,7 +142,7 @@ class CppUnit(SConsAddons.Options.PackageOption):
       inc_dir = pj(self.baseDir,'include')
       lib_dir = pj(self.baseDir,'lib')
       header_file = pj(inc_dir, 'cppunit', 'Test.h');
-      if not os.path.isfile(header_file):
+      if not SConsAddons.Util.isFile(header_file):
          passed = False;
          self.checkRequired("Header not found:%s"%header_file);
       
@@ -159,7 +161,7 @@ class CppUnit(SConsAddons.Options.PackageOption):
             for pair in (("hybrid","cppunith_dll"),
                          ("debug","cppunitd_dll"),
                          ("optimize","cppunit_dll")):
-               if os.path.isfile(pj(lib_dir,pair[1]+".dll")):
+               if SConsAddons.Util.isFile(pj(lib_dir,pair[1]+".dll")):
                   print "Found variant lib: ", pair
                   self.variant_libs[pair[0]] = [pair[1]]
             # Set defaults as needed
@@ -180,15 +182,16 @@ class CppUnit(SConsAddons.Options.PackageOption):
       conf_env = env.Clone()                 # Make a copy of the env
       self.apply(conf_env)                  # Update it with the guessed values
       conf_ctxt = Configure(conf_env);
-      if not conf_ctxt.CheckCXXHeader(pj("cppunit", "Test.h")):
-         passed = False;
-         self.checkRequired("Can't compile with cppunit/Test.h");
-      if len(self.found_libs):
-         if not conf_ctxt.CheckLib(self.found_libs[0], autoadd=0):
-            passed = False
-            self.checkRequired("Can't compile with cppunit.")
-         
-      conf_ctxt.Finish()
+      try:
+         if not Checks.checkHeader(conf_ctxt, pj("cppunit", "Test.h")):
+            passed = False;
+            self.checkRequired("Can't compile with cppunit/Test.h");
+         if len(self.found_libs):
+            if not conf_ctxt.CheckLib(self.found_libs[0], autoadd=0):
+               passed = False
+               self.checkRequired("Can't compile with cppunit.")
+      finally:
+         conf_ctxt.Finish()
      
       # If we don't pass, then clear everything out
       if not passed:
@@ -215,17 +218,35 @@ class CppUnit(SConsAddons.Options.PackageOption):
          env.Append(LIBPATH = self.found_lib_paths);
 
       if SConsAddons.Util.GetPlatform() == "win32":
-         found_libs = ['cppdom_dll']
-         if env.has_key("variant") and env["variant"].has_key("type"):
-            var_type = env["variant"]["type"]
-            var_lib = self.variant_libs[var_type]
-            if var_lib:
-               found_libs = var_lib
-         print "Windows variant found libs: ", found_libs
-         env.Append(LIBS = found_libs)
+         env.Append(LIBS = self.getVariantResult(env))
       elif self.found_libs:
          env.Append(LIBS = self.found_libs)
 
+   def resolveVariant(self, env):
+      """ Return the libraries to link against for the variant of env. """
+      if SConsAddons.Util.GetPlatform() != "win32":
+         return self.found_libs
+      found_libs = ['cppdom_dll']
+      if env.has_key("variant") and env["variant"].has_key("type"):
+         var_type = env["variant"]["type"]
+         var_lib = self.variant_libs.get(var_type)
+         if var_lib:
+            found_libs = var_lib
+      print "Windows variant found libs: ", found_libs
+      return found_libs
+
+
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if base_dir:
+         cmd = pj(base_dir, 'bin', 'cppunit-config')
+         queries = [pj(base_dir, 'include', 'cppunit', 'Test.h')]
+      else:
+         cmd = WhereIs('cppunit-config')
+         if not cmd:
+            return []
+         queries = [[cmd, "--prefix"]]
+      return queries + [[cmd, arg] for arg in ("--version", "--cflags", "--libs")]
 
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
@@ -0,0 +1,184 @@
+"""SConsAddons.Options.EnvDelta
+
+Batched changes to a construction environment.
+
+Options apply themselves with a series of env.Append()/env.AppendUnique() calls.
+AppendUnique scans the existing value every time, so applying many options to
+long CPPPATH/LIBS/CXXFLAGS lists gets quadratic.  An EnvDelta can be passed to
+apply() in place of the environment.  It records the changes and merges them
+in a single pass per construction variable when flushed.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.Util
+
+APPEND, APPEND_UNIQUE, PREPEND = range(3)
+
+# Variables the environment merges in its own way, changes to them are passed on directly
+directVars = ['CPPDEFINES']
+
+
+class OrderedSet(object):
+   """ Membership test for the items of a list that also works for unhashable items. """
+   def __init__(self, items):
+      self.hashed = {}
+      self.unhashed = []
+      for i in items:
+         self.add(i)
+
+   def add(self, item):
+      try:
+         self.hashed[item] = True
+      except TypeError:
+         self.unhashed.append(item)
+
+   def __contains__(self, item):
+      try:
+         return self.hashed.has_key(item)
+      except TypeError:
+         return item in self.unhashed
+
+
+class EnvDelta(object):
+   """
+   Stands in for an environment while options are applied.  Append, AppendUnique and
+   Prepend of list values are recorded and merged into the environment by flush().
+   Reading or setting a variable with pending changes merges that variable first, and any
+   other use of the environment merges everything and is passed on, so options see the
+   same values they would when applied to the environment directly.
+   """
+   def __init__(self, env):
+      self.__dict__["env"] = env
+      self.__dict__["pending"] = {}       # var -> list of (operation, values)
+      self.__dict__["order"] = []         # vars in the order they were first changed
+
+   def _record(self, operation, kw):
+      env = self.env
+      for (var, value) in kw.items():
+         current = env.get(var)
+         if var in directVars:
+            values = None
+         elif SCons.Util.is_List(value):
+            values = list(value)
+         elif SCons.Util.is_String(value) and SCons.Util.is_List(current):
+            if isinstance(current, SCons.Util.CLVar) and APPEND_UNIQUE != operation:
+               # Appending or prepending to a command line variable splits the string
+               values = list(SCons.Util.CLVar(value))
+            else:
+               values = [value]
+         else:
+            values = None
+         if values is None or not (current is None or SCons.Util.is_List(current)):
+            # Strings are concatenated or set as they are and dicts updated.  Leave that to
+            # the environment.
+            self._flushVar(var)
+            {APPEND:env.Append, APPEND_UNIQUE:env.AppendUnique,
+             PREPEND:env.Prepend}[operation](**{var:value})
+            continue
+         if not self.pending.has_key(var):
+            self.pending[var] = []
+            self.order.append(var)
+         self.pending[var].append((operation, values))
+
+   def Append(self, **kw):
+      self._record(APPEND, kw)
+
+   def AppendUnique(self, **kw):
+      if kw.has_key("delete_existing"):
+         self.flush()
+         return self.env.AppendUnique(**kw)
+      self._record(APPEND_UNIQUE, kw)
+
+   def Prepend(self, **kw):
+      self._record(PREPEND, kw)
+
+   def _flushVar(self, var):
+      operations = self.pending.pop(var, None)
+      if operations is None:
+         return
+      self.order.remove(var)
+      current = self.env.get(var)
+      if current is None:
+         merged = []
+      else:
+         merged = list(current)
+      prepended = []
+      present = None
+      for (operation, values) in operations:
+         if APPEND == operation:
+            merged.extend(values)
+            if present is not None:
+               for v in values:
+                  present.add(v)
+         elif APPEND_UNIQUE == operation:
+            if present is None:
+               present = OrderedSet(prepended + merged)
+            for v in values:
+               if v not in present:
+                  merged.append(v)
+                  present.add(v)
+         else:
+            prepended = values + prepended
+            if present is not None:
+               for v in values:
+                  present.add(v)
+      merged = prepended + merged
+      if isinstance(current, SCons.Util.CLVar):
+         merged = SCons.Util.CLVar(merged)
+      self.env[var] = merged
+
+   def flush(self):
+      """ Merge all the recorded changes into the environment. """
+      for var in self.order[:]:
+         self._flushVar(var)
+
+   def __getitem__(self, var):
+      self._flushVar(var)
+      return self.env[var]
+
+   def __setitem__(self, var, value):
+      self._flushVar(var)
+      self.env[var] = value
+
+   def __delitem__(self, var):
+      self._flushVar(var)
+      del self.env[var]
+
+   def has_key(self, var):
+      return self.pending.has_key(var) or self.env.has_key(var)
+
+   def __contains__(self, var):
+      return self.has_key(var)
+
+   def get(self, var, default=None):
+      self._flushVar(var)
+      return self.env.get(var, default)
+
+   def __getattr__(self, name):
+      self.flush()
+      return getattr(self.env, name)
+
+   def __setattr__(self, name, value):
+      self.flush()
+      setattr(self.env, name, value)
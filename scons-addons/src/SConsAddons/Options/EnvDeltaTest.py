@@ -0,0 +1,104 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import sys
+
+import SCons.Environment
+import SCons.Util
+from SConsAddons.Options.EnvDelta import EnvDelta
+
+
+class EnvDeltaTestCase(unittest.TestCase):
+    def _apply(self, env, changes):
+        for (method, kw) in changes:
+            getattr(env, method)(**kw)
+
+    def _compare(self, changes, **initial):
+        """ Check that changes give the same result through an EnvDelta as applied directly. """
+        expected = SCons.Environment.Environment(**initial)
+        self._apply(expected, changes)
+        env = SCons.Environment.Environment(**initial)
+        delta = EnvDelta(env)
+        self._apply(delta, changes)
+        delta.flush()
+        for var in ("CPPPATH", "LIBS", "LIBPATH", "CPPDEFINES", "CXXFLAGS", "LINKFLAGS"):
+            assert env.get(var) == expected.get(var), (var, env.get(var), expected.get(var))
+
+    def test_lists(self):
+        """Test that list changes are merged like the environment does"""
+        self._compare([("AppendUnique", {"CPPPATH":["/a", "/b"], "LIBS":["foo"]}),
+                       ("Append", {"LIBS":["bar", "foo"]}),
+                       ("AppendUnique", {"CPPPATH":["/b", "/c"], "LIBS":["bar", "baz"]}),
+                       ("Prepend", {"LIBPATH":["/lib1"]}),
+                       ("Prepend", {"LIBPATH":["/lib0"], "CPPPATH":["/first"]}),
+                       ("AppendUnique", {"CPPPATH":["/first"]})],
+                      CPPPATH=["/b"], LIBPATH=["/lib2"])
+
+    def test_strings(self):
+        """Test single strings and string valued variables"""
+        self._compare([("AppendUnique", {"LIBS":"foo", "CPPPATH":"/a"}),
+                       ("AppendUnique", {"LIBS":"foo"}),
+                       ("Append", {"LINKFLAGS":"-pthread"})],
+                      LINKFLAGS="-g")
+
+    def test_unhashable(self):
+        """Test values that can not be hashed"""
+        self._compare([("AppendUnique", {"CPPDEFINES":[["FOO", "1"], "BAR"]}),
+                       ("AppendUnique", {"CPPDEFINES":[["FOO", "1"], ["BAZ", "2"]]})])
+
+    def test_clvar(self):
+        """Test that command line variables stay command line variables"""
+        env = SCons.Environment.Environment(CXXFLAGS=SCons.Util.CLVar("-O2"))
+        delta = EnvDelta(env)
+        delta.AppendUnique(CXXFLAGS=["-Wall"])
+        delta.flush()
+        assert isinstance(env["CXXFLAGS"], SCons.Util.CLVar)
+        assert list(env["CXXFLAGS"]) == ["-O2", "-Wall"]
+
+    def test_clvarStrings(self):
+        """Test multi-word strings added to command line variables"""
+        self._compare([("Append", {"CXXFLAGS":"-O2 -g"}),
+                       ("Prepend", {"CXXFLAGS":"-a -b", "LINKFLAGS":"-c -d"}),
+                       ("AppendUnique", {"CXXFLAGS":"-Wall -W"}),
+                       ("Append", {"LINKFLAGS":"-e"})],
+                      CXXFLAGS=SCons.Util.CLVar("-x"), LINKFLAGS=SCons.Util.CLVar("-y"))
+
+    def test_pending(self):
+        """Test that changes are only made when flushed or read"""
+        env = SCons.Environment.Environment(LIBS=["a"])
+        delta = EnvDelta(env)
+        delta.Append(LIBS=["b"], CPPPATH=["/inc"])
+        assert env["LIBS"] == ["a"]
+        assert delta.has_key("CPPPATH") and not env.has_key("CPPPATH")
+        assert delta["LIBS"] == ["a", "b"]
+        assert env["LIBS"] == ["a", "b"]
+        assert not env.has_key("CPPPATH")
+        # Anything else flushes everything
+        assert delta.subst("$CPPPATH") == "/inc"
+        assert env["CPPPATH"] == ["/inc"]
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(EnvDeltaTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -27,11 +27,11 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import SCons.Environment     # Get the environment stuff
 import SCons
-import SCons.SConf
 import SConsAddons.Options   # Get the modular options stuff
-import SCons.Util
+import SConsAddons.Options.Checks as Checks
 import sys, os, re, string
 import SConsAddons.Util as sca_util
+import SConsAddons.FlagPoll as FlagPoll
 
 from SCons.Util import WhereIs
 pj = os.path.join
@@ -42,7 +42,8 @@ class FlagPollBasedOption(SConsAddons.Options.PackageOption):
    Options object for capturing common options and deps for flagpoll based options
    """
 
-   def __init__(self, name, moduleName, requiredVersion, required, useCppPath, helpText=None, compileTest=False, headerToCheck=None):
+   def __init__(self, name, moduleName, requiredVersion, required, useCppPath, helpText=None, compileTest=False, headerToCheck=None,
+                headerOnly=False):
       """
          name - The name to use for this option
          moduleName - The name of the module to look for.
@@ -50,6 +51,10 @@ class FlagPollBasedOption(SConsAddons.Options.PackageOption):
          required - Is the dependency required?  (if so we exit on errors)
          useCppPath - If true, put the include paths in cpppath else, put them in cxxflags.
          helpText - The help text to use for it all.
+         compileTest - If true, validate by compiling (and linking) against the package.
+         headerToCheck - Header to include in the compile test.
+         headerOnly - If true, the package is header only and the compile test only checks
+                      that headerToCheck can be included (see Checks.checkHeader).
       """
       self.optionKey = name.replace(' ', '')+"FpcFile"
 
@@ -67,6 +72,7 @@ class FlagPollBasedOption(SConsAddons.Options.PackageOption):
       self.useCppPath = useCppPath      
       self.compileTest = compileTest
       self.headerToCheck = headerToCheck
+      self.headerOnly = headerOnly
    
    
    def startProcess(self):
@@ -89,23 +95,31 @@ class FlagPollBasedOption(SConsAddons.Options.PackageOption):
       # Try to build against the library
       conf_env = env.Clone()
       self.apply(conf_env)
-      conf_ctxt = SCons.SConf.SConf(conf_env)
+      conf_ctxt = SConsAddons.Options.Configure(conf_env)
 
-      if self.headerToCheck:
-         if not conf_ctxt.CheckCXXHeader(self.headerToCheck):
-            print "Can't compile with %s" %self.headerToCheck
+      if self.headerOnly:
+         try:
+            passed = (not self.headerToCheck) or Checks.checkHeader(conf_ctxt, self.headerToCheck)
+         finally:
             conf_ctxt.Finish()
-            return False
-
-      if self.found_libs:
-         for lib in self.found_libs:
-            if not conf_ctxt.CheckLib(lib, autoadd=0):
-               print "Can't link %s" % str(lib)
-               conf_ctxt.Finish()
-               return False
+         if not passed:
+            print "Can't compile with %s" % self.headerToCheck
+         return passed
 
-      conf_ctxt.Finish()
-      return True
+      # Check the header and all the libraries with a single compile and link
+      headers = []
+      if self.headerToCheck:
+         headers = [self.headerToCheck]
+      try:
+         (bad_headers, bad_libs) = Checks.checkBatch(conf_ctxt, headers, self.found_libs or [])
+      finally:
+         conf_ctxt.Finish()
+
+      for h in bad_headers:
+         print "Can't compile with %s" % h
+      for lib in bad_libs:
+         print "Can't link %s" % str(lib)
+      return not (bad_headers or bad_libs)
 
    def find(self, env):
       # Call flagpoll for information
@@ -185,11 +199,32 @@ class FlagPollBasedOption(SConsAddons.Options.PackageOption):
       if self.found_link_from_libs:
          env.AppendUnique(LINKFLAGS = self.found_link_from_libs)
    
+   def getCacheDependencies(self, optDict):
+      fpc_file = optDict.get(self.optionKey)
+      # Adding or removing .fpc files changes the directories
+      deps = [WhereIs('flagpoll'), fpc_file] + list(FlagPoll.getSearchPath())
+      # The .fpc files the flags come from, the module's own and the ones it requires
+      try:
+         index = FlagPoll.getIndex()
+         if fpc_file:
+            fpc = FlagPoll.readFpcFile(fpc_file)
+         else:
+            fpc = index.find(self.moduleName)
+         if fpc is not None:
+            deps.extend([f.path for f in FlagPoll.getClosure(index, fpc)])
+      except (FlagPoll.Unsupported, IOError, OSError):
+         pass
+      return deps
+
    def getSettings(self):
       return [(self.optionKey, self.fpcFile),]
    
    def getVersion(self):
-      return [int(n) for n in self.flagpoll_parser.getVersion().split(".")]
+      # Use the version found during validation if we have it (it may have come from the cache)
+      ver_str = getattr(self, "found_ver_str", None)
+      if not ver_str:
+         ver_str = self.flagpoll_parser.getVersion()
+      return [int(n) for n in ver_str.split(".")]
       
    def dumpSettings(self):
       "Write out the settings"
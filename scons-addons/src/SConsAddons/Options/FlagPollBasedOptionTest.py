@@ -0,0 +1,82 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+from SConsAddons.Options.FlagPollBasedOption import FlagPollBasedOption
+
+
+class FlagPollBasedOptionTestCase(unittest.TestCase):
+    def setUp(self):
+        # Each test has its own search path, the indexes are kept per search path
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_path = os.environ.get("FLAGPOLL_PATH")
+        os.environ["FLAGPOLL_PATH"] = self.tmpdir
+        self.bar_fpc = self._write("bar", "Version: 2.0\nLibs: -lbar\n")
+        self.foo_fpc = self._write("foo", "Version: 1.0\nRequires: bar\nLibs: -lfoo\n")
+        self.option = FlagPollBasedOption("Foo", "foo", "1.0", False, True)
+
+    def tearDown(self):
+        if self.saved_path is None:
+            del os.environ["FLAGPOLL_PATH"]
+        else:
+            os.environ["FLAGPOLL_PATH"] = self.saved_path
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name + ".fpc")
+        fh = open(path, "w")
+        fh.write(text)
+        fh.close()
+        return path
+
+    def test_getCacheDependencies(self):
+        """Test that the .fpc files of the module and its requirements are dependencies"""
+        deps = self.option.getCacheDependencies({})
+        assert self.tmpdir in deps, deps
+        assert self.foo_fpc in deps, deps
+        assert self.bar_fpc in deps, deps
+        other_dir = os.path.join(self.tmpdir, "other")
+        os.mkdir(other_dir)
+        other_fpc = os.path.join(other_dir, "foo.fpc")
+        shutil.copy(self.foo_fpc, other_fpc)
+        deps = self.option.getCacheDependencies({"FooFpcFile":other_fpc})
+        assert other_fpc in deps, deps
+        assert self.bar_fpc in deps, deps
+
+    def test_getCacheDependenciesMissing(self):
+        """Test the dependencies of modules that can not be resolved"""
+        qux_fpc = self._write("qux", "Version: 1.0\nRequires: nosuch\n")
+        deps = self.option.getCacheDependencies({"FooFpcFile":qux_fpc})
+        assert qux_fpc in deps, deps
+        option = FlagPollBasedOption("Nosuch", "nosuch", "1.0", False, True)
+        assert self.tmpdir in option.getCacheDependencies({})
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(FlagPollBasedOptionTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
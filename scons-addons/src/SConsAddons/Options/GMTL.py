@@ -12,25 +12,30 @@ import SCons
 import SCons.Environment
 import SCons.Util
 from SCons.Util import WhereIs
-import SCons.SConf
 import SConsAddons.Options
+import SConsAddons.Util
 import SConsAddons.Options.FlagPollBasedOption as FlagPollBasedOption
 
-Configure = SCons.SConf.SConf    # Use same alias as SConstruct sees
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 class GMTL(FlagPollBasedOption.FlagPollBasedOption):
    """ 
    Options object for capturing GMTL options and dependencies.
    """
 
-   def __init__(self, name, requiredVersion, required=True, useCppPath=True):
+   def __init__(self, name, requiredVersion, required=True, useCppPath=True, compileTest=False):
       """
          name - The name to use for this option
          requiredVersion - The version of vapor required (ex: "0.16.7")
          required - Is the dependency required?  (if so we exit on errors)
          useCppPath - If true, put the include paths in cpppath else, put them in cxxflags.
+         compileTest - If true, check that gmtl/gmtl.h can be included.  GMTL is header
+                       only, so this is a syntax check without linking.
       """
-      FlagPollBasedOption.FlagPollBasedOption.__init__(self, name, 'gmtl', requiredVersion, required, useCppPath)
+      FlagPollBasedOption.FlagPollBasedOption.__init__(self, name, 'gmtl', requiredVersion, required, useCppPath,
+                                                       compileTest=compileTest,
+                                                       headerToCheck=pj('gmtl', 'gmtl.h'),
+                                                       headerOnly=True)
 
 class GMTL_config(SConsAddons.Options.PackageOption):
    """
@@ -81,14 +86,14 @@ class GMTL_config(SConsAddons.Options.PackageOption):
 
       # Find gmtl-config and call it to get the other arguments
       sys.stdout.write("searching...\n")
-      self.gmtlconfig_cmd = WhereIs('gmtl-config')
+      self.gmtlconfig_cmd = SConsAddons.Util.whereIs('gmtl-config')
       if None == self.gmtlconfig_cmd:
          self.checkRequired("   could not find gmtl-config")
       else:
          sys.stdout.write("   found gmtl-config.\n")
          # find base dir
-         self.baseDir = os.popen(self.gmtlconfig_cmd + " --prefix").read().strip()
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = SConsAddons.Util.readCommand([self.gmtlconfig_cmd, "--prefix"])
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"%self.baseDir)
             self.baseDir = None
          else:
@@ -102,12 +107,12 @@ class GMTL_config(SConsAddons.Options.PackageOption):
       # XXX: Check that an include file: include/gmtl/gmtl.h  exists
       # update the temps for later usage
       passed = True
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("gmtl base dir does not exist:%s"%self.baseDir)
 
       # If gmtl-config exists and we are not on windows, use it.
-      has_config_cmd = os.path.isfile(self.gmtlconfig_cmd) and \
+      has_config_cmd = SConsAddons.Util.isFile(self.gmtlconfig_cmd) and \
          not SConsAddons.Util.GetPlatform() == "win32"
 
       if not has_config_cmd:
@@ -120,16 +125,16 @@ class GMTL_config(SConsAddons.Options.PackageOption):
       header_file = pj('gmtl', 'gmtl.h')
       base_include = pj(self.baseDir,'include')
       # check standard directory first
-      if os.path.isfile(pj(base_include, header_file)):
+      if SConsAddons.Util.isFile(pj(base_include, header_file)):
          inc_dir = base_include
       # check versioned directories by building a list and sorting them
-      elif os.path.exists(base_include):
-         pot_dirs = [pj(base_include,d) for d in os.listdir(base_include)\
+      elif SConsAddons.Util.pathExists(base_include):
+         pot_dirs = [pj(base_include,d) for d in SConsAddons.Util.listDir(base_include)\
                                               if d.count("gmtl")]
          pot_dirs.sort()
          pot_dirs.reverse()         
          for d in pot_dirs:
-            if os.path.isfile(pj(d,header_file)):
+            if SConsAddons.Util.isFile(pj(d,header_file)):
                inc_dir = d
                break
 
@@ -143,7 +148,7 @@ class GMTL_config(SConsAddons.Options.PackageOption):
       # --- Check version requirement --- #
       req_ver = [int(n) for n in self.requiredVersion.split(".")]
       version_header = pj(inc_dir,'gmtl','Version.h')
-      if not os.path.isfile(version_header):
+      if not SConsAddons.Util.isFile(version_header):
          passed = False
          self.checkRequired("%s does not exist.  Can not determine gmtl version."%version_header)
    
@@ -179,6 +184,13 @@ class GMTL_config(SConsAddons.Options.PackageOption):
       if self.found_incs:
          env.AppendUnique(CPPPATH = self.found_incs);
 
+   def getCacheDependencies(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         return [WhereIs('gmtl-config')]
+      return [pj(base_dir, 'bin', 'gmtl-config'),
+              pj(base_dir, 'include', 'gmtl', 'Version.h')]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
@@ -192,7 +204,7 @@ def GetGMTLVersion(versionHeader):
    """Gets the GMTL version from gmtl/Version.h.
       Returns version as tuple (major,minor,patch)
    """
-   contents = open(versionHeader, 'r').read()
+   contents = SConsAddons.Util.readFile(versionHeader) or ""
    major = re.compile('.*(#define *GMTL_VERSION_MAJOR *(\d+)).*', re.DOTALL).sub(r'\2', contents)
    minor = re.compile('.*(#define *GMTL_VERSION_MINOR *(\d+)).*', re.DOTALL).sub(r'\2', contents)
    patch = re.compile('.*(#define *GMTL_VERSION_PATCH *(\d+)).*', re.DOTALL).sub(r'\2', contents)
@@ -0,0 +1,92 @@
+"""SConsAddons.Options.Lockfile
+
+Lockfiles hold the resolved results of all package options (include and library
+paths, library names, defines, flags) along with a fingerprint of the host and
+toolchain they were resolved with.  Optional packages that were not found are
+locked as not available.  Processing options with a lockfile whose fingerprint
+matches restores those results without running any find() or validate().  This is meant for fleets of identical build machines that would
+otherwise all repeat the same detection.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import types
+import CacheFile
+import ResultCache
+
+LOCKFILE_VERSION = 1
+
+
+def getHostFingerprint(env):
+   """ Return fingerprint of the host and toolchain that options are resolved with. """
+   edict = env.Dictionary()
+   parts = [LOCKFILE_VERSION,
+            ResultCache.getToolchainIdentity(env),
+            [(v, ResultCache.canonical(edict.get(v))) for v in ResultCache.fingerprintVars]]
+   return ResultCache.md5_new(repr(parts)).hexdigest()
+
+def getOptionValues(option, optDict):
+   """ Return the option values that option was resolved from. """
+   return [(k, ResultCache.canonical(optDict.get(k))) for k in option.keys]
+
+
+class Lockfile(object):
+   """ The resolved package option results stored in a lockfile. """
+   def __init__(self, fingerprint=None):
+      self.fingerprint = fingerprint
+      self.entries = {}     # option id -> (option values, state)
+
+   def getOptionId(self, option):
+      return "%s.%s:%s" % (option.__class__.__module__, option.__class__.__name__, option.name)
+
+   def add(self, option, optDict):
+      self.entries[self.getOptionId(option)] = (getOptionValues(option, optDict),
+                                                option.getCacheState())
+
+   def lookup(self, option, optDict):
+      """ Return the locked state of option or None if it is not locked for these values. """
+      entry = self.entries.get(self.getOptionId(option))
+      if entry is None:
+         return None
+      (values, state) = entry
+      if list(values) != getOptionValues(option, optDict):
+         return None
+      return state
+
+   def save(self, filename):
+      CacheFile.save(filename, {"version":LOCKFILE_VERSION, "fingerprint":self.fingerprint,
+                                "entries":self.entries})
+
+   def load(filename):
+      """ Return the Lockfile stored in filename.  Raises CacheFile.CacheFileError if the
+          file does not exist or can not be used.
+      """
+      data = CacheFile.load(filename, legacy=False)
+      if data is None:
+         raise CacheFile.CacheFileError("file does not exist")
+      if type(data) is not types.DictType or data.get("version") != LOCKFILE_VERSION:
+         raise CacheFile.CacheFileError("unsupported lockfile version")
+      lockfile = Lockfile(data.get("fingerprint"))
+      lockfile.entries = data.get("entries", {})
+      return lockfile
+   load = staticmethod(load)
@@ -0,0 +1,106 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SCons.Node.FS
+import SCons.SConf
+import SConsAddons.Options as Options
+import SConsAddons.Options.Lockfile as Lockfile
+
+
+class CountingOption(Options.StandardPackageOption):
+    """ Package option that counts how often it is validated. """
+    transientStateAttrs = Options.StandardPackageOption.transientStateAttrs + ['validations']
+
+    def __init__(self, name, header, required=False):
+        Options.StandardPackageOption.__init__(self, name, "help", header=header,
+                                               required=required)
+        self.validations = 0
+
+    def validate(self, env):
+        self.validations += 1
+        return Options.StandardPackageOption.validate(self, env)
+
+
+class LockfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        # Start with a new file system, SCons keeps the first one it makes for good
+        SCons.Node.FS.default_fs = None
+        SCons.SConf.SConfFS = None
+        self.env = SCons.Environment.Environment()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def _makeOptions(self):
+        opts = Options.Options()
+        opts.AddOption(CountingOption("Stdio", "stdio.h"))
+        opts.AddOption(CountingOption("Missing", "Missing_missing.h"))
+        return opts
+
+    def test_replay(self):
+        """Test that found and missing optional packages are restored from the lockfile"""
+        opts = self._makeOptions()
+        opts.Process(self.env)
+        opts.ExportLockfile("options.lock", self.env)
+        opts = self._makeOptions()
+        opts.UseLockfile("options.lock")
+        opts.Process(self.env)
+        assert [o.validations for o in opts.options] == [0, 0]
+        assert [o.isAvailable() for o in opts.options] == [True, False]
+
+    def test_requiredNotLocked(self):
+        """Test that missing required packages are not locked"""
+        opts = Options.Options()
+        opts.AddOption(CountingOption("Missing", "Missing_missing.h", required=True))
+        opts.options[0].checkRequired = lambda msg: None
+        opts.Process(self.env)
+        opts.ExportLockfile("options.lock", self.env)
+        assert Lockfile.Lockfile.load("options.lock").entries == {}
+
+    def test_lookup(self):
+        """Test that entries are only used for the values they were resolved from"""
+        option = CountingOption("Stdio", "stdio.h")
+        lock = Lockfile.Lockfile("fp")
+        lock.add(option, {"Stdio_incdir":"/usr/include"})
+        lock.save("options.lock")
+        lock = Lockfile.Lockfile.load("options.lock")
+        assert lock.fingerprint == "fp"
+        assert lock.lookup(option, {"Stdio_incdir":"/usr/include"}) is not None
+        assert lock.lookup(option, {"Stdio_incdir":"/opt/include"}) is None
+        assert lock.lookup(CountingOption("Other", "stdio.h"), {}) is None
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(LockfileTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
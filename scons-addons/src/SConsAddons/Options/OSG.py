@@ -28,6 +28,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment   # Get the environment crap
 import SCons
 import SConsAddons.Options   # Get the modular options stuff
+import SConsAddons.Util
 import SCons.Util
 import sys
 import os
@@ -119,12 +120,12 @@ class OSG(SConsAddons.Options.PackageOption):
          self.checkRequired("OSG base dir (OsgBaseDir) was not specified")
          return
 
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          self.checkRequired("OSG base dir %s does not exist" % self.baseDir)
          return
 
       osg_version_file = pj(self.baseDir, 'include', 'osg', 'Version')
-      if not os.path.isfile(osg_version_file):
+      if not SConsAddons.Util.isFile(osg_version_file):
          self.checkRequired("%s not found" % osg_version_file)
          return
       else:
@@ -134,9 +135,7 @@ class OSG(SConsAddons.Options.PackageOption):
       osg_version_minor = None
       osg_version_patch = None
 
-      version_file = file(osg_version_file)
-      version_lines = version_file.readlines()
-      version_file.close()
+      version_lines = (SConsAddons.Util.readFile(osg_version_file) or "").splitlines(True)
 
       major_ver_re = re.compile("(OSG|OPENSCENEGRAPH)_(VERSION|MAJOR)_(MAJOR|VERSION)\s+(\d+)\s*$")
       minor_ver_re = re.compile("(OSG|OPENSCENEGRAPH)_(VERSION|MINOR)_(MINOR|VERSION)\s+(\d+)\s*$")
@@ -39,11 +39,37 @@ import types
 from SCons.Util import WhereIs
 pj = os.path.join
 
+# Res that when matched against osg-config output should match the options we want
+# In future could try to use INCPREFIX and other platform neutral stuff
+inc_re = re.compile(r'(?: |^)-I(\S*)', re.MULTILINE)
+lib_re = re.compile(r'(?: |^)-l(\S*)', re.MULTILINE)
+lib_path_re = re.compile(r'(?: |^)-L(\S*)', re.MULTILINE)
+link_from_lib_re = re.compile(r'((?: |^)-[^lL]\S*)', re.MULTILINE)
+defines_re = re.compile(r'(?: |^)-D(\S*)', re.MULTILINE)
+optimization_opts_re = re.compile(r'^-(g|O\d)$')
+
+# Libraries to link for each OpenSG library on Windows, where there is no osg-config
+win32_lib_map = {"Base":["OSGBase",],
+                 "GLUT":["OSGWindowGLUT","OSGSystem","OSGBase"],
+                 "FileIO":["OSGFileIO",],
+                 "Drawable":["OSGDrawable",],
+                 "Group":["OSGGroup",],
+                 "ImageFileIO":["OSGImageFileIO",],
+                 "RenderTraversal":["OSGRenderTraversal",],
+                 "State":["OSGState",],
+                 "System":["OSGSystem","OSGBase"],
+                 "Text":["OSGText",],
+                 "Util":["OSGUtil",],
+                 "WIN32":["OSGWindowWIN32",],
+                 "Window":["OSGWindow",],
+                 "Contrib":["OSGContrib","OSGSystem","OSGBase"]}
+
 
 class OpenSG(SConsAddons.Options.PackageOption):
    """ 
    Options object for capturing vapor options and dependencies.
    """
+   transientStateAttrs = SConsAddons.Options.PackageOption.transientStateAttrs + ["_configResults"]
 
    def __init__(self, name, requiredVersion, required=True, useCppPath = False):
       """
@@ -106,7 +132,7 @@ class OpenSG(SConsAddons.Options.PackageOption):
       
       # Find osg-config and call it to get the other arguments
       sys.stdout.write("searching for osg-config...\n")
-      self.osgconfig_cmd = WhereIs('osg-config')
+      self.osgconfig_cmd = sca_util.whereIs('osg-config')
       if not self.osgconfig_cmd:
          self.checkRequired("   could not find osg-config.")
          self.osgconfig_cmd = None
@@ -114,12 +140,12 @@ class OpenSG(SConsAddons.Options.PackageOption):
       else:
          try:
             sys.stdout.write("   found osg-config.\n");
-            found_ver_str = os.popen(self.osgconfig_cmd + " --version").read().strip();
+            found_ver_str = sca_util.readCommand([self.osgconfig_cmd, "--version"]);
             sys.stdout.write("   version:%s"%found_ver_str);
             
             # find base dir
-            self.baseDir = os.popen(self.osgconfig_cmd + " --prefix").read().strip();
-            if not os.path.isdir(self.baseDir):
+            self.baseDir = sca_util.readCommand([self.osgconfig_cmd, "--prefix"]);
+            if not sca_util.isDir(self.baseDir):
                self.checkRequired("   returned directory does not exist:%s"% self.baseDir);
                self.baseDir = None;
             else:
@@ -134,14 +160,14 @@ class OpenSG(SConsAddons.Options.PackageOption):
       # Check that an include file: include/OpenSG/OSGConfig.h  exists
       # Update the temps for later usage
       passed = True
-      if (None == self.baseDir) or (not os.path.isdir(self.baseDir)):
+      if (None == self.baseDir) or (not sca_util.isDir(self.baseDir)):
          self.checkRequired("OpenSG base dir does not exist:%s"%self.baseDir)
          return
       
       # Check if osg-config is found and if it can be called
-      has_config_cmd = os.path.isfile(self.osgconfig_cmd)
+      has_config_cmd = sca_util.isFile(self.osgconfig_cmd)
       try:
-         found_ver_str = os.popen(self.osgconfig_cmd + " --version").read().strip()
+         found_ver_str = sca_util.readCommand([self.osgconfig_cmd, "--version"])
          if "" == found_ver_str:
             has_config_cmd = False               # Set to false because the command is failing.
       except Exception, ex:         
@@ -159,7 +185,7 @@ class OpenSG(SConsAddons.Options.PackageOption):
             self.checkRequired("   OpenSG version is too old! Required %s but found %s"%(self.requiredVersion,found_ver_str))
          
       osgconfig_file = pj(self.baseDir, 'include', 'OpenSG', 'OSGConfig.h');
-      if not os.path.isfile(osgconfig_file):
+      if not sca_util.isFile(osgconfig_file):
          self.checkRequired("OSGConfig.h not found:%s"%osgconfig_file);
          return
          
@@ -198,6 +224,7 @@ class OpenSG(SConsAddons.Options.PackageOption):
       #   libs = (libs,)      
       if not isinstance(libs, list):
          libs = [libs,]
+      libs = libs[:]      # Don't normalize the caller's list (or the default) in place
       
       # Ensure we are using standardized naming
       naming_map = { ("base","Base"):"Base",
@@ -219,33 +246,10 @@ class OpenSG(SConsAddons.Options.PackageOption):
          if optimize:
             opt_option = " --opt"
    
-         # Call script for output
-         cflags_stripped = os.popen(self.osgconfig_cmd + opt_option + " --cflags " + lib_names_str).read().strip()      
-         libs_stripped = os.popen(self.osgconfig_cmd + " --libs " + lib_names_str).read().strip()
-   
-         # Get output from osg-config
-         # Res that when matched against osg-config output should match the options we want
-         # In future could try to use INCPREFIX and other platform neutral stuff
-         inc_re = re.compile(r'(?: |^)-I(\S*)', re.MULTILINE);
-         lib_re = re.compile(r'(?: |^)-l(\S*)', re.MULTILINE);
-         lib_path_re = re.compile(r'(?: |^)-L(\S*)', re.MULTILINE);
-         link_from_lib_re = re.compile(r'((?: |^)-[^lL]\S*)', re.MULTILINE);
-         defines_re = re.compile(r'(?: |^)-D(\S*)', re.MULTILINE)
-         optimization_opts_re = re.compile(r'^-(g|O\d)$')
-            
-         # Extract the flags and options from the script output
-         found_cflags = cflags_stripped.split(" ")
-         found_cflags = [s for s in found_cflags if not optimization_opts_re.match(s)]
-         found_cflags = [s for s in found_cflags if not inc_re.match(s)]
-         found_cflags = [s for s in found_cflags if not defines_re.match(s)]
-   
-         found_libs = lib_re.findall(libs_stripped)
-         found_lib_paths = lib_path_re.findall(libs_stripped)
-         found_defines = defines_re.findall(cflags_stripped)
-         found_incs = inc_re.findall(cflags_stripped)
+         (found_cflags, found_libs, found_lib_paths, found_defines, found_incs) = \
+            self._getConfigResults(libs, opt_option)
          found_incs_as_flags = [env["INCPREFIX"] + p for p in found_incs]
          
-         #print "cflags_stripped: [%s]"%cflags_stripped
          #print "found cflags:", found_cflags
          #print "Found: ", found_defines
          #print "found_incs_as_flags: ", found_incs_as_flags
@@ -272,37 +276,7 @@ class OpenSG(SConsAddons.Options.PackageOption):
 
       # If on Windows, just make some very lame assumptions and hope they are correct
       elif sca_util.GetPlatform() == "win32":
-         lib_map = {"Base":["OSGBase",],
-                    "GLUT":["OSGWindowGLUT","OSGSystem","OSGBase"],
-                    "FileIO":["OSGFileIO",],
-                    "Drawable":["OSGDrawable",],
-                    "Group":["OSGGroup",],
-                    "ImageFileIO":["OSGImageFileIO",],
-                    "RenderTraversal":["OSGRenderTraversal",],
-                    "State":["OSGState",],
-                    "System":["OSGSystem","OSGBase"],
-                    "Text":["OSGText",],
-                    "Util":["OSGUtil",],
-                    "WIN32":["OSGWindowWIN32",],
-                    "Window":["OSGWindow",],
-                    "Contrib":["OSGContrib","OSGSystem","OSGBase"]}
-         
-         found_libs = []
-         lib_suffix = ""
-         if not optimize:
-            lib_suffix = "D"
-         for l in libs:
-            #print "Checking: ", l
-            #print "has_key: ", lib_map.has_key(l)
-            if lib_map.has_key(l):
-               found_libs.extend([lib+lib_suffix for lib in lib_map[l]])
-               
-         lib_path = pj(self.baseDir,'lib')
-         inc_path = pj(self.baseDir,'include')
-         if not os.path.exists(lib_path):
-            print "ERROR: Could not find OpenSG lib path.  tried: ", lib_path
-         if not os.path.exists(inc_path):
-            print "ERROR: Could not find OpenSG include path.  tried: ", inc_path
+         (found_libs, lib_path, inc_path) = self._getWin32Results(libs, optimize)
          
          env.AppendUnique(LIBS = found_libs,
                     LIBPATH = [lib_path,],
@@ -327,7 +301,7 @@ class OpenSG(SConsAddons.Options.PackageOption):
             env.Append(CPPDEFINES=glut_cppdefines)
               
          #print "---------------------\nApplying OpenSG:\n-----------------"
-         #print "lib_map: ", lib_map
+         #print "lib_map: ", win32_lib_map
          #print "libs: ", libs
          #print "found libs: ", found_libs
          #print "----------------------------------"
@@ -341,6 +315,81 @@ class OpenSG(SConsAddons.Options.PackageOption):
          #print "   LIBPATH:", env["LIBPATH"]
          
 
+   def _getConfigResults(self, libs, optOption):
+      """ Return the (cflags, libs, lib paths, defines, includes) osg-config reports for
+          the given libraries and --dbg/--opt flag.
+          osg-config is only run once for each distinct set of parameters.
+      """
+      results = self.__dict__.setdefault("_configResults", {})
+      key = (self.osgconfig_cmd, tuple(libs), optOption)
+      if not results.has_key(key):
+         # Call script for output
+         cflags_stripped = sca_util.readCommand([self.osgconfig_cmd, optOption.strip(), "--cflags"] + libs)
+         libs_stripped = sca_util.readCommand([self.osgconfig_cmd, "--libs"] + libs)
+   
+         # Extract the flags and options from the script output
+         found_cflags = cflags_stripped.split(" ")
+         found_cflags = [s for s in found_cflags if not optimization_opts_re.match(s)]
+         found_cflags = [s for s in found_cflags if not inc_re.match(s)]
+         found_cflags = [s for s in found_cflags if not defines_re.match(s)]
+         #print "cflags_stripped: [%s]"%cflags_stripped
+   
+         results[key] = (found_cflags,
+                         lib_re.findall(libs_stripped),
+                         lib_path_re.findall(libs_stripped),
+                         defines_re.findall(cflags_stripped),
+                         inc_re.findall(cflags_stripped))
+      # Copies, the environments may keep the lists they are given
+      return [r[:] for r in results[key]]
+
+   def _getWin32Results(self, libs, optimize):
+      """ Return the (libs, lib path, include path) assumed for the given libraries on
+          Windows.  The paths are only checked once for each distinct set of parameters.
+      """
+      results = self.__dict__.setdefault("_configResults", {})
+      key = (self.baseDir, tuple(libs), optimize)
+      if not results.has_key(key):
+         found_libs = []
+         lib_suffix = ""
+         if not optimize:
+            lib_suffix = "D"
+         for l in libs:
+            #print "Checking: ", l
+            #print "has_key: ", win32_lib_map.has_key(l)
+            if win32_lib_map.has_key(l):
+               found_libs.extend([lib+lib_suffix for lib in win32_lib_map[l]])
+               
+         lib_path = pj(self.baseDir,'lib')
+         inc_path = pj(self.baseDir,'include')
+         if not sca_util.pathExists(lib_path):
+            print "ERROR: Could not find OpenSG lib path.  tried: ", lib_path
+         if not sca_util.pathExists(inc_path):
+            print "ERROR: Could not find OpenSG include path.  tried: ", inc_path
+         results[key] = (found_libs, lib_path, inc_path)
+      (found_libs, lib_path, inc_path) = results[key]
+      return (found_libs[:], lib_path, inc_path)
+
+   def clearVariantResults(self):
+      SConsAddons.Options.PackageOption.clearVariantResults(self)
+      self._configResults = {}
+
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         cmd = WhereIs('osg-config')
+         if not cmd:
+            return []
+         return [[cmd, "--version"], [cmd, "--prefix"]]
+      cmd = pj(base_dir, 'bin', 'osg-config')
+      return [[cmd, "--version"], pj(base_dir, 'include', 'OpenSG', 'OSGConfig.h')]
+
+   def getCacheDependencies(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         return [WhereIs('osg-config')]
+      return [pj(base_dir, 'bin', 'osg-config'),
+              pj(base_dir, 'include', 'OpenSG', 'OSGConfig.h')]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),(self.depDirKey,self.depDir)]
 
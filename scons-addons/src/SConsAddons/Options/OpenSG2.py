@@ -8,6 +8,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
 import SCons
 import SConsAddons.Options
+import SConsAddons.Util
 import SCons.Util
 import sys, os, re
 
@@ -18,6 +19,9 @@ class OpenSG2(SConsAddons.Options.PackageOption):
    """
    Options object for capturing OpenSG2 options and dependencies
    """
+   variantKeys = ["type"]       # Selects the --dbg/--opt/--dbgrt flags of osg2-config
+   transientStateAttrs = SConsAddons.Options.PackageOption.transientStateAttrs + ["_configResults"]
+
    def __init__(self, name, requiredVersion, required=True):
       """
          name - The name to use for this option
@@ -63,15 +67,14 @@ class OpenSG2(SConsAddons.Options.PackageOption):
 
       # Find osg2-config and call it to get the other arguments
       sys.stdout.write("searching...\n")
-      self.config_script = WhereIs('osg2-config', pathext='')
+      self.config_script = SConsAddons.Util.whereIs('osg2-config', pathext='')
       if None == self.config_script:
          self.checkRequired("   could not find osg2-config")
       else:
          sys.stdout.write("   found osg2-config.\n")
-         full_command = sys.executable + ' ' + self.config_script
          # find base dir
-         self.baseDir = os.popen(full_command + " --prefix").read().strip()
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = SConsAddons.Util.readCommand([sys.executable, self.config_script, "--prefix"])
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"%self.baseDir)
             self.baseDir = None
          else:
@@ -90,14 +93,14 @@ class OpenSG2(SConsAddons.Options.PackageOption):
          self.checkRequired("OpenSG2 base dir not specified")
          return
 
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("OpenSG2 base dir does not exist:%s"%self.baseDir)
       elif self.verbose:
          print "   %s is valid directory."% (self.baseDir)
 
       # If OpenSG2-config exists and we are not on windows, use it.
-      if not os.path.isfile(self.config_script):
+      if not SConsAddons.Util.isFile(self.config_script):
          passed = False
          self.checkRequired("Can not find %s." % self.config_script)
       elif self.verbose:
@@ -109,7 +112,7 @@ class OpenSG2(SConsAddons.Options.PackageOption):
       base_include = pj(self.baseDir,'include')
       header_file = pj('OpenSG', 'OSGConfig.h')
       # check standard directory first
-      if not os.path.isfile(pj(base_include, header_file)):
+      if not SConsAddons.Util.isFile(pj(base_include, header_file)):
          passed = False
          self.checkRequired("Could not find OSGConfig.h. [%s]" % (pj(base_include, header_file)))
       elif self.verbose:
@@ -172,32 +175,16 @@ class OpenSG2(SConsAddons.Options.PackageOption):
       elif "dbg" == buildType or "debug" == buildType:
          opt_option = " --dbg"
       else:
-         # Default to debug            
-         opt_option = " --dbg"
-         if env.has_key("variant") and env["variant"].has_key("type"):
-            var_type = env["variant"]["type"]
-
-            if "debugrt" == var_type:
-               opt_option = " --dbgrt"
-            elif "debug" != var_type:
-               opt_option = " --opt"
-            else:
-               opt_option = " --dbg"
+         opt_option = self.getVariantResult(env)
 
       # Ensure that libs is a list.
       if not isinstance(libs, list):
          libs = [libs,]
 
-      cfg_cmd_parser = SConsAddons.Util.PythonScriptParser(self.config_script)
-
       lib_names_str = " ".join(libs)
       extra_params = opt_option + ' ' + lib_names_str
-      found_libs = cfg_cmd_parser.findLibs("--libs " + extra_params)
-      found_frameworks = cfg_cmd_parser.findFrameworks("--libs " + extra_params)
-      found_lib_paths = cfg_cmd_parser.findLibPaths("--llibs %s" % extra_params)
-      found_includes = cfg_cmd_parser.findIncludes("--cflags %s" % extra_params)
-      # NOTE: findCXXFlags seems to parse for defines.
-      found_defines = cfg_cmd_parser.findCXXFlags("--cflags %s"%extra_params)
+      (found_libs, found_frameworks, found_lib_paths, found_includes, found_defines) = \
+         self._getConfigResults(extra_params)
 
       if self.verbose:
          print "   found_libs       =", found_libs
@@ -225,6 +212,46 @@ class OpenSG2(SConsAddons.Options.PackageOption):
       if len(found_defines):
          env.AppendUnique(CPPDEFINES = found_defines)
 
+   def resolveVariant(self, env):
+      """ Return the osg2-config build type flag for the variant of env. Defaults to debug. """
+      opt_option = " --dbg"
+      if env.has_key("variant") and env["variant"].has_key("type"):
+         var_type = env["variant"]["type"]
+
+         if "debugrt" == var_type:
+            opt_option = " --dbgrt"
+         elif "debug" != var_type:
+            opt_option = " --opt"
+      return opt_option
+
+   def _getConfigResults(self, extraParams):
+      """ Return the settings osg2-config reports for the given parameters.
+          osg2-config is only run once for each distinct set of parameters.
+      """
+      results = self.__dict__.setdefault("_configResults", {})
+      if not results.has_key(extraParams):
+         cfg_cmd_parser = SConsAddons.Util.PythonScriptParser(self.config_script)
+         results[extraParams] = \
+            (cfg_cmd_parser.findLibs("--libs " + extraParams),
+             cfg_cmd_parser.findFrameworks("--libs " + extraParams),
+             cfg_cmd_parser.findLibPaths("--llibs %s" % extraParams),
+             cfg_cmd_parser.findIncludes("--cflags %s" % extraParams),
+             # NOTE: findCXXFlags seems to parse for defines.
+             cfg_cmd_parser.findCXXFlags("--cflags %s" % extraParams))
+      return results[extraParams]
+
+   def clearVariantResults(self):
+      SConsAddons.Options.PackageOption.clearVariantResults(self)
+      self._configResults = {}
+
+   def getCacheDependencies(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         return [WhereIs('osg2-config', pathext='')]
+      base_dir = os.path.abspath(base_dir)
+      return [pj(base_dir, 'bin', 'osg2-config'),
+              pj(base_dir, 'include', 'OpenSG', 'OSGConfig.h')]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
@@ -0,0 +1,94 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SConsAddons.Util as sca_util
+from SConsAddons.Options.OpenSG import OpenSG
+
+
+class OpenSGTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, "log")
+        script = os.path.join(self.tmpdir, "osg-config")
+        fh = open(script, "w")
+        fh.write("""#!/bin/sh
+echo "$@" >> %s
+case "$*" in
+  *--cflags*) echo "-g -I/opt/osg/include -DOSG_DEBUG -ansi" ;;
+  *--libs*) echo "-L/opt/osg/lib -lOSGSystem -lOSGBase" ;;
+esac
+""" % self.log)
+        fh.close()
+        os.chmod(script, 0755)
+        self.osg = OpenSG("OpenSG", "1.2")
+        self.osg.osgconfig_cmd = script
+        self.osg.available = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _calls(self):
+        if not os.path.exists(self.log):
+            return []
+        return open(self.log).read().splitlines()
+
+    def test_apply(self):
+        """Test applying the flags osg-config reports"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        env = SCons.Environment.Environment()
+        self.osg.apply(env, optimize=False)
+        assert env["CXXFLAGS"] == ["-ansi", "-I/opt/osg/include"], env["CXXFLAGS"]
+        assert env["LIBS"] == ["OSGSystem", "OSGBase"]
+        assert env["LIBPATH"] == ["/opt/osg/lib"]
+        assert env["CPPDEFINES"] == ["OSG_DEBUG"]
+
+    def test_applyOnce(self):
+        """Test that osg-config is run once per library set and build type"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        libs = ["system", "base"]
+        for i in range(3):
+            self.osg.apply(SCons.Environment.Environment(), libs, optimize=False)
+        self.osg.apply(SCons.Environment.Environment(), ["System", "Base"], optimize=False)
+        assert libs == ["system", "base"]
+        assert len(self._calls()) == 2, self._calls()
+        self.osg.apply(SCons.Environment.Environment(), libs, optimize=True)
+        assert len(self._calls()) == 4, self._calls()
+        assert self._calls()[2].startswith("--opt --cflags"), self._calls()
+        # Processing the option again runs osg-config again
+        self.osg.clearVariantResults()
+        self.osg.apply(SCons.Environment.Environment(), libs, optimize=True)
+        assert len(self._calls()) == 6, self._calls()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(OpenSGTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -48,17 +48,90 @@ Defines options extension for supporting modular options.
 
 __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 
-import types, string, os.path
+import types, string, os.path, threading, time
 import SCons.Errors
 import SCons.Util
 import textwrap
 pj = os.path.join
 
 import SConsAddons.Util as sca_util
+import SConsAddons.Elf as Elf
 GetArch = sca_util.GetArch
+import ResultCache
+import CacheFile
+import Profile
+import EnvDelta
+import Lockfile
+import Scheduler
+import Checks
+import CheckCache
+import Transcript
 
 import SCons.SConf
-Configure = SCons.SConf.SConf
+
+# SCons itself is not thread safe.  All SConf contexts and other calls into SCons made
+# while processing options concurrently must hold this lock.
+sconsLock = threading.RLock()
+
+class Configure(object):
+    """
+    Wrapper around SCons.SConf.SConf that holds sconsLock from creation
+    of the configure context until Finish() is called.  Use in place of SConf.
+    When used from the worker threads of Options.Process() the context is created and
+    its methods are called in the main thread (see Scheduler.callInMainThread).
+    """
+    def __init__(self, *args, **kw):
+        sconsLock.acquire()
+        try:
+            self._context = Scheduler.callInMainThread(SCons.SConf.SConf, *args, **kw)
+        except:
+            sconsLock.release()
+            raise
+        self._locked = True
+
+    def __getattr__(self, name):
+        attr = getattr(self._context, name)
+        if callable(attr):
+            attr = MainThreadCall(attr)
+        if Transcript.activeTranscript is not None and CheckCache.cachedChecks.has_key(name):
+            attr = CheckCache.CachedCheck(Transcript.activeTranscript, self._context, name, attr)
+        elif CheckCache.activeCache is not None and CheckCache.cachedChecks.has_key(name):
+            attr = CheckCache.CachedCheck(CheckCache.activeCache, self._context, name, attr)
+        if Profile.activeProfiler is not None and callable(attr) and \
+           (name.startswith("Check") or name.startswith("Try")):
+            return ProfiledCheck(attr)
+        return attr
+
+    def Finish(self):
+        try:
+            return Scheduler.callInMainThread(self._context.Finish)
+        finally:
+            if self._locked:
+                self._locked = False
+                sconsLock.release()
+
+
+class MainThreadCall(object):
+    """ Wraps a method of a configure context to call it in the main thread. """
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args, **kw):
+        return Scheduler.callInMainThread(self.func, *args, **kw)
+
+
+class ProfiledCheck(object):
+    """ Wraps a configure check to record it with the active profiler. """
+    def __init__(self, check):
+        self.check = check
+
+    def __call__(self, *args, **kw):
+        start = time.time()
+        try:
+            return self.check(*args, **kw)
+        finally:
+            if Profile.activeProfiler is not None:
+                Profile.activeProfiler.recordCheck(time.time() - start)
 
 
 # TODO: Port more standard SCons options over to this interface.
@@ -74,6 +147,23 @@ class OptionError(Exception):
         Exception.__init__(self,msg)
 
 
+class RequiredOptionsError(OptionError):
+    """
+    Raised with the failures of all required options when processing fails fast.
+    errors is a list of (option, exception).
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        msgs = []
+        for (option, ex) in errors:
+            if isinstance(ex, SystemExit):
+                msgs.append("%s: exited with status %s" % (option.name, ex.code))
+            else:
+                msgs.append("%s: %s" % (option.name, ex))
+        OptionError.__init__(self, errors[0][0],
+                             "Required options failed:\n  " + "\n  ".join(msgs))
+
+
 class Option(object):
     """
     Base class for all options.
@@ -199,6 +289,9 @@ class LocalUpdateOption(Option):
 
 class PackageOption(LocalUpdateOption):
     """ Base class for options that are used for specifying options for installed software packages. """
+    variantKeys = []                          # Keys of env["variant"] that affect resolveVariant()
+    transientStateAttrs = ['_variantResults'] # Attributes that are never cached between runs
+
     def __init__(self, name, keys, help, dependencies = None):
         """
         Create an option.
@@ -218,6 +311,7 @@ class PackageOption(LocalUpdateOption):
         self.available = False
         if not hasattr(self,"required"):
            self.required = False
+        self._variantResults = {}   # variant key -> result of resolveVariant()
 
         if dependencies is None:
            dependencies = []
@@ -258,6 +352,70 @@ class PackageOption(LocalUpdateOption):
         """
         return self.depsSatisfied()
 
+    def getCacheDependencies(self, optDict):
+        """
+        Return a list of paths (config commands, version headers, etc) whose state the detection
+        results of this option depend upon. Used to determine if cached results are still valid.
+
+        @type  optDict: dictionary
+        @param optDict: The option values this option is about to be initialized from.
+        """
+        return []
+
+    def getPrefetchQueries(self, optDict):
+        """
+        Return the external queries find() and validate() are going to make, so they can be
+        started in the background before the option is processed.  Entries are argv lists of
+        commands to run (see SConsAddons.Util.prefetchCommand) or paths of files to stat.
+        Only a hint: queries that are never made cost a process, queries that are left out
+        are run when they are made.
+
+        @type  optDict: dictionary
+        @param optDict: The option values the option is going to be initialized from.
+        """
+        return []
+
+    def getCacheState(self):
+        """ Return a dictionary of the detection state of this option that can be cached. """
+        return ResultCache.getOptionState(self)
+
+    def restoreCacheState(self, state):
+        """ Restore the detection state previously returned by getCacheState(). """
+        self.__dict__.update(state)
+
+    def getVariantKey(self, env):
+        """
+        Return a key identifying the variant of env as far as this option is concerned.
+        Only the entries of env["variant"] named in self.variantKeys are taken into account.
+        """
+        variant = {}
+        if env is not None and env.has_key("variant"):
+            variant = env["variant"]
+        return tuple([(k, str(variant.get(k))) for k in self.variantKeys])
+
+    def getVariantResult(self, env):
+        """
+        Return the result of resolveVariant() for the variant of env.  The option is only
+        resolved once per distinct variant key, environments of the same variant share it.
+        """
+        key = self.getVariantKey(env)
+        results = self.__dict__.setdefault('_variantResults', {})
+        if not results.has_key(key):
+            results[key] = self.resolveVariant(env)
+        return results[key]
+
+    def resolveVariant(self, env):
+        """
+        Override to compute the variant specific results of this option (library names for
+        a given runtime type, etc) used by apply().  Called after the option is processed and
+        at most once per variant key.  Does nothing by default.
+        """
+        return None
+
+    def clearVariantResults(self):
+        """ Forget all variant results.  Called whenever the option is processed again. """
+        self._variantResults = {}
+
     def _applyDependencies(self, env):
         """
         Applies the dependencies of this package option to the given environment object. This
@@ -274,7 +432,10 @@ class StandardPackageOption(PackageOption):
     """
     Simple package option that is meant for library and header checking with very little
     customization.  Just uses Configure.CheckXXX methods behind the scenes for verification.
+    Libraries that are ELF files are read first (see SConsAddons.Elf) and the link test is
+    skipped for libraries built for another arch or that do not define the symbol.
     """
+    screenLibraries = True      # If true, rule out libraries by reading them before linking
     def __init__(self, name, help, header = None, library = None, symbol = "main",
                  required = False, dependencies = None, linkerFlags = None):
         """
@@ -356,15 +517,15 @@ class StandardPackageOption(PackageOption):
         if self.baseDir:
             # Only fall back on the base_dir/include if a specific
             # include dir was not given.
-            if self.incDir is None and os.path.exists(pj(self.baseDir,'include')):
+            if self.incDir is None and sca_util.pathExists(pj(self.baseDir,'include')):
                 self.incDir = [pj(self.baseDir, 'include')]
             if self.libDir is None:
                 arch_type = GetArch()
                 if (arch_type == 'x64') or (arch_type == 'ia64'):
-                   if os.path.exists(pj(self.baseDir,'lib64')):
+                   if sca_util.pathExists(pj(self.baseDir,'lib64')):
                       self.libDir = [pj(self.baseDir, 'lib64')]
                 
-                if self.libDir is None and os.path.exists(pj(self.baseDir,'lib')):
+                if self.libDir is None and sca_util.pathExists(pj(self.baseDir,'lib')):
                       self.libDir = [pj(self.baseDir, 'lib')]
  
     def validate(self, env):
@@ -381,21 +542,23 @@ class StandardPackageOption(PackageOption):
         self.library = library
 
         conf_ctx = Configure(conf_env)
-        if self.library and self.header:
-            result = self._checkLibraryWithHeader(conf_ctx, self.library, self.header, "C++")
-        elif self.library:
-            result = self._checkLibrary(conf_ctx, self.library, self.symbol, self.header, "C++")
-        elif self.header:
-            result = conf_ctx.CheckCXXHeader(self.header)
-        elif self.baseDir is not None:
-            result = os.path.exists(self.baseDir)
-        else:
-            result = False
+        try:
+            if self.library and self.header:
+                result = self._checkLibraryWithHeader(conf_ctx, self.library, self.header, "C++")
+            elif self.library:
+                result = self._checkLibrary(conf_ctx, self.library, self.symbol, self.header, "C++")
+            elif self.header:
+                result = Checks.checkHeader(conf_ctx, self.header)
+            elif self.baseDir is not None:
+                result = sca_util.pathExists(self.baseDir)
+            else:
+                result = False
+        finally:
+            conf_ctx.Finish()
 
         if not result:
             passed = False
             self.checkRequired("Validation failed for option: %s"%self.name)
-        conf_ctx.Finish()
 
         if not passed:
             self.baseDir = None
@@ -404,10 +567,52 @@ class StandardPackageOption(PackageOption):
         else:
             self.available = True
 
+    def getCacheDependencies(self, optDict):
+        deps = []
+        base_dir = optDict.get(self.baseKey)
+        if base_dir:
+            deps.extend([pj(base_dir, d) for d in ('include', 'lib', 'lib64')])
+        for key in (self.incDirKey, self.libDirKey):
+            dirs = optDict.get(key)
+            if SCons.Util.is_String(dirs):
+                dirs = dirs.split(',')
+            deps.extend(dirs or [])
+        if self.header:
+            deps.extend([pj(d, self.header) for d in deps])
+        return deps
+
+    def _libraryRuledOut(self, context, library, symbol=None):
+        """ Return true if library (name or list of names that are linked together) can
+            not be linked in context.  The symbol is only checked for a single library.
+        """
+        if not self.screenLibraries:
+            return False
+        env = context.env
+        arch = Elf.getEnvArch(env)
+        if arch is None:
+            # Probably cross compiling, the libraries on this host tell nothing
+            return False
+        lib_dirs = Elf.getLibDirs(env)
+        if symbol == "main" or SCons.Util.is_List(library):
+            symbol = None
+        lib_path = tuple([env.subst(str(d)) for d in SCons.Util.Split(env.get('LIBPATH', []))])
+        for lib in SCons.Util.Split(library):
+            (result, reason) = sca_util.probe("library", (lib, lib_path, arch, symbol),
+                                              lambda lib=lib: Elf.checkLibrary(lib, lib_dirs, arch, symbol),
+                                              (None, None))
+            if result is False:
+                print "Skipping library %s: %s" % (lib, reason)
+                return True
+        return False
+
     def _checkLibraryWithHeader(self, context, library, header, language):
+        if self._libraryRuledOut(context, library):
+            return False
         return context.CheckLibWithHeader(library, header, language)
 
     def _checkLibrary(self, context, library, symbol, header, langauge):
+        if self._libraryRuledOut(context, library, symbol):
+            return False
         return context.CheckLib(library, symbol, header, langauge)
 
     def apply(self, env):
@@ -487,25 +692,34 @@ class MultiNamePackageOption(StandardPackageOption):
 
    def _checkLibraryWithHeader(self, context, library, header, language):
       if type(library) is list:
+         result = False
          for lib in library:
-            result = context.CheckLibWithHeader(library, header, language)
+            # Candidates that can be ruled out by reading them are not link tested
+            if self._libraryRuledOut(context, lib):
+               continue
+            result = context.CheckLibWithHeader(lib, header, language)
             if result:
                self.library = lib
                break
       else:
-         result = context.CheckLibWithHeader(library, header, language)
+         result = StandardPackageOption._checkLibraryWithHeader(self, context, library, header,
+                                                                language)
 
       return result
 
    def _checkLibrary(self, context, library, symbol, header, language):
       if type(library) is list:
+         result = False
          for lib in library:
+            if self._libraryRuledOut(context, lib, symbol):
+               continue
             result = context.CheckLib(lib, symbol, header, language)
             if result:
                self.library = lib
                break
       else:
-         result = context.CheckLib(library, symbol, header, language)
+         result = StandardPackageOption._checkLibrary(self, context, library, symbol, header,
+                                                      language)
 
       return result
 
@@ -762,16 +976,63 @@ class SeparatorOption(Option):
         return []
 
 
+_terminalWidth = None
+
+def getTerminalWidth():
+    """ Return the width of the terminal.  Only looked up once. """
+    global _terminalWidth
+    if _terminalWidth is None:
+        try:
+            _terminalWidth = int(os.environ["COLUMNS"])
+        except (KeyError, ValueError):
+            try:
+                import curses
+                curses.setupterm()
+                _terminalWidth = curses.tigetnum('cols')
+            except:
+                _terminalWidth = 80
+        if _terminalWidth <= 0:
+            _terminalWidth = 80
+    return _terminalWidth
+
+
+class LazyMethod(object):
+    """
+    Stand-in for a method of an option that has not been processed yet.
+    Calling it processes the option and then calls the real method.
+    """
+    def __init__(self, options, option, name):
+        self.options = options
+        self.option = option
+        self.name = name
+
+    def __call__(self, *args, **kw):
+        self.options._resolveOption(self.option)
+        return getattr(self.option, self.name)(*args, **kw)
+
+
 class Options:
     """
     Holds all the options, updates the environment with the variables,
     and renders the help text.
     """
-    def __init__(self, files=None, args={}):
+    lazyMethods = ('apply', 'isAvailable', 'getValue')
+
+    def __init__(self, files=None, args={}, cacheFile=None, jobs=1, lazy=False):
         """
         files - [optional] List of option configuration files to load
-            (backward compatibility) If a single string is passed it is 
+            (backward compatibility) If a single string is passed it is
                                      automatically placed in a file list
+        cacheFile - [optional] File used to cache the detection results of package
+                    options between runs.  If not set, no results are cached.
+        jobs - [optional] Number of options to process concurrently.  Options that
+               do not depend on each other are processed in worker threads when > 1.
+               All configure contexts still run in the main thread under sconsLock,
+               so only the *-config and flagpoll probes run in parallel while the
+               TryCompile/TryLink checks stay serial.
+        lazy - [optional] If true, package options are only found and validated the
+               first time apply(), isAvailable(), or getValue() is called on them.
+               Dependencies are resolved first.  jobs is ignored in lazy mode.
         """
 
         self.unique_id = 0          # Id used to create unique names
@@ -779,7 +1040,31 @@ class Options:
         self.files = []             # Options files to load
         self.args = args            # Set the default args from command line
         self.verbose = False        # If true, then we will set all contained options to verbose before processing
-        
+        self.cacheFile = cacheFile  # File to cache package option detection results in
+        self.schedulingPolicy = None  # Callable (option, index) -> sort key for ready options
+        self.jobs = jobs            # Number of options to process concurrently
+        self.lazy = lazy            # If true, defer processing of package options until used
+        self._unresolved = {}       # id(option) -> option for options deferred in lazy mode
+        self._lazyContext = None    # (env, values, result_cache) to resolve deferred options with
+        self._useCheckCache = False # If true, the shared check cache is active while processing
+        self.helpFastPath = True    # If true, skip package detection when only help was requested
+        self._resultCache = None    # Result cache used by the last Process()
+        self._helpCache = {}        # help fingerprint -> rendered help text
+        self.profile = False        # If true, profile option processing (see Profile)
+        self.profileFile = None     # JSON file for the profile, defaults to Profile.defaultProfileFile
+        self.batchApply = True      # If true, Apply() merges all changes to env in one pass
+        self.lockfile = None        # Lockfile to restore package option results from (see UseLockfile)
+        self._lock = None           # Lockfile object used by the current Process()
+        self._lockfileCmdOptions = False  # If true, lockfiles are controlled from the command line
+        self._values = {}           # The option values of the last Process()
+        self.failFast = False       # If true, process required options first and raise all their
+                                    # failures together before probing optional ones
+        self.sharedCheckCache = False  # If true, share configure check results between runs (see CheckCache)
+        self.prefetch = True        # If true, start the queries of package options that are not
+                                    # restored from a cache or lockfile before processing them
+        self.transcript = None      # (mode, filename) of the transcript to use (see RecordTranscript)
+        self._transcriptCmdOptions = False  # If true, transcripts are controlled from the command line
+
         if SCons.Util.is_String(files):
            self.files = [files]
         elif (files != None):
@@ -833,8 +1118,59 @@ class Options:
                 raise SCons.Errors.UserError, "Illegal construction var: Options.AddOption(): opt: '%s' -- key `%s'" % (option.name, k)
 
         self.options.append(option)
-     
-        
+
+    def _prefetchAll(self, env, values, resultCache):
+        """ Start the queries of all the package options that are going to be found and
+            validated.  Options that are restored from the lockfile or the result cache are
+            skipped, as are options whose dependencies are all restored and that have a
+            cached result (they are most likely restored as well).
+        """
+        restored = {}
+        for option in self.options:
+            if not isinstance(option, PackageOption):
+                continue
+            if self._lock is not None and self._lock.lookup(option, values) is not None:
+                restored[id(option)] = True
+                continue
+            if resultCache is not None:
+                deps = getattr(option, "dependencies", None) or []
+                if not deps:
+                    fingerprint = ResultCache.computeFingerprint(option, env, values)
+                    if resultCache.lookup(option, fingerprint) is not None:
+                        restored[id(option)] = True
+                        continue
+                elif resultCache.entries.has_key(resultCache.getOptionId(option)):
+                    if not [d for d in deps if not restored.has_key(id(d))]:
+                        restored[id(option)] = True
+                        continue
+            self._prefetch(option, values)
+
+    def _prefetch(self, option, values):
+        """ Start the queries option declares with getPrefetchQueries() in the background. """
+        if not self.prefetch or self.lazy or not isinstance(option, PackageOption):
+            return
+        if self.helpFastPath and self._helpRequested():
+            return
+        request = self._getTranscriptRequest()
+        if request is not None and Transcript.REPLAY == request[0]:
+            return               # Nothing may be run
+        try:
+            queries = option.getPrefetchQueries(values)
+        except Exception, ex:
+            if self.verbose:
+                print "Not prefetching for %s: %s" % (option.name, ex)
+            return
+        files = []
+        for q in queries:
+            if not q:
+                continue
+            if SCons.Util.is_String(q):
+                files.append(q)
+            else:
+                sca_util.prefetchCommand(q)
+        if files:
+            sca_util.prefetchFiles(files)
+
     def GetOption(self, name):
         """ Return the named option or None if not found.
             See also: Option.getValue()
@@ -869,39 +1205,280 @@ class Options:
 
         # first load previous values from file
         for filename in self.files:
-           if os.path.exists(filename):
-              execfile(filename, values)
+           try:
+              loaded = CacheFile.load(filename)
+           except CacheFile.CacheFileError, ex:
+              print "Ignoring unusable options file [%s]: %s" % (filename, ex)
+              loaded = None
+           if loaded:
+              values.update(loaded)
         
         # Next over-ride those with command line args
         if args is None:
             args = self.args
         values.update(args)
 
-        pending      = self.options
-        last_pending = []
-
-        # Until the pending list is determined to be in a "stale" state (one iteration when no
-        # pending Option objects are processed), loop over the pending list and process all
-        # Option objects that are available to be processed.
-        while pending != last_pending:
-            new_pending = []
-            for option in pending:
-                if option.canProcess():
-                    option.startProcess()         # Start processing
-                    option.setInitial(values)     # Set initial values
-                    option.find(env)              # Find values if needed
-                    option.validate(env)          # Validate the settings
-                    option.completeProcess(env)   # Signal processing completed
+        self._values = values
+
+        lockfile_name = self.lockfile
+        export_name = None
+        if self._lockfileCmdOptions:
+            import SCons.Script
+            lockfile_name = SCons.Script.GetOption("use_lockfile") or lockfile_name
+            export_name = SCons.Script.GetOption("export_lockfile")
+        self._lock = self._loadLockfile(lockfile_name, env)
+
+        result_cache = None
+        if self.cacheFile:
+            result_cache = ResultCache.ResultCache(self.cacheFile)
+
+        transcript = self._startTranscript()
+        if transcript is not None:
+            # Every probe has to be made (or answered by the transcript), so nothing is
+            # restored from caches or lockfiles
+            result_cache = None
+            self._lock = None
+
+        self._resultCache = result_cache
+        self._prefetchAll(env, values, result_cache)
+
+        self._useCheckCache = self.sharedCheckCache or CheckCache.isEnabledByEnvironment()
+
+        (profiling, profile_file) = Profile.getProfileRequest()
+        profiler = None
+        if profiling or self.profile:
+            profiler = Profile.OptionProfiler()
+            profiler.install()
+
+        previous_check_cache = self._startCheckCache()
+        try:
+            if self.helpFastPath and self._helpRequested():
+                self._processForHelp(env, values, result_cache)
+            elif self.lazy and transcript is None:
+                self._deferOptions(env, values, result_cache)
+            else:
+                # Process the options in dependency order.  An option is only processed once all of
+                # its dependencies have been processed and are available.
+                if self.failFast:
+                    # Required options and their dependencies go first so a broken configuration
+                    # fails before any optional package is probed.
+                    required = Scheduler.getRequiredClosure(self.options)
+                    failures = []
+                    skipped = self._processScheduled([o for o in self.options if required.has_key(id(o))],
+                                                     env, values, result_cache, failures)
+                    for (option, reason) in skipped:
+                        if getattr(option, "required", False):
+                            failures.append((option, OptionError(option, reason)))
+                    if failures:
+                        failures.sort(lambda x,y: cmp(self.options.index(x[0]), self.options.index(y[0])))
+                        if result_cache:
+                            result_cache.save()
+                        raise RequiredOptionsError(failures)
+                    self._processScheduled([o for o in self.options if not required.has_key(id(o))],
+                                           env, values, result_cache)
                 else:
-                    new_pending.append(option)
+                    self._processScheduled(self.options, env, values, result_cache)
 
-            last_pending = pending
-            pending = new_pending
+                if result_cache:
+                    result_cache.save()
+        finally:
+            self._stopCheckCache(previous_check_cache)
+            if profiler is not None:
+                profiler.uninstall()
+                self._reportProfile(profiler, profile_file or self.profileFile)
+            if transcript is not None:
+                self._finishTranscript(transcript)
+
+        if export_name:
+            self.ExportLockfile(export_name, env)
 
         # Apply options if requested
         if True == applySimple:
             self.Apply(env, allowedTypes=(SimpleOption,BoolOption,ListOption,EnumOption))
-    
+
+    def _startCheckCache(self):
+        """
+        Activate the shared check cache if it is used.  Returns the cache that was active
+        before, to pass to _stopCheckCache() once the options are processed.
+        """
+        previous = CheckCache.activeCache
+        if self._useCheckCache:
+            CheckCache.activate()
+        return previous
+
+    def _stopCheckCache(self, previous):
+        if self._useCheckCache:
+            CheckCache.deactivate(previous)
+
+    def _reportProfile(self, profiler, filename):
+        print profiler.getReport()
+        if not filename:
+            filename = Profile.defaultProfileFile
+        try:
+            profiler.writeJson(filename)
+            print "Wrote option profile to: %s" % filename
+        except IOError, ex:
+            print "Could not write option profile [%s]: %s" % (filename, ex)
+
+    def _processScheduled(self, options, env, values, resultCache, failures=None):
+        """
+        Process the given options in dependency order, in parallel if self.jobs > 1.
+        failures - If a list is given, errors raised by required options are collected in it
+                   as (option, exception) instead of being raised.
+        Returns the list of (option, reason) for options that were skipped.
+        """
+        def process(option):
+            try:
+                self._processOption(option, env, values, resultCache)
+            except (OptionError, SystemExit), ex:
+                if failures is None or not getattr(option, "required", False):
+                    raise
+                failures.append((option, ex))
+
+        scheduler = Scheduler.OptionScheduler(options, self.schedulingPolicy)
+        if self.jobs > 1:
+            Scheduler.runParallel(scheduler, process, self.jobs)
+        else:
+            for option in scheduler:
+                process(option)
+                scheduler.complete(option)
+
+        for (option, reason) in scheduler.skipped:
+            print "Skipping option %s: %s" % (option.name, reason)
+        return scheduler.skipped
+
+    def _helpRequested(self):
+        try:
+            return sca_util.hasHelpFlag()
+        except Exception:
+            # Not running from an SConstruct, so help can not have been requested
+            return False
+
+    def _processForHelp(self, env, values, resultCache):
+        """
+        Help only processing.  Package options are initialized from the loaded values and
+        the result cache but are never searched for or validated.
+        """
+        for option in self.options:
+            if not isinstance(option, PackageOption):
+                self._processOption(option, env, values, resultCache)
+                continue
+            # Fingerprinted before setInitial() like in _processOption() since the state of
+            # the option is part of the fingerprint.  startProcess() is left out, it only
+            # announces the search.
+            fingerprint = None
+            if resultCache is not None:
+                fingerprint = ResultCache.computeFingerprint(option, env, values)
+            option.setInitial(values)
+            if fingerprint is not None:
+                state = resultCache.lookup(option, fingerprint)
+                if state is not None:
+                    option.restoreCacheState(state)
+
+    def _runPhase(self, option, phase, *args):
+        """ Call the given processing phase of option, timing it if profiling is enabled. """
+        profiler = Profile.activeProfiler
+        if profiler is None:
+            return getattr(option, phase)(*args)
+        profiler.begin(option, phase)
+        try:
+            return getattr(option, phase)(*args)
+        finally:
+            profiler.end()
+
+    def _deferOptions(self, env, values, resultCache):
+        """
+        Lazy mode processing.  Simple options are processed right away, package options
+        get stand-ins for the methods that need their results.
+        """
+        cycle = Scheduler.findCycle(self.options)
+        if cycle:
+            raise SCons.Errors.UserError("Dependency cycle between options: %s" %
+                                         " -> ".join([o.name for o in cycle]))
+
+        self._lazyContext = (env, values, resultCache)
+        for option in self.options:
+            if isinstance(option, PackageOption):
+                self._unresolved[id(option)] = option
+                for name in self.lazyMethods:
+                    setattr(option, name, LazyMethod(self, option, name))
+            else:
+                self._processOption(option, env, values, resultCache)
+
+    def _resolveOption(self, option):
+        """ Process an option deferred in lazy mode along with its dependencies. """
+        if not self._unresolved.has_key(id(option)):
+            return
+        del self._unresolved[id(option)]
+        for name in self.lazyMethods:
+            if option.__dict__.has_key(name):
+                del option.__dict__[name]
+
+        (env, values, result_cache) = self._lazyContext
+        # Dependencies managed by other Options objects resolve themselves when queried
+        for dep in option.dependencies:
+            self._resolveOption(dep)
+        for dep in option.dependencies:
+            if not dep.isAvailable():
+                print "Skipping option %s: dependency '%s' is not available" % (option.name, dep.name)
+                return
+        if not option.canProcess():
+            print "Skipping option %s: option can not be processed" % option.name
+            return
+
+        previous_check_cache = self._startCheckCache()
+        try:
+            self._processOption(option, env, values, result_cache)
+        finally:
+            self._stopCheckCache(previous_check_cache)
+        if result_cache:
+            result_cache.save()
+
+    def _processOption(self, option, env, values, resultCache=None):
+        """
+        Run all the processing steps for a single option.
+        If a result cache is given and it holds valid results for a package option, the
+        results are restored from the cache instead of being found and validated again.
+        Since the fingerprint covers the state of the dependencies, changing the inputs of
+        one option only validates that option and the options depending on it again.
+        """
+        if isinstance(option, PackageOption):
+            option.clearVariantResults()
+
+        if self._lock is not None and isinstance(option, PackageOption):
+            state = self._lock.lookup(option, values)
+            if state is not None:
+                option.restoreCacheState(state)
+                if option.isAvailable():
+                    print "Checking for %s... [locked]" % option.name
+                else:
+                    print "Checking for %s... [locked, not available]" % option.name
+                self._runPhase(option, "completeProcess", env)
+                return
+
+        fingerprint = None
+        if resultCache is not None and isinstance(option, PackageOption):
+            fingerprint = ResultCache.computeFingerprint(option, env, values)
+            state = resultCache.lookup(option, fingerprint)
+            if state is not None:
+                option.restoreCacheState(state)
+                print "Checking for %s... [cached]" % option.name
+                self._runPhase(option, "completeProcess", env)
+                return
+            inputs = ResultCache.getOptionInputs(option, values)
+            changed = resultCache.getChangedInputs(option, inputs)
+            if changed:
+                print "Validating %s again, changed: %s" % (option.name, ", ".join(changed))
+
+        self._runPhase(option, "startProcess")           # Start processing
+        self._runPhase(option, "setInitial", values)     # Set initial values
+        self._runPhase(option, "find", env)              # Find values if needed
+        self._runPhase(option, "validate", env)          # Validate the settings
+        self._runPhase(option, "completeProcess", env)   # Signal processing completed
+
+        # Only successful detections are cached so missing packages get searched for again
+        if fingerprint is not None and option.isAvailable():
+            resultCache.store(option, fingerprint, option.getCacheState(), inputs)
 
     def Apply(self, env, all=False, allowedTypes=(), allowedNames=()):
         """ Apply options from this option group to the given environment.
@@ -909,73 +1486,225 @@ class Options:
             allowedTypes - If set, it is a list of option types that will be applied.
             allowedNames - If set, it is a list of option names that will be applied.
             note: if both are set, then either must be true.
+            If self.batchApply is set, the options are applied to an EnvDelta that is merged
+            into env once all options are applied.
         """
         #print "Options.Apply: %s %s %s"%(all, allowedTypes, allowedNames)
+        target_env = env
+        if self.batchApply:
+            target_env = EnvDelta.EnvDelta(env)
         for option in self.options:
             #print "Checking: ", option.name
             if (True == all) or (isinstance(option, allowedTypes)) or (option.name in allowedNames):
                 #print "    Passed, applying."
-                option.apply(env)
+                option.apply(target_env)
+        if self.batchApply:
+            target_env.flush()
+
+    def UseLockfile(self, filename):
+        """
+        Restore the results of package options from the given lockfile instead of finding
+        and validating them.  The lockfile is only used if it was exported on a matching host
+        and toolchain, and only for options whose values did not change.  Other options are
+        processed as usual.
+        """
+        self.lockfile = filename
+
+    def ExportLockfile(self, filename, env):
+        """
+        Write the results of all resolved package options to a lockfile.  Optional packages
+        that were not found are written too, so they are not searched for again either.
+        env - the environment the options were processed with.
+        """
+        lock = Lockfile.Lockfile(Lockfile.getHostFingerprint(env))
+        for option in self.options:
+            if not isinstance(option, PackageOption) or self._unresolved.has_key(id(option)):
+                continue
+            # Required options that are missing have to fail every time
+            if option.isAvailable() or not getattr(option, "required", False):
+                lock.add(option, self._values)
+        try:
+            lock.save(filename)
+        except (IOError, OSError, ValueError), x:
+            raise SCons.Errors.UserError, 'Error writing lockfile: %s\n%s' % (filename, x)
+
+    def AddLockfileOptions(self):
+        """
+        Add the --use-lockfile=FILE and --export-lockfile=FILE options to the scons command
+        line.  Process() then uses and exports lockfiles as requested.
+        """
+        import SCons.Script
+        SCons.Script.AddOption("--use-lockfile", dest="use_lockfile", type="string", nargs=1,
+                               action="store", metavar="FILE", default=None,
+                               help="Restore package option results from lockfile FILE.")
+        SCons.Script.AddOption("--export-lockfile", dest="export_lockfile", type="string", nargs=1,
+                               action="store", metavar="FILE", default=None,
+                               help="Write resolved package option results to lockfile FILE.")
+        self._lockfileCmdOptions = True
+
+    def RecordTranscript(self, filename):
+        """
+        Record everything Process() finds out about the host (config command output, flagpoll
+        and pkg-config answers, configure check results, file tests) to the given transcript
+        file.  Caches and lockfiles are not used while recording.
+        """
+        self.transcript = (Transcript.RECORD, filename)
+
+    def ReplayTranscript(self, filename):
+        """
+        Answer everything Process() needs to know about the host from the given transcript
+        file instead of running commands, checks, or looking at files.  Queries that are not
+        in the transcript fail and are reported when processing is done.
+        """
+        self.transcript = (Transcript.REPLAY, filename)
+
+    def AddTranscriptOptions(self):
+        """
+        Add the --record-transcript=FILE and --replay-transcript=FILE options to the scons
+        command line.  Process() then records or replays transcripts as requested.
+        """
+        import SCons.Script
+        SCons.Script.AddOption("--record-transcript", dest="record_transcript", type="string",
+                               nargs=1, action="store", metavar="FILE", default=None,
+                               help="Record the package option probes to transcript FILE.")
+        SCons.Script.AddOption("--replay-transcript", dest="replay_transcript", type="string",
+                               nargs=1, action="store", metavar="FILE", default=None,
+                               help="Answer the package option probes from transcript FILE.")
+        self._transcriptCmdOptions = True
+
+    def _getTranscriptRequest(self):
+        """ Return (mode, filename) of the transcript to use or None. """
+        if self._transcriptCmdOptions:
+            import SCons.Script
+            filename = SCons.Script.GetOption("replay_transcript")
+            if filename:
+                return (Transcript.REPLAY, filename)
+            filename = SCons.Script.GetOption("record_transcript")
+            if filename:
+                return (Transcript.RECORD, filename)
+        return self.transcript
+
+    def _startTranscript(self):
+        request = self._getTranscriptRequest()
+        if request is None:
+            return None
+        (mode, filename) = request
+        if Transcript.REPLAY == mode:
+            try:
+                transcript = Transcript.Transcript.load(filename)
+            except CacheFile.CacheFileError, ex:
+                raise SCons.Errors.UserError, 'Error reading transcript: %s\n%s' % (filename, ex)
+        else:
+            transcript = Transcript.Transcript(mode)
+        Transcript.activate(transcript)
+        return transcript
+
+    def _finishTranscript(self, transcript):
+        (mode, filename) = self._getTranscriptRequest()
+        Transcript.deactivate()
+        if Transcript.RECORD == mode:
+            try:
+                transcript.save(filename)
+                print "Wrote transcript to: %s" % filename
+            except (IOError, OSError, ValueError), ex:
+                print "Could not write transcript [%s]: %s" % (filename, ex)
+        else:
+            missing = transcript.getMissing()
+            if missing:
+                print "Transcript [%s] has no answer for %d queries:" % (filename, len(missing))
+                for m in missing:
+                    print "   %s" % m
+
+    def _loadLockfile(self, filename, env):
+        if not filename:
+            return None
+        try:
+            lock = Lockfile.Lockfile.load(filename)
+        except CacheFile.CacheFileError, ex:
+            print "Not using lockfile [%s]: %s" % (filename, ex)
+            return None
+        if lock.fingerprint != Lockfile.getHostFingerprint(env):
+            print "Not using lockfile [%s]: it was made for a different host or toolchain" % filename
+            return None
+        return lock
+
+    def ResolveVariant(self, env):
+        """
+        Resolve the variant specific results of all available package options for the
+        variant of env.  See PackageOption.getVariantResult().
+        """
+        for option in self.options:
+            if isinstance(option, PackageOption) and not self._unresolved.has_key(id(option)) \
+               and option.isAvailable():
+                option.getVariantResult(env)
 
     def Save(self, filename, env):
         """
         Saves all the options in the given file.  This file can
         then be used to load the options next run.  This can be used
-        to create an option cache file.
+        to create an option cache file.  The file is only rewritten
+        when the settings changed.  See CacheFile for the format.
 
         filename - Name of the file to save into
         env - the environment get the option values from
         """
 
-        # Create the file and write out the header
-        try:
-            fh = open(filename, 'w')
+        # Store each option setting that was assigned a value
+        key_value_list = []
+        for o in self.options:
+            if self._unresolved.has_key(id(o)):
+                # Never processed in lazy mode, so keep whatever was loaded for it
+                loaded = self._lazyContext[1]
+                key_value_list.extend([(k, loaded.get(k)) for k in o.keys])
+            else:
+                key_value_list.extend(o.getSettings())
 
-            try:
-                # Make an assignment in the file for each option within the environment
-                # that was assigned a value other than the default.
-                # For each option and each key
-                key_value_list = []
-                for o in self.options:
-                    key_value_list.extend(o.getSettings())                    
-                for (key,value) in key_value_list:
-                    if None != value:
-                        try:
-                            eval(repr(value))
-                        except:
-                            # Convert stuff that has a repr that cannon be evaled to string
-                            value = SCons.Util.to_string(value)                        
-                        fh.write('%s = %s\n' % (key, repr(value)))
-            finally:
-                fh.close()
-
-        except IOError, x:
+        settings = {}
+        for (key,value) in key_value_list:
+            if None != value:
+                if not ResultCache.isPlainData(value):
+                    # Convert stuff that can not be stored to string
+                    value = SCons.Util.to_string(value)
+                settings[key] = value
+
+        try:
+            CacheFile.save(filename, settings)
+        except (IOError, OSError, ValueError), x:
             raise SCons.Errors.UserError, 'Error writing options to file: %s\n%s' % (filename, x)
 
     def GenerateHelpText(self, env, sort=None, width=0):
         """
         Generate the help text for the options.
+        The text is memoized based on the options, their current values, and the width.
 
         env   - an environment that is used to get the current values of the options.
         sort  - A sort method to use
         width - max line width
         """
-        # Find width
         if 0 == width:
-            try:
-                import curses
-                curses.setupterm()
-                width = curses.tigetnum('cols')
-            except:
-                width = 80
-        
-        help_text = ""
+            width = getTerminalWidth()
+
         if sort:
             options = self.options[:]
-            options.sort(lambda x,y,func=sort: func(x.key[0],y.key[0]))
+            options.sort(lambda x,y,func=sort: func(x.keys[0],y.keys[0]))
         else:
             options = self.options
 
+        # Everything the text depends on
+        help_key = [width]
+        for o in options:
+            help_key.append((o.__class__.__name__, o.keys, o.help,
+                             [(k, env.get(k)) for k in o.keys if env.has_key(k)]))
+        help_key = ResultCache.md5_new(repr(help_key)).hexdigest()
+
+        if self._helpCache.has_key(help_key):
+            return self._helpCache[help_key]
+        if self._resultCache is not None:
+            help_text = self._resultCache.lookupKey("help", help_key)
+            if help_text is not None:
+                self._helpCache[help_key] = help_text
+                return help_text
+
         key_list = []
         for o in options:
             key_list.extend(o.keys)                
@@ -987,9 +1716,10 @@ class Options:
                                        initial_indent=leading_indent,
                                        subsequent_indent=key_spacing)
         
+        lines = []
         for option in options:
             if isinstance(option, SeparatorOption):
-                help_text = help_text + option.help + "\n"
+                lines.append(option.help + "\n")
             else:
                 for ki in range(len(option.keys)):
                     k = option.keys[ki]
@@ -997,22 +1727,26 @@ class Options:
                     if SCons.Util.is_List(option.help):
                         k_help = option.help[ki]
                     option_help = '%-*s %s\n' % (max_key_len, k+':', k_help)
-                    help_text = help_text + wrapper.fill(option_help) + "\n"
+                    lines.append(wrapper.fill(option_help) + "\n")
     
                     if env.has_key(k):
                         value = env[k]
-                        help_text += key_spacing
                         if isinstance(value,types.ListType):
-                            help_text += '%s\n'%value
+                            value_text = '%s'%value
                         elif isinstance(option, EnumOption):
-                            enum_text = str(value)
+                            value_text = str(value)
                             for (k,v) in option.map.iteritems():
                                if value == v:
-                                  enum_text = k
-                            help_text += '[%s]\n'%enum_text
+                                  value_text = k
+                            value_text = '[%s]'%value_text
                         else:
-                            help_text += '[%s]\n'%value
-                    
-
+                            value_text = '[%s]'%value
+                        lines.append(key_spacing + value_text + "\n")
+
+        help_text = "".join(lines)
+        self._helpCache[help_key] = help_text
+        if self._resultCache is not None:
+            self._resultCache.storeKey("help", help_key, help_text)
+            self._resultCache.save()
         return help_text
 
@@ -0,0 +1,238 @@
+"""SConsAddons.Options.PkgConfigBasedOption
+
+Defines common options structure for Options that use pkg-config .pc files.
+The .pc files are read in process (see SConsAddons.PkgConfig), pkg-config
+itself is never run.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import SCons.Environment     # Get the environment stuff
+import SConsAddons.Options   # Get the modular options stuff
+import SConsAddons.Options.Checks as Checks
+import SConsAddons.PkgConfig as PkgConfig
+import SConsAddons.FlagPoll as FlagPoll
+import SConsAddons.Util as sca_util
+import sys
+
+
+class PkgConfigBasedOption(SConsAddons.Options.PackageOption):
+   """
+   Options object for capturing common options and deps for pkg-config based options.
+   Gives the same found_* settings as FlagPollBasedOption.
+   """
+
+   def __init__(self, name, moduleName, requiredVersion=None, required=True, useCppPath=True,
+                helpText=None, compileTest=False, headerToCheck=None, headerOnly=False,
+                static=False):
+      """
+         name - The name to use for this option
+         moduleName - The name of the pkg-config module to look for.
+         requiredVersion - The minimum version of the module required (ex: "2.4.1")
+         required - Is the dependency required?  (if so we exit on errors)
+         useCppPath - If true, put the include paths in cpppath else, put them in cxxflags.
+         helpText - The help text to use for it all.
+         compileTest - If true, validate by compiling (and linking) against the package.
+         headerToCheck - Header to include in the compile test.
+         headerOnly - If true, the compile test only checks that headerToCheck can be included.
+         static - If true, link statically (libraries of Requires.private and Libs.private).
+      """
+      self.optionKey = name.replace(' ', '')+"PcFile"
+
+      if helpText is None:
+         helpText = "Location of the " + name + " pc file."
+
+      SConsAddons.Options.PackageOption.__init__(self, name, self.optionKey, helpText)
+
+      self.pcFile = None
+      self.moduleName = moduleName
+      self.requiredVersion = requiredVersion
+      self.required = required
+      self.useCppPath = useCppPath
+      self.compileTest = compileTest
+      self.headerToCheck = headerToCheck
+      self.headerOnly = headerOnly
+      self.static = static
+      self.available = False
+      self.package = None
+      self.found_incs = None
+      self.found_incs_as_flags = None
+      self.found_cxxflags = None
+      self.found_libs = None
+      self.found_lib_paths = None
+      self.found_link_from_libs = None
+      self.found_ver_str = None
+
+   def isAvailable(self):
+      return self.available
+
+   def checkRequired(self, msg):
+      """ Called when there is a config error.  If required, then exits with
+      error message """
+      print msg
+      if self.required:
+         sys.exit(1)
+
+   def startProcess(self):
+      print "Checking for %s..."%self.moduleName,
+
+   def setInitial(self, optDict):
+      " Set initial values from given dict "
+      if self.verbose:
+         print "   Setting initial %s settings."%self.moduleName
+      if optDict.has_key(self.optionKey):
+         self.pcFile = optDict[self.optionKey]
+         if self.verbose:
+            print "   %s specified or cached. [%s]."% (self.optionKey, self.pcFile)
+
+   def find(self, env):
+      print "   searching...",
+      self.package = None
+      if self.pcFile is not None and not sca_util.isFile(self.pcFile):
+         print "[failed]"
+         print "Option: %s  Could not find pc file: %s" % (self.moduleName, self.pcFile)
+         return
+      try:
+         self.package = PkgConfig.resolve(self.moduleName, self.static, self.pcFile)
+      except (FlagPoll.Unsupported, IOError, OSError), ex:
+         print "[failed]"
+         print "Option: %s  %s" % (self.moduleName, ex)
+         return
+      if self.package is None:
+         print "[failed]"
+      else:
+         print "[found]"
+
+   def validateCompile(self, env):
+      # Try to build against the library
+      conf_env = env.Clone()
+      self.apply(conf_env)
+      conf_ctxt = SConsAddons.Options.Configure(conf_env)
+
+      if self.headerOnly:
+         try:
+            passed = (not self.headerToCheck) or Checks.checkHeader(conf_ctxt, self.headerToCheck)
+         finally:
+            conf_ctxt.Finish()
+         if not passed:
+            print "Can't compile with %s" % self.headerToCheck
+         return passed
+
+      headers = []
+      if self.headerToCheck:
+         headers = [self.headerToCheck]
+      try:
+         (bad_headers, bad_libs) = Checks.checkBatch(conf_ctxt, headers, self.found_libs or [])
+      finally:
+         conf_ctxt.Finish()
+
+      for h in bad_headers:
+         print "Can't compile with %s" % h
+      for lib in bad_libs:
+         print "Can't link %s" % str(lib)
+      return not (bad_headers or bad_libs)
+
+   def validate(self, env):
+      passed = True
+
+      self.found_incs = None
+      self.found_cxxflags = None
+      self.found_libs = None
+      self.found_lib_paths = None
+      self.found_link_from_libs = None
+      self.found_ver_str = None
+
+      if self.package is None:
+         self.checkRequired("   %s not found in pkg-config path" % self.moduleName)
+         passed = False
+      else:
+         self.found_ver_str = self.package.version
+         if self.requiredVersion and \
+            not FlagPoll.versionMatches(self.found_ver_str, ">=", self.requiredVersion):
+            passed = False
+            self.checkRequired("   Version is too old! Required %s but found %s"%
+                               (self.requiredVersion, self.found_ver_str))
+
+      if passed:
+         self.found_incs           = self.package.getIncludes()
+         self.found_cxxflags       = self.package.getDefines()
+         self.found_libs           = self.package.getLibs()
+         self.found_lib_paths      = self.package.getLibPaths()
+         self.found_link_from_libs = self.package.getLinkFlags()
+         self.found_incs_as_flags = [env["INCPREFIX"] + p for p in self.found_incs]
+         print "   %s version: %s [OK]" % (self.moduleName, self.found_ver_str)
+
+      if passed and self.compileTest:
+         passed = self.validateCompile(env)
+         if not passed:
+            self.checkRequired("   Compile test failed for: %s"%self.moduleName)
+
+      self.available = passed
+      return passed
+
+   def apply(self, env, useCppPath=False):
+      """ Add environment options for building against the package """
+      if self.found_incs:
+         if self.useCppPath or useCppPath:
+            env.AppendUnique(CPPPATH = self.found_incs)
+         else:
+            env.AppendUnique(CXXFLAGS = self.found_incs_as_flags)
+      if self.found_cxxflags:
+         env.AppendUnique(CPPDEFINES = self.found_cxxflags)
+      if self.found_libs:
+         env.AppendUnique(LIBS = self.found_libs)
+      if self.found_lib_paths:
+         env.AppendUnique(LIBPATH = self.found_lib_paths)
+      if self.found_link_from_libs:
+         env.AppendUnique(LINKFLAGS = self.found_link_from_libs)
+
+   def getCacheDependencies(self, optDict):
+      # Adding or removing .pc files changes the directories
+      deps = list(PkgConfig.getSearchPath())
+      pc_file = optDict.get(self.optionKey)
+      deps.append(pc_file)
+      deps.extend([pc.path for pc in PkgConfig.getIndex().modules.get(self.moduleName, [])])
+      # The .pc files of the required modules the flags come from
+      try:
+         package = PkgConfig.resolve(self.moduleName, self.static, pc_file)
+      except (FlagPoll.Unsupported, IOError, OSError):
+         package = None
+      if package is not None:
+         deps.extend(package.getDependencies())
+      return deps
+
+   def getSettings(self):
+      return [(self.optionKey, self.pcFile),]
+
+   def getVersion(self):
+      ver_str = self.found_ver_str or ""
+      return [int(n) for n in ver_str.split(".") if n.isdigit()]
+
+   def dumpSettings(self):
+      "Write out the settings"
+      print "%s: %s" % (self.optionKey, self.pcFile)
+      print "CPPPATH:", self.found_incs
+      print "CPPDEFINES:", self.found_cxxflags
+      print "LIBS:", self.found_libs
+      print "LIBPATH:", self.found_lib_paths
+      print "LINKFLAGS:", self.found_link_from_libs
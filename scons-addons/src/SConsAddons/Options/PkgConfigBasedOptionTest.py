@@ -0,0 +1,88 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+from SConsAddons.Options.PkgConfigBasedOption import PkgConfigBasedOption
+
+
+class PkgConfigBasedOptionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_env = {}
+        for var in ("PKG_CONFIG_PATH", "PKG_CONFIG_LIBDIR"):
+            self.saved_env[var] = os.environ.get(var)
+        os.environ["PKG_CONFIG_PATH"] = self.tmpdir
+        os.environ["PKG_CONFIG_LIBDIR"] = ""
+        self.bar_pc = self._write("bar", "Version: 2.0\nLibs: -lbar\n")
+        self.foo_pc = self._write("foo", "Version: 1.0\nRequires: bar\nLibs: -lfoo\n")
+        self.option = PkgConfigBasedOption("Foo", "foo")
+
+    def tearDown(self):
+        for (var, value) in self.saved_env.items():
+            if value is None:
+                del os.environ[var]
+            else:
+                os.environ[var] = value
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name + ".pc")
+        fh = open(path, "w")
+        fh.write(text)
+        fh.close()
+        return path
+
+    def test_getCacheDependencies(self):
+        """Test that the .pc files of the requirements are dependencies"""
+        deps = self.option.getCacheDependencies({})
+        assert self.tmpdir in deps, deps
+        assert self.foo_pc in deps, deps
+        assert self.bar_pc in deps, deps
+        deps = self.option.getCacheDependencies({"FooPcFile":self.foo_pc})
+        assert self.bar_pc in deps, deps
+
+    def test_getCacheDependenciesMissing(self):
+        """Test the dependencies of modules that can not be resolved"""
+        os.remove(self.bar_pc)
+        deps = self.option.getCacheDependencies({"FooPcFile":self.foo_pc})
+        assert self.foo_pc in deps, deps
+        option = PkgConfigBasedOption("Nosuch", "nosuch")
+        assert option.getCacheDependencies({}) == [self.tmpdir, None]
+
+    def test_applyUnvalidated(self):
+        """Test that an option that was not validated adds nothing"""
+        env = SCons.Environment.Environment()
+        self.option.apply(env)
+        assert not env.has_key("LIBS")
+        assert self.option.getVersion() == []
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PkgConfigBasedOptionTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
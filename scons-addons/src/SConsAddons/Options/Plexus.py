@@ -9,6 +9,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment
 import SCons
 import SConsAddons.Options
+import SConsAddons.Util
 import SCons.Util
 import sys
 import os
@@ -18,8 +19,7 @@ import string
 from SCons.Util import WhereIs
 pj = os.path.join
 
-import SCons.SConf
-Configure = SCons.SConf.SConf    # Use same alias as SConstruct sees
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 class Plexus(SConsAddons.Options.PackageOption):
    """
@@ -64,17 +64,17 @@ class Plexus(SConsAddons.Options.PackageOption):
          return
 
       sys.stdout.write("searching...\n")
-      self.plxconfig_cmd = WhereIs('plexus-config')
+      self.plxconfig_cmd = SConsAddons.Util.whereIs('plexus-config')
       if None == self.plxconfig_cmd:
          self.checkRequired("   could not find plexus-config")
       else:
          sys.stdout.write("   found plexus-config.\n")
-         found_ver_str = os.popen(self.plxconfig_cmd + " --version").read().strip()
+         found_ver_str = SConsAddons.Util.readCommand([self.plxconfig_cmd, "--version"])
          sys.stdout.write("   version:%s"%found_ver_str)
 
-         self.baseDir = os.popen(self.plxconfig_cmd + " --prefix").read().strip()
+         self.baseDir = SConsAddons.Util.readCommand([self.plxconfig_cmd, "--prefix"])
 
-         if not os.path.isdir(self.baseDir):
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"%
             self.baseDir)
 
@@ -89,10 +89,10 @@ class Plexus(SConsAddons.Options.PackageOption):
       # check version correctness
       # update the temps for later usage
       passed = True
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("plexus base dir does not exist:%s"%self.baseDir)
-      if not os.path.isfile(self.plxconfig_cmd):
+      if not SConsAddons.Util.isFile(self.plxconfig_cmd):
          passed = False;
          self.checkRequired("plexus-config does not exist:%s"%self.plxconfig_cmd)
 
@@ -108,7 +108,7 @@ class Plexus(SConsAddons.Options.PackageOption):
          self.checkRequired("   Plexus version is too old! Required %s but found %s"%(self.requiredVersion, found_verStr))
 
       plx_header_file = pj(self.baseDir, 'include', 'plx', 'plxConfig.h')
-      if not os.path.isfile(plx_header_file):
+      if not SConsAddons.Util.isFile(plx_header_file):
          passed = False
          self.checkRequired("plxConfig.h not found:%s"%plx_header_file)
 
@@ -138,6 +138,18 @@ class Plexus(SConsAddons.Options.PackageOption):
       if self.found_lib_paths:
          env.Append(LIBPATH = self.found_lib_paths)
 
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if base_dir:
+         cmd = pj(base_dir, 'bin', 'plexus-config')
+         queries = [pj(base_dir, 'include', 'plx', 'plxConfig.h')]
+      else:
+         cmd = WhereIs('plexus-config')
+         if not cmd:
+            return []
+         queries = [[cmd, "--prefix"]]
+      return queries + [[cmd, arg] for arg in ("--version", "--cxxflags", "--libs")]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
@@ -0,0 +1,254 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import StringIO
+import sys
+import os
+
+import SCons.Environment
+import SCons.Node.FS
+import SCons.SConf
+import SConsAddons.Options as Options
+import SConsAddons.Options.CacheFile as CacheFile
+import SConsAddons.Options.CheckCache as CheckCache
+import SConsAddons.Util as sca_util
+
+
+class QueryOption(Options.PackageOption):
+    """ Package option that is found by running a config command. """
+    transientStateAttrs = Options.PackageOption.transientStateAttrs + ['validations']
+
+    def __init__(self, name, dependencies=None, found=True):
+        Options.PackageOption.__init__(self, name, [name + "_config"], "help", dependencies)
+        self.found = found
+        self.config = None
+        self.validations = 0
+
+    def setInitial(self, optDict):
+        self.config = optDict.get(self.keys[0])
+
+    def getPrefetchQueries(self, optDict):
+        return [["%s-config" % self.name.lower(), "--libs"]]
+
+    def validate(self, env):
+        self.validations += 1
+        self.available = self.found
+
+    def getSettings(self):
+        return []
+
+
+class ProcessTestCase(unittest.TestCase):
+    """ Runs Options.Process() in a scratch directory, configure tests write to the cwd. """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        # Start with a new file system, SCons keeps the first one it makes for good
+        SCons.Node.FS.default_fs = None
+        SCons.SConf.SConfFS = None
+        self.env = SCons.Environment.Environment()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def _failFast(self, jobs):
+        opts = Options.Options(jobs=jobs)
+        opts.failFast = True
+        for name in ("First", "Second"):
+            opts.AddOption(Options.StandardPackageOption(name, "help", header="%s_missing.h" % name,
+                                                         required=True))
+        try:
+            opts.Process(self.env)
+        except Options.RequiredOptionsError, ex:
+            assert [o.name for (o, e) in ex.errors] == ["First", "Second"], ex.errors
+        else:
+            assert False, "Process() did not fail"
+        # The configure contexts of the failed options were closed
+        conf = Options.Configure(self.env)
+        conf.Finish()
+
+    def test_failFast(self):
+        """Test that all required failures are reported together"""
+        self._failFast(1)
+
+    def test_failFastParallel(self):
+        """Test that required failures in worker threads are reported together"""
+        self._failFast(2)
+
+    def test_parallelChecks(self):
+        """Test that configure checks work from worker threads"""
+        opts = Options.Options(jobs=3)
+        for (name, header) in (("One", "stdio.h"), ("Two", "Two_missing.h"), ("Three", "stdlib.h")):
+            opts.AddOption(Options.StandardPackageOption(name, "help", header=header))
+        opts.Process(self.env)
+        assert [o.isAvailable() for o in opts.options] == [True, False, True]
+
+    def test_incremental(self):
+        """Test that only the options whose inputs changed are validated again"""
+        def process(args):
+            opts = Options.Options(cacheFile="results.cache", args=args)
+            foo = QueryOption("Foo")
+            opts.AddOption(foo)
+            opts.AddOption(QueryOption("Bar", [foo]))
+            opts.AddOption(QueryOption("Baz"))
+            opts.Process(self.env)
+            return [o.validations for o in opts.options]
+        assert process({}) == [1, 1, 1]
+        assert process({}) == [0, 0, 0]
+        assert process({"Baz_config":"/opt/bin/baz-config"}) == [0, 0, 1]
+        # Options depending on changed options are validated again too
+        assert process({"Baz_config":"/opt/bin/baz-config",
+                        "Foo_config":"/opt/bin/foo-config"}) == [1, 1, 0]
+
+    def test_checkCacheScope(self):
+        """Test that the shared check cache is only active while options are processed"""
+        active = []
+        class CheckingOption(QueryOption):
+            def validate(self, env):
+                active.append(CheckCache.activeCache is not None)
+                QueryOption.validate(self, env)
+        saved = os.environ.get(CheckCache.cacheDirEnvVar)
+        os.environ[CheckCache.cacheDirEnvVar] = self.tmpdir
+        try:
+            for lazy in (False, True):
+                opts = Options.Options(lazy=lazy)
+                opts.sharedCheckCache = True
+                opts.AddOption(CheckingOption("Foo"))
+                opts.Process(self.env)
+                assert CheckCache.activeCache is None
+                assert opts.options[0].isAvailable()
+                assert CheckCache.activeCache is None
+        finally:
+            if saved is None:
+                del os.environ[CheckCache.cacheDirEnvVar]
+            else:
+                os.environ[CheckCache.cacheDirEnvVar] = saved
+        assert active == [True, True], active
+
+    def test_lazy(self):
+        """Test that lazy mode processes options and their dependencies when they are used"""
+        opts = Options.Options(args={"Baz_config":"/opt/bin/baz-config"}, lazy=True)
+        foo = QueryOption("Foo")
+        bar = QueryOption("Bar", [foo])
+        baz = QueryOption("Baz")
+        for o in (foo, bar, baz):
+            opts.AddOption(o)
+        opts.Process(self.env)
+        assert [o.validations for o in opts.options] == [0, 0, 0]
+        assert bar.isAvailable()
+        assert [o.validations for o in opts.options] == [1, 1, 0]
+        assert foo.isAvailable() and bar.isAvailable()
+        assert [o.validations for o in opts.options] == [1, 1, 0]
+        # The values of options that were never used are kept
+        opts.Save("options.cache", self.env)
+        assert CacheFile.load("options.cache") == {"Baz_config":"/opt/bin/baz-config"}
+
+    def test_lazyUnavailableDependency(self):
+        """Test that lazy mode skips options whose dependencies are not available"""
+        opts = Options.Options(lazy=True)
+        foo = QueryOption("Foo", found=False)
+        bar = QueryOption("Bar", [foo])
+        opts.AddOption(foo)
+        opts.AddOption(bar)
+        opts.Process(self.env)
+        assert not bar.isAvailable()
+        assert [o.validations for o in opts.options] == [1, 0]
+
+    def _makeOptions(self, **kw):
+        # A value setInitial() picks up, so the state of the option changes
+        opts = Options.Options(cacheFile="results.cache", args={"Stdio_incdir":"/usr/include"},
+                               **kw)
+        opts.AddOption(Options.StandardPackageOption("Stdio", "help", header="stdio.h"))
+        return opts
+
+    def _prefetched(self, opts):
+        """ Return the commands opts prefetches in Process(). """
+        commands = []
+        saved = sca_util.prefetchCommand
+        sca_util.prefetchCommand = lambda argv: commands.append(argv[0])
+        try:
+            opts.Process(self.env)
+        finally:
+            sca_util.prefetchCommand = saved
+        return commands
+
+    def test_prefetchCacheMisses(self):
+        """Test that only the queries of options that are not cached are prefetched"""
+        def make_options():
+            opts = Options.Options(cacheFile="results.cache")
+            foo = QueryOption("Foo")
+            opts.AddOption(foo)
+            opts.AddOption(QueryOption("Bar", [foo]))
+            return opts
+        opts = make_options()
+        assert self._prefetched(opts) == ["foo-config", "bar-config"]
+        assert self._prefetched(make_options()) == []
+        opts = make_options()
+        opts.prefetch = False
+        os.remove("results.cache")
+        assert self._prefetched(opts) == []
+
+    def test_helpRestoresCachedResults(self):
+        """Test that help only processing restores the cached results"""
+        self._makeOptions().Process(self.env)
+        opts = self._makeOptions()
+        opts._helpRequested = lambda: True
+        opts.Process(self.env)
+        assert opts.options[0].isAvailable()
+
+    def test_helpDoesNotDetect(self):
+        """Test that help only processing does not detect anything"""
+        opts = self._makeOptions()
+        opts._helpRequested = lambda: True
+        saved = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            out = sys.stdout
+            opts.Process(self.env)
+        finally:
+            sys.stdout = saved
+        assert not opts.options[0].isAvailable()
+        assert not os.path.exists(".sconf_temp")
+        assert out.getvalue().find("Checking for") < 0, out.getvalue()
+
+    def test_helpText(self):
+        """Test that the help text follows the values in the environment"""
+        opts = self._makeOptions()
+        opts._helpRequested = lambda: True
+        opts.Process(self.env)
+        text = opts.GenerateHelpText(self.env, width=80)
+        assert text.find("Stdio_incdir:") >= 0, text
+        assert opts.GenerateHelpText(self.env, width=80) == text
+        self.env["Stdio_incdir"] = "/opt/include"
+        text = opts.GenerateHelpText(self.env, width=80)
+        assert text.find("[/opt/include]") >= 0, text
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ProcessTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
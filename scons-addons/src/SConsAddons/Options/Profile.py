@@ -0,0 +1,219 @@
+"""SConsAddons.Options.Profile
+
+Profiling of option processing.
+
+While a profiler is installed the time spent in each processing phase of each
+option is recorded along with the external commands the option runs and the
+configure checks it performs.  Enable it with Options.profile = True or by
+setting the SCONSADDONS_OPTIONS_PROFILE environment variable.  If the value of
+the variable is not a plain true value it is used as the name of the JSON file
+to write the results to.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, time, threading
+import SConsAddons.Util as sca_util
+
+profileEnvVar = "SCONSADDONS_OPTIONS_PROFILE"
+defaultProfileFile = "options_profile.json"
+
+phases = ['startProcess', 'setInitial', 'find', 'validate', 'completeProcess']
+
+# The profiler currently collecting data, if any
+activeProfiler = None
+
+
+def getProfileRequest():
+   """ Return (enabled, json filename) based on the profile environment variable. """
+   value = os.environ.get(profileEnvVar, "").strip()
+   if not value or value.lower() in ("0", "no", "false", "off"):
+      return (False, None)
+   if value.lower() in ("1", "yes", "true", "on"):
+      return (True, None)
+   return (True, value)
+
+
+def toJson(value):
+   """ Minimal JSON encoder for the plain data in profile reports. """
+   if value is None:
+      return "null"
+   if value is True:
+      return "true"
+   if value is False:
+      return "false"
+   if isinstance(value, (int, long)):
+      return str(value)
+   if isinstance(value, float):
+      return "%.6f" % value
+   if isinstance(value, basestring):
+      s = value.replace('\\', '\\\\').replace('"', '\\"')
+      s = s.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+      return '"%s"' % s
+   if isinstance(value, dict):
+      items = value.items()
+      items.sort()
+      return "{%s}" % ", ".join(["%s: %s" % (toJson(str(k)), toJson(v)) for (k,v) in items])
+   return "[%s]" % ", ".join([toJson(v) for v in value])
+
+
+class PhaseRecord(object):
+   """ Data collected for one phase of one option. """
+   def __init__(self, option, phase):
+      self.option = option
+      self.phase = phase
+      self.wall = 0.0
+      self.calls = 0
+      self.numCommands = 0
+      self.commandTime = 0.0
+      self.numChecks = 0
+      self.checkTime = 0.0
+
+   def asDict(self):
+      return {"option":self.option, "phase":self.phase, "wall":self.wall, "calls":self.calls,
+              "commands":self.numCommands, "command_time":self.commandTime,
+              "checks":self.numChecks, "check_time":self.checkTime}
+
+
+class OptionProfiler(object):
+   """
+   Collects timing of option processing phases.  Phases can nest (an option that is
+   resolved lazily while another one is being processed) and can run in several threads.
+   """
+   def __init__(self):
+      self.records = {}          # (option name, phase) -> PhaseRecord
+      self.order = []            # records in the order they were created
+      self.stacks = {}           # thread -> list of [record, start time]
+      self.lock = threading.Lock()
+      self.installed = False
+
+   def install(self):
+      """ Start collecting data. """
+      global activeProfiler
+      activeProfiler = self
+      if not self.installed:
+         sca_util.addCommandHook(self._commandRun)
+         self.installed = True
+
+   def uninstall(self):
+      global activeProfiler
+      if self.installed:
+         sca_util.removeCommandHook(self._commandRun)
+         self.installed = False
+      if activeProfiler is self:
+         activeProfiler = None
+
+   def _getRecord(self, optionName, phase):
+      key = (optionName, phase)
+      rec = self.records.get(key)
+      if rec is None:
+         rec = PhaseRecord(optionName, phase)
+         self.records[key] = rec
+         self.order.append(rec)
+      return rec
+
+   def _current(self):
+      stack = self.stacks.get(threading.currentThread())
+      if stack:
+         return stack[-1][0]
+      return self._getRecord("<none>", "<outside>")
+
+   def begin(self, option, phase):
+      self.lock.acquire()
+      try:
+         rec = self._getRecord(option.name, phase)
+         rec.calls += 1
+         self.stacks.setdefault(threading.currentThread(), []).append([rec, time.time()])
+      finally:
+         self.lock.release()
+
+   def end(self):
+      now = time.time()
+      self.lock.acquire()
+      try:
+         (rec, start) = self.stacks[threading.currentThread()].pop()
+         rec.wall += now - start
+      finally:
+         self.lock.release()
+
+   def _commandRun(self, result):
+      """ Hook called by SConsAddons.Util.runCommand for every command. """
+      self.recordCommand(result.duration)
+
+   def recordCommand(self, duration):
+      """ Record an external command run by the current option. """
+      self.lock.acquire()
+      try:
+         rec = self._current()
+         rec.numCommands += 1
+         rec.commandTime += duration
+      finally:
+         self.lock.release()
+
+   def recordCheck(self, duration):
+      """ Record a configure check run by the current option. """
+      self.lock.acquire()
+      try:
+         rec = self._current()
+         rec.numChecks += 1
+         rec.checkTime += duration
+      finally:
+         self.lock.release()
+
+   def getRecords(self):
+      """ Return the records sorted by decreasing wall time. """
+      recs = self.order[:]
+      recs.sort(lambda x,y: cmp(y.wall, x.wall) or cmp(x.option, y.option))
+      return recs
+
+   def getReport(self):
+      """ Return the profile as a text table. """
+      recs = self.getRecords()
+      name_len = max([len("Option")] + [len(r.option) for r in recs])
+      phase_len = max([len("Phase")] + [len(r.phase) for r in recs])
+      fmt = "%%-%ds %%-%ds %%9s %%6s %%9s %%6s %%9s\n" % (name_len, phase_len)
+      lines = ["Option processing profile:\n",
+               fmt % ("Option", "Phase", "Wall(s)", "Cmds", "Cmd(s)", "Checks", "Check(s)")]
+      for r in recs:
+         lines.append(fmt % (r.option, r.phase, "%.3f" % r.wall, r.numCommands,
+                             "%.3f" % r.commandTime, r.numChecks, "%.3f" % r.checkTime))
+
+      totals = {}
+      for r in recs:
+         if r.phase in phases:
+            totals[r.option] = totals.get(r.option, 0.0) + r.wall
+      totals = [(t, n) for (n, t) in totals.items()]
+      totals.sort()
+      totals.reverse()
+      lines.append("Total per option:\n")
+      for (t, n) in totals:
+         lines.append("  %-*s %9.3f\n" % (name_len, n, t))
+      return "".join(lines)
+
+   def writeJson(self, filename):
+      fh = open(filename, 'w')
+      try:
+         fh.write(toJson({"records":[r.asDict() for r in self.getRecords()]}))
+         fh.write("\n")
+      finally:
+         fh.close()
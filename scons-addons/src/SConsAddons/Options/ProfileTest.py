@@ -0,0 +1,118 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SConsAddons.Options.Profile as Profile
+from SConsAddons.Util import runCommand, WhereIs
+
+
+class Opt:
+    def __init__(self, name):
+        self.name = name
+
+
+class ProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profile.OptionProfiler()
+        self.saved_request = os.environ.get(Profile.profileEnvVar)
+
+    def tearDown(self):
+        self.profiler.uninstall()
+        if self.saved_request is None:
+            os.environ.pop(Profile.profileEnvVar, None)
+        else:
+            os.environ[Profile.profileEnvVar] = self.saved_request
+
+    def test_getProfileRequest(self):
+        """Test reading the profile request from the environment"""
+        for (value, request) in (("", (False, None)), ("off", (False, None)),
+                                 ("1", (True, None)), ("yes", (True, None)),
+                                 ("prof.json", (True, "prof.json"))):
+            os.environ[Profile.profileEnvVar] = value
+            assert Profile.getProfileRequest() == request, value
+
+    def test_toJson(self):
+        """Test encoding profile data as JSON"""
+        assert Profile.toJson({"b":[1, 2.5, None], "a":'say "hi"\n'}) == \
+               '{"a": "say \\"hi\\"\\n", "b": [1, 2.500000, null]}'
+        assert Profile.toJson((True, False)) == "[true, false]"
+
+    def test_phases(self):
+        """Test that nested phases and checks are recorded for the right option"""
+        foo = Opt("foo")
+        bar = Opt("bar")
+        self.profiler.begin(foo, "validate")
+        self.profiler.recordCheck(0.5)
+        self.profiler.begin(bar, "find")
+        self.profiler.recordCheck(0.25)
+        self.profiler.end()
+        self.profiler.end()
+        self.profiler.begin(foo, "validate")
+        self.profiler.end()
+        recs = dict([((r.option, r.phase), r) for r in self.profiler.getRecords()])
+        assert recs[("foo", "validate")].calls == 2
+        assert recs[("foo", "validate")].numChecks == 1
+        assert recs[("foo", "validate")].checkTime == 0.5
+        assert recs[("bar", "find")].numChecks == 1
+        # Nested phases are part of the wall time of the outer phase
+        assert recs[("foo", "validate")].wall >= recs[("bar", "find")].wall
+        report = self.profiler.getReport()
+        assert report.find("Total per option:") >= 0, report
+        assert report.find("foo") >= 0 and report.find("bar") >= 0, report
+
+    def test_commands(self):
+        """Test that the commands run while installed are recorded"""
+        if not WhereIs("true"):
+            return
+        self.profiler.install()
+        self.profiler.begin(Opt("foo"), "find")
+        runCommand(["true"])
+        self.profiler.end()
+        self.profiler.uninstall()
+        runCommand(["true"])
+        recs = self.profiler.getRecords()
+        assert [(r.option, r.numCommands) for r in recs] == [("foo", 1)]
+
+    def test_writeJson(self):
+        """Test writing the profile as JSON"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.profiler.begin(Opt("foo"), "find")
+            self.profiler.end()
+            filename = os.path.join(tmpdir, "profile.json")
+            self.profiler.writeJson(filename)
+            text = open(filename).read()
+            assert text.startswith('{"records": [{'), text
+            assert text.find('"option": "foo"') >= 0, text
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ProfileTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
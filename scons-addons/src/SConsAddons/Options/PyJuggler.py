@@ -9,14 +9,14 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment
 import SCons
 import SConsAddons.Options
+import SConsAddons.Util
 import SCons.Util
 import sys, os, re, string
 
 from SCons.Util import WhereIs
 pj = os.path.join
 
-import SCons.SConf
-Configure = SCons.SConf.SConf    # Use same alias as SConstruct sees
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 class PyJuggler(SConsAddons.Options.PackageOption):
    """
@@ -70,12 +70,12 @@ class PyJuggler(SConsAddons.Options.PackageOption):
       # check version correctness
       # update the temps for later usage
       passed = True
-      if self.baseDir == None or not os.path.isdir(self.baseDir):
+      if self.baseDir == None or not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("PyJuggler base dir does not exist:%s"%self.baseDir)
 
       pyjuggler_header_file = pj(self.baseDir, 'include', 'pyjutil', 'InterpreterGuard.h')
-      if not os.path.isfile(pyjuggler_header_file):
+      if not SConsAddons.Util.isFile(pyjuggler_header_file):
          passed = False
          self.checkRequired("InterpreterGuard.h not found:%s"%pyjuggler_header_file)
 
@@ -32,7 +32,6 @@ import SConsAddons.Options   # Get the modular options stuff
 import SConsAddons.Util
 import sys, os, re, string
 
-from SCons.Util import WhereIs
 pj = os.path.join
 
 import SCons.Node.FS
@@ -139,8 +138,8 @@ class Pyste(SConsAddons.Options.PackageOption):
       if self.pysteScriptPath == None:
          # Try to find it in path somehow
          print "   searching for pyste.py in path...";
-         if(WhereIs('pyste.py') != None):
-            self.pysteScriptPath = WhereIs('pyste.py')
+         if(SConsAddons.Util.whereIs('pyste.py') != None):
+            self.pysteScriptPath = SConsAddons.Util.whereIs('pyste.py')
             self.pysteScriptCommand = "python " + self.pysteScriptPath
             print "   found: %s" % self.pysteScriptPath
          else:
@@ -158,13 +157,13 @@ class Pyste(SConsAddons.Options.PackageOption):
       if not self.pysteScriptPath:
           passed = False
       else:
-          if not os.path.isfile(self.pysteScriptPath):
+          if not SConsAddons.Util.isFile(self.pysteScriptPath):
              passed = False;
              self.checkRequired("   pyste files does not exist:%s" % self.pysteScriptPath);
           else:
              # Check for version information
              print "   Checking version:",
-             found_ver_str = os.popen(self.pysteScriptCommand + " --version").read().strip().split(" ")[-1];
+             found_ver_str = SConsAddons.Util.readCommand(self.pysteScriptCommand + " --version").split(" ")[-1];
              print found_ver_str
       
              # Check version requirement
@@ -0,0 +1,235 @@
+"""SConsAddons.Options.ResultCache
+
+Persistent cache of package option detection results.
+
+Each package option that is processed is fingerprinted using everything that
+its detection depends upon (its own settings, the option values given to it,
+the compiler, a few construction variables, and the state of files that it
+probes).  If the fingerprint matches the one stored in the cache, the results
+of the previous run are restored instead of running find() and validate() again.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, types
+import SCons.Util
+import SConsAddons.Util as sca_util
+import CacheFile
+
+try:
+   import hashlib
+   md5_new = hashlib.md5
+except ImportError:
+   import md5
+   md5_new = md5.new
+
+CACHE_VERSION = 2
+
+# Construction variables that influence the outcome of configuration checks.
+fingerprintVars = ['CPPPATH', 'LIBPATH', 'LIBS', 'CPPDEFINES', 'CCFLAGS', 'CXXFLAGS',
+                   'LINKFLAGS', 'INCPREFIX', 'CCVERSION', 'CXXVERSION']
+
+# Environment variables that influence where tools and packages are found.
+fingerprintEnvVars = ['PATH', 'PKG_CONFIG_PATH', 'FLAGPOLL_PATH']
+
+# Option attributes that describe the option itself rather than what was found.
+excludedStateAttrs = ['name', 'keys', 'help', 'verbose']
+
+_plainTypes = (types.NoneType, types.BooleanType, types.IntType, types.LongType,
+               types.FloatType, types.StringType, types.UnicodeType)
+
+
+def isPlainData(value):
+   """ Return true if value only contains data that can be stored in the cache. """
+   if isinstance(value, _plainTypes):
+      return True
+   if type(value) in (types.ListType, types.TupleType):
+      for v in value:
+         if not isPlainData(v):
+            return False
+      return True
+   if type(value) is types.DictType:
+      for (k,v) in value.iteritems():
+         if not isPlainData(k) or not isPlainData(v):
+            return False
+      return True
+   return False
+
+def canonical(value):
+   """ Return a representation of value whose repr() is stable between runs. """
+   if isinstance(value, _plainTypes):
+      return value
+   if SCons.Util.is_List(value):
+      return [canonical(v) for v in value]
+   if type(value) is types.DictType:
+      items = [(canonical(k), canonical(v)) for (k,v) in value.iteritems()]
+      items.sort()
+      return items
+   return str(value)
+
+def statPath(path):
+   """ Return the (mtime, size) of path or None if it does not exist. """
+   try:
+      st = os.stat(path)
+   except (OSError, TypeError):
+      return None
+   return (int(st.st_mtime), st.st_size)
+
+def getOptionState(option):
+   """ Return dictionary of all the plain data attributes of the given option. """
+   state = {}
+   excluded = excludedStateAttrs + list(getattr(option, "transientStateAttrs", []))
+   for (k,v) in option.__dict__.iteritems():
+      if k not in excluded and isPlainData(v):
+         state[k] = v
+   return state
+
+
+_toolchain_ids = {}
+
+def getToolchainIdentity(env):
+   """ Return data identifying the compiler and linker used by env. """
+   edict = env.Dictionary()
+   tools = tuple([str(edict.get(v,"")) for v in ('CC', 'CXX', 'LINK')])
+   if not _toolchain_ids.has_key(tools):
+      ident = [sca_util.GetPlatform(), sca_util.GetArch()]
+      for t in tools:
+         # Strip wrappers like distcc and use the real compiler
+         tool = (t.split() or [""])[-1]
+         tool_path = None
+         if tool:
+            tool_path = env.WhereIs(tool)
+         ident.append((t, tool_path, statPath(tool_path)))
+      _toolchain_ids[tools] = ident
+   return _toolchain_ids[tools]
+
+def getDependencyState(option):
+   """ Return a digest of the resolved state of the dependencies of option.
+       Options have to be validated again whenever one of their dependencies changed.
+   """
+   deps = []
+   for dep in getattr(option, "dependencies", []):
+      deps.append((dep.name, dep.isAvailable(), canonical(getOptionState(dep))))
+   return md5_new(repr(deps)).hexdigest()
+
+def getOptionInputs(option, optDict):
+   """ Return the inputs of option that are compared against the cached ones to report
+       what changed: the values of its keys and the state of its dependencies.
+   """
+   key_values = {}
+   for k in option.keys:
+      key_values[k] = canonical(optDict.get(k))
+   return {"values":key_values, "deps":getDependencyState(option)}
+
+def computeFingerprint(option, env, optDict, extra=None):
+   """ Compute a fingerprint of all the inputs to the detection of option.
+       option  - The package option that is about to be processed.
+       env     - The environment it will be processed in.
+       optDict - The dictionary of option values it will be initialized from.
+       extra   - Any additional data that should be part of the fingerprint.
+   """
+   edict = env.Dictionary()
+   key_values = [(k, optDict.get(k)) for k in option.keys]
+   paths = [v for (k,v) in key_values if SCons.Util.is_String(v)]
+   paths.extend([p for p in option.getCacheDependencies(optDict) if p])
+
+   parts = [CACHE_VERSION,
+            option.__class__.__module__, option.__class__.__name__,
+            canonical(getOptionState(option)),
+            canonical(key_values),
+            getDependencyState(option),
+            getToolchainIdentity(env),
+            [(v, canonical(edict.get(v))) for v in fingerprintVars],
+            [(v, os.environ.get(v)) for v in fingerprintEnvVars],
+            [(p, statPath(p)) for p in paths],
+            canonical(extra)]
+   return md5_new(repr(parts)).hexdigest()
+
+
+class ResultCache(object):
+   """
+   On-disk store of option detection results keyed by option fingerprints.
+   """
+   def __init__(self, filename):
+      self.filename = filename
+      self.entries = {}        # option id -> (fingerprint, state, inputs)
+      self.dirty = False
+      self.load()
+
+   def getOptionId(self, option):
+      return "%s.%s:%s" % (option.__class__.__module__, option.__class__.__name__, option.name)
+
+   def load(self):
+      " Load the entries from the cache file. A missing or corrupt file is just ignored. "
+      try:
+         data = CacheFile.load(self.filename, legacy=False)
+      except CacheFile.CacheFileError, ex:
+         print "Ignoring unreadable option result cache [%s]: %s" % (self.filename, ex)
+         return
+      if type(data) is types.DictType and data.get("version") == CACHE_VERSION:
+         self.entries = data.get("entries", {})
+
+   def lookup(self, option, fingerprint):
+      """ Return the cached state of option or None if there is no valid entry. """
+      return self.lookupKey(self.getOptionId(option), fingerprint)
+
+   def store(self, option, fingerprint, state, inputs=None):
+      self.storeKey(self.getOptionId(option), fingerprint, state, inputs)
+
+   def getChangedInputs(self, option, inputs):
+      """ Return list of the inputs of option that differ from the cached entry.
+          The keys whose values changed are listed by name, changed dependencies as
+          'dependencies'.  Returns None if there is nothing to compare against.
+      """
+      entry = self.entries.get(self.getOptionId(option))
+      if not entry or not entry[2]:
+         return None
+      old_inputs = entry[2]
+      old_values = old_inputs.get("values", {})
+      changed = [k for k in option.keys
+                 if inputs["values"].get(k) != old_values.get(k)]
+      if inputs["deps"] != old_inputs.get("deps"):
+         changed.append("dependencies")
+      return changed
+
+   def lookupKey(self, key, fingerprint):
+      """ Return the data stored under key or None if there is no entry with fingerprint. """
+      entry = self.entries.get(key)
+      if entry and entry[0] == fingerprint:
+         return entry[1]
+      return None
+
+   def storeKey(self, key, fingerprint, data, inputs=None):
+      if self.entries.get(key) != (fingerprint, data, inputs):
+         self.entries[key] = (fingerprint, data, inputs)
+         self.dirty = True
+
+   def save(self):
+      " Write the cache back out if anything changed. "
+      if not self.dirty:
+         return
+      try:
+         CacheFile.save(self.filename, {"version":CACHE_VERSION, "entries":self.entries})
+         self.dirty = False
+      except (IOError, OSError, ValueError), ex:
+         print "Could not write option result cache [%s]: %s" % (self.filename, ex)
@@ -0,0 +1,112 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SConsAddons.Options as Options
+import SConsAddons.Options.ResultCache as ResultCache
+
+
+class Option(Options.PackageOption):
+    """ Option that depends on the files it is given. """
+    def __init__(self, name, deps=None):
+        Options.PackageOption.__init__(self, name, [name + "_dir"], "help")
+        self.deps = deps or []
+        self.found = None
+
+    def getCacheDependencies(self, optDict):
+        return self.deps
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = SCons.Environment.Environment()
+        self.dep = os.path.join(self.tmpdir, "dep.fpc")
+        self._touch(self.dep, "1")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _touch(self, path, text):
+        fh = open(path, "w")
+        fh.write(text)
+        fh.close()
+
+    def test_fingerprint(self):
+        """Test that the fingerprint changes with the inputs of the option"""
+        option = Option("Foo", [self.dep])
+        fp = ResultCache.computeFingerprint(option, self.env, {})
+        assert fp == ResultCache.computeFingerprint(option, self.env, {})
+        assert fp != ResultCache.computeFingerprint(option, self.env, {"Foo_dir":"/opt"})
+        assert fp != ResultCache.computeFingerprint(option, self.env.Clone(LIBS=["m"]), {})
+        assert fp != ResultCache.computeFingerprint(option, self.env, {}, extra="other")
+        # Changing a dependency changes the fingerprint
+        self._touch(self.dep, "22")
+        assert fp != ResultCache.computeFingerprint(option, self.env, {})
+
+    def test_fingerprintFoundState(self):
+        """Test that the fingerprint changes with the state of the option"""
+        option = Option("Foo")
+        fp = ResultCache.computeFingerprint(option, self.env, {})
+        option.found = "/opt/foo"
+        assert fp != ResultCache.computeFingerprint(option, self.env, {})
+
+    def test_storeLookup(self):
+        """Test that results are kept across instances under their fingerprint"""
+        filename = os.path.join(self.tmpdir, "results.cache")
+        option = Option("Foo")
+        cache = ResultCache.ResultCache(filename)
+        assert cache.lookup(option, "fp") is None
+        cache.store(option, "fp", {"found":"/opt/foo"})
+        cache.save()
+        cache = ResultCache.ResultCache(filename)
+        assert cache.lookup(option, "fp") == {"found":"/opt/foo"}
+        assert cache.lookup(option, "other") is None
+        assert cache.lookup(Option("Bar"), "fp") is None
+
+    def test_getChangedInputs(self):
+        """Test reporting the inputs that changed since the entry was stored"""
+        option = Option("Foo")
+        cache = ResultCache.ResultCache(os.path.join(self.tmpdir, "results.cache"))
+        assert cache.getChangedInputs(option, ResultCache.getOptionInputs(option, {})) is None
+        cache.store(option, "fp", {}, ResultCache.getOptionInputs(option, {}))
+        assert cache.getChangedInputs(option, ResultCache.getOptionInputs(option, {})) == []
+        inputs = ResultCache.getOptionInputs(option, {"Foo_dir":"/opt"})
+        assert cache.getChangedInputs(option, inputs) == ["Foo_dir"]
+
+    def test_isPlainData(self):
+        """Test which values can be stored in the cache"""
+        assert ResultCache.isPlainData({"a":[1, (2.0, None)], "b":u"x"})
+        assert not ResultCache.isPlainData([self.env])
+        assert ResultCache.canonical({"b":1, "a":2}) == [("a", 2), ("b", 1)]
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ResultCacheTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
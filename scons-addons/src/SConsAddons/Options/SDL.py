@@ -19,8 +19,7 @@ if SConsAddons.Util.GetPlatform()=='darwin':
 from SCons.Util import WhereIs
 pj = os.path.join
 
-import SCons.SConf
-Configure = SCons.SConf.SConf
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 class SDL(SConsAddons.Options.PackageOption):
    """
@@ -65,17 +64,17 @@ class SDL(SConsAddons.Options.PackageOption):
          return
 
       sys.stdout.write("searching...\n")
-      self.sdlconfig_cmd = WhereIs('sdl-config')
+      self.sdlconfig_cmd = SConsAddons.Util.whereIs('sdl-config')
       if None == self.sdlconfig_cmd:
          self.checkRequired("   Could not find sdl-config")
       else:
          sys.stdout.write("    found sdl-config.\n")
-         found_ver_str = os.popen(self.sdlconfig_cmd + " --version").read().strip()
+         found_ver_str = SConsAddons.Util.readCommand([self.sdlconfig_cmd, "--version"])
          sys.stdout.write("   version: %s"%found_ver_str)
 
-         self.baseDir = os.popen(self.sdlconfig_cmd + "  --prefix").read().strip()
+         self.baseDir = SConsAddons.Util.readCommand([self.sdlconfig_cmd, "--prefix"])
 
-         if not os.path.isdir(self.baseDir):
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist: %s"%self.baseDir)
 
             self.baseDir = None;
@@ -84,10 +83,10 @@ class SDL(SConsAddons.Options.PackageOption):
    
    def validate(self, env):
       passed = True
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("sdl base dir does not exist: %s"%self.baseDir)
-      if not os.path.isfile(self.sdlconfig_cmd):
+      if not SConsAddons.Util.isFile(self.sdlconfig_cmd):
          passed=False;
          self.checkRequired("sdl-config does not exist:%s"%self.sdlconfig_cmd)
       cfg_cmd_parser = SConsAddons.Util.ConfigCmdParser(self.sdlconfig_cmd)
@@ -100,7 +99,7 @@ class SDL(SConsAddons.Options.PackageOption):
          self.checkRequired("   SDL version is too old! Required %s but found %s"%(self.requiredVersion, found_ver_str))
 
       sdl_header_file = pj(self.baseDir, 'include', 'SDL', 'SDL.h')
-      if not os.path.isfile(sdl_header_file):
+      if not SConsAddons.Util.isFile(sdl_header_file):
          passed = False
          self.checkRequired("sdlConfig.h not found:%s"%sdl_header_file)
       self.found_incs = cfg_cmd_parser.findIncludes("--cflags")
@@ -129,6 +128,18 @@ class SDL(SConsAddons.Options.PackageOption):
       if self.found_lib_paths:
          env.Append(LIBPATH = self.found_lib_paths)
 
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if base_dir:
+         cmd = pj(base_dir, 'bin', 'sdl-config')
+         queries = [pj(base_dir, 'include', 'SDL', 'SDL.h')]
+      else:
+         cmd = WhereIs('sdl-config')
+         if not cmd:
+            return []
+         queries = [[cmd, "--prefix"]]
+      return queries + [[cmd, arg] for arg in ("--version", "--cflags", "--libs")]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
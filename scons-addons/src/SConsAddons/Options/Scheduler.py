@@ -0,0 +1,381 @@
+"""SConsAddons.Options.Scheduler
+
+Dependency graph based scheduling of option processing.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import sys, heapq, threading, Queue, StringIO
+import SCons.Errors
+
+
+def declarationOrderPolicy(option, index):
+   """ Default scheduling policy: process ready options in the order they were added. """
+   return index
+
+
+def getRequiredClosure(options):
+   """ Return dictionary of the ids of all required options and everything they depend on. """
+   closure = {}
+   stack = [o for o in options if getattr(o, "required", False)]
+   while stack:
+      o = stack.pop()
+      if not closure.has_key(id(o)):
+         closure[id(o)] = o
+         stack.extend(getattr(o, "dependencies", []))
+   return closure
+
+
+class RequiredFirstPolicy(object):
+   """
+   Scheduling policy that processes required options and all the options they depend on
+   before any optional option.  Otherwise options are processed in declaration order.
+   """
+   def __init__(self, options):
+      self.required = getRequiredClosure(options)
+
+   def __call__(self, option, index):
+      return (not self.required.has_key(id(option)), index)
+
+
+def findCycle(options):
+   """ Return a list of options forming a dependency cycle or None if there is no cycle.
+       The first option in the list is repeated at the end to close the cycle.
+   """
+   known = {}
+   for o in options:
+      known[id(o)] = o
+
+   WHITE, GREY, BLACK = 0, 1, 2
+   color = {}
+   for start in options:
+      if color.get(id(start), WHITE) != WHITE:
+         continue
+      # Iterative depth first search keeping the current path on a stack
+      path = [start]
+      iters = [iter(getattr(start, "dependencies", []))]
+      color[id(start)] = GREY
+      while path:
+         advanced = False
+         for dep in iters[-1]:
+            if not known.has_key(id(dep)):
+               continue
+            c = color.get(id(dep), WHITE)
+            if c == GREY:
+               return path[path.index(dep):] + [dep]
+            if c == WHITE:
+               color[id(dep)] = GREY
+               path.append(dep)
+               iters.append(iter(getattr(dep, "dependencies", [])))
+               advanced = True
+               break
+         if not advanced:
+            color[id(path[-1])] = BLACK
+            path.pop()
+            iters.pop()
+   return None
+
+
+class OptionScheduler(object):
+   """
+   Schedules the processing of options based on the dependency graph formed by
+   PackageOption.dependencies.  Options become ready once all their dependencies have
+   completed.  Ready options are handed out in the order determined by the scheduling
+   policy, a callable that is passed (option, declarationIndex) and returns a sort key.
+
+   Options whose dependencies are not available (either they failed, or they are not managed
+   by this scheduler and were never processed) are skipped and reported in self.skipped.
+   """
+   def __init__(self, options, policy=None):
+      if policy is None:
+         policy = declarationOrderPolicy
+      self.policy = policy
+      self.options = []
+      self.index = {}            # id(option) -> declaration index
+      self.waitCount = {}        # id(option) -> number of dependencies not completed yet
+      self.dependents = {}       # id(option) -> list of options depending on it
+      self.ready = []            # heap of (policy key, index, option)
+      self.deferred = []         # options that are ready but returned False from canProcess()
+      self.skipped = []          # list of (option, reason) for options that will not be processed
+      self.skippedIds = {}
+      self.numCompleted = 0
+      self._completedAtDeferral = -1
+
+      for o in options:
+         if not self.index.has_key(id(o)):
+            self.index[id(o)] = len(self.options)
+            self.options.append(o)
+
+      cycle = findCycle(self.options)
+      if cycle:
+         raise SCons.Errors.UserError("Dependency cycle between options: %s" %
+                                      " -> ".join([o.name for o in cycle]))
+
+      missing = {}
+      for o in self.options:
+         self.dependents[id(o)] = []
+      for o in self.options:
+         waiting = 0
+         for dep in getattr(o, "dependencies", []):
+            if self.index.has_key(id(dep)):
+               waiting += 1
+               self.dependents[id(dep)].append(o)
+            elif not dep.isAvailable():
+               missing[id(o)] = dep
+         self.waitCount[id(o)] = waiting
+
+      for o in self.options:
+         if missing.has_key(id(o)):
+            self._skip(o, "dependency '%s' is not available and is not processed by these options" %
+                       missing[id(o)].name)
+         elif 0 == self.waitCount[id(o)]:
+            self._push(o)
+
+   def _push(self, option):
+      i = self.index[id(option)]
+      heapq.heappush(self.ready, (self.policy(option, i), i, option))
+
+   def _skip(self, option, reason):
+      """ Skip option and all options that depend on it. """
+      if self.waitCount.get(id(option)) is None:
+         return
+      self.waitCount[id(option)] = None
+      self.skipped.append((option, reason))
+      self.skippedIds[id(option)] = True
+      for d in self.dependents[id(option)]:
+         self._skip(d, "dependency '%s' was skipped" % option.name)
+
+   def isSkipped(self, option):
+      return self.skippedIds.has_key(id(option))
+
+   def hasReady(self, running=0):
+      """ Return true if there is an option ready to process.
+          Options deferred by canProcess() are retried once the ready queue drains as long
+          as some other option has completed in the meantime.
+          running - Number of options handed out that have not completed yet.
+      """
+      if not self.ready and self.deferred:
+         if self.numCompleted != self._completedAtDeferral:
+            self._completedAtDeferral = self.numCompleted
+            for o in self.deferred:
+               self._push(o)
+            self.deferred = []
+         elif 0 == running:
+            for o in self.deferred:
+               self._skip(o, "option could never be processed (canProcess() returned False)")
+            self.deferred = []
+      return len(self.ready) > 0
+
+   def nextReady(self):
+      """ Return the next option to process or None if the next ready option must wait. """
+      option = heapq.heappop(self.ready)[2]
+      if not option.canProcess():
+         self.deferred.append(option)
+         return None
+      return option
+
+   def complete(self, option):
+      """ Mark option as processed and release the options depending on it. """
+      self.numCompleted += 1
+      self.waitCount[id(option)] = None
+      available = (not hasattr(option, "isAvailable")) or option.isAvailable()
+      for d in self.dependents[id(option)]:
+         if self.waitCount.get(id(d)) is None:
+            continue
+         if not available:
+            self._skip(d, "dependency '%s' is not available" % option.name)
+         else:
+            self.waitCount[id(d)] -= 1
+            if 0 == self.waitCount[id(d)]:
+               self._push(d)
+
+   def __iter__(self):
+      """ Iterate over options in processing order.  complete() must be called for each. """
+      while self.hasReady():
+         option = self.nextReady()
+         if option is not None:
+            yield option
+
+
+class OutputRouter(object):
+   """
+   File-like object that sends output written from a thread with a registered buffer
+   to that buffer and all other output to the wrapped stream.
+   """
+   def __init__(self, stream):
+      self.stream = stream
+      self.buffers = {}          # thread -> StringIO
+
+   def setBuffer(self, buffer):
+      if buffer is None:
+         self.buffers.pop(threading.currentThread(), None)
+      else:
+         self.buffers[threading.currentThread()] = buffer
+
+   def _current(self):
+      return self.buffers.get(threading.currentThread(), self.stream)
+
+   def write(self, text):
+      self._current().write(text)
+
+   def writelines(self, lines):
+      for l in lines:
+         self.write(l)
+
+   def flush(self):
+      self.stream.flush()
+
+   # The print statement keeps its state in softspace so it must follow the destination
+   def _getSoftspace(self):
+      return getattr(self._current(), "softspace", 0)
+   def _setSoftspace(self, value):
+      self._current().softspace = value
+   softspace = property(_getSoftspace, _setSoftspace)
+
+   def __getattr__(self, name):
+      return getattr(self.stream, name)
+
+
+_workerState = threading.local()   # calls: queue of the runParallel() serving the worker thread
+
+def callInMainThread(func, *args, **kw):
+   """
+   Call func in the thread that runs runParallel() and return its result.  SCons installs
+   signal handlers whenever it builds something (configure tests included), which only works
+   in the main thread.  Outside of the worker threads func is simply called.
+   """
+   calls = getattr(_workerState, "calls", None)
+   if calls is None:
+      return func(*args, **kw)
+   reply = Queue.Queue()
+   calls.put(("call", (func, args, kw, _workerState.buffer, reply)))
+   (result, exc_info) = reply.get()
+   if exc_info is not None:
+      raise exc_info[0], exc_info[1], exc_info[2]
+   return result
+
+def runParallel(scheduler, processFunc, jobs):
+   """
+   Process the options handed out by scheduler using a pool of jobs worker threads.
+   processFunc(option) is called from the worker threads.  The output of each option is
+   buffered and written out in declaration order so the log reads the same as a serial run.
+   Calls the workers make through callInMainThread() are run by the calling thread.
+   The first exception raised while processing an option is re-raised in the calling thread
+   once the options already handed out are done.
+
+   SCons configure contexts only run in the main thread, so every check an option makes
+   through callInMainThread() (TryCompile, TryLink, ...) is still run one at a time, with
+   Options.sconsLock held for the whole context.  Only the work in the option itself, such
+   as running *-config scripts or flagpoll, overlaps between the workers.
+
+   sys.stdout is replaced for the whole process until all the workers are done.  Output of
+   the workers and of the calls they hand to the calling thread is buffered until the
+   option is reported, while output from any other thread goes straight to the original
+   stream.  sys.stdout is restored even when setting up the workers fails.
+   """
+   work_queue = Queue.Queue()
+   done_queue = Queue.Queue()
+   saved_stdout = sys.stdout
+   router = OutputRouter(saved_stdout)
+
+   def worker():
+      _workerState.calls = done_queue
+      while True:
+         option = work_queue.get()
+         if option is None:
+            return
+         buf = StringIO.StringIO()
+         router.setBuffer(buf)
+         _workerState.buffer = buf
+         try:
+            try:
+               processFunc(option)
+               done_queue.put(("done", (option, buf.getvalue(), None)))
+            except:
+               done_queue.put(("done", (option, buf.getvalue(), sys.exc_info())))
+         finally:
+            router.setBuffer(None)
+
+   def serveCall(func, args, kw, buf, reply):
+      router.setBuffer(buf)      # Output goes with the output of the calling worker
+      try:
+         try:
+            reply.put((func(*args, **kw), None))
+         except:
+            reply.put((None, sys.exc_info()))
+      finally:
+         router.setBuffer(None)
+
+   workers = []
+   outputs = {}            # declaration index -> buffered output
+   next_flush = [0]
+
+   def flushOutput():
+      while next_flush[0] < len(scheduler.options):
+         i = next_flush[0]
+         if outputs.has_key(i):
+            router.stream.write(outputs.pop(i))
+         elif not scheduler.isSkipped(scheduler.options[i]):
+            break
+         next_flush[0] += 1
+
+   try:
+      sys.stdout = router
+      for i in range(jobs):
+         t = threading.Thread(target=worker, name="OptionWorker-%d" % i)
+         t.setDaemon(True)
+         t.start()
+         workers.append(t)
+      running = 0
+      failure = None
+      while True:
+         while failure is None and scheduler.hasReady(running):
+            option = scheduler.nextReady()
+            if option is not None:
+               work_queue.put(option)
+               running += 1
+         if 0 == running:
+            break
+         (kind, msg) = done_queue.get()
+         if "call" == kind:
+            serveCall(*msg)
+            continue
+         (option, output, exc_info) = msg
+         running -= 1
+         if failure is not None:
+            continue             # Only waiting for the running options to finish
+         outputs[scheduler.index[id(option)]] = output
+         if exc_info is not None:
+            flushOutput()
+            router.stream.write(outputs.pop(scheduler.index[id(option)], ""))
+            failure = exc_info
+            continue
+         scheduler.complete(option)
+         flushOutput()
+      if failure is not None:
+         raise failure[0], failure[1], failure[2]
+      flushOutput()
+   finally:
+      sys.stdout = saved_stdout
+      for t in workers:
+         work_queue.put(None)
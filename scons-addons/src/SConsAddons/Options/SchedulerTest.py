@@ -0,0 +1,192 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import threading
+import StringIO
+import time
+import sys
+
+import SCons.Errors
+import SConsAddons.Options.Scheduler as Scheduler
+
+
+class Opt:
+    """ Option as far as the scheduler is concerned. """
+    def __init__(self, name, dependencies=None, available=True, required=False):
+        self.name = name
+        self.dependencies = dependencies or []
+        self.available = available
+        self.required = required
+        self.processable = True
+    def isAvailable(self):
+        return self.available
+    def canProcess(self):
+        return self.processable
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def _run(self, scheduler):
+        """ Return the names of the options in the order scheduler hands them out. """
+        names = []
+        for o in scheduler:
+            names.append(o.name)
+            scheduler.complete(o)
+        return names
+
+    def test_dependencyOrder(self):
+        """Test that options are processed after their dependencies"""
+        a = Opt("a")
+        b = Opt("b", [a])
+        c = Opt("c", [b, a])
+        d = Opt("d")
+        # Ready options are taken in declaration order
+        assert self._run(Scheduler.OptionScheduler([c, b, a, d])) == ["a", "b", "c", "d"]
+
+    def test_skipUnavailable(self):
+        """Test that options depending on unavailable options are skipped"""
+        a = Opt("a", available=False)
+        b = Opt("b", [a])
+        c = Opt("c", [b])
+        d = Opt("d")
+        scheduler = Scheduler.OptionScheduler([a, b, c, d])
+        assert self._run(scheduler) == ["a", "d"]
+        assert [o.name for (o, reason) in scheduler.skipped] == ["b", "c"]
+        assert scheduler.isSkipped(c)
+        assert not scheduler.isSkipped(d)
+
+    def test_externalDependency(self):
+        """Test options depending on options that are not scheduled"""
+        missing = Opt("missing", available=False)
+        present = Opt("present")
+        a = Opt("a", [missing])
+        b = Opt("b", [present])
+        scheduler = Scheduler.OptionScheduler([a, b])
+        assert self._run(scheduler) == ["b"]
+        assert scheduler.skipped[0][1].find("missing") >= 0, scheduler.skipped
+
+    def test_cycle(self):
+        """Test that dependency cycles are reported"""
+        a = Opt("a")
+        b = Opt("b", [a])
+        a.dependencies.append(b)
+        assert [o.name for o in Scheduler.findCycle([a, b])] in (["a", "b", "a"], ["b", "a", "b"])
+        try:
+            Scheduler.OptionScheduler([Opt("c"), a, b])
+        except SCons.Errors.UserError:
+            pass
+        else:
+            assert False, "cycle was not reported"
+
+    def test_requiredFirstPolicy(self):
+        """Test that required options and their dependencies go first"""
+        a = Opt("a")
+        b = Opt("b")
+        c = Opt("c", [b], required=True)
+        options = [a, b, c]
+        scheduler = Scheduler.OptionScheduler(options, Scheduler.RequiredFirstPolicy(options))
+        assert self._run(scheduler) == ["b", "c", "a"]
+
+    def test_canProcess(self):
+        """Test that options that can not be processed yet are retried"""
+        a = Opt("a")
+        b = Opt("b")
+        a.processable = False
+        scheduler = Scheduler.OptionScheduler([a, b])
+        names = []
+        for o in scheduler:
+            names.append(o.name)
+            a.processable = True
+            scheduler.complete(o)
+        assert names == ["b", "a"], names
+        a = Opt("a")
+        a.processable = False
+        scheduler = Scheduler.OptionScheduler([a])
+        assert self._run(scheduler) == []
+        assert scheduler.isSkipped(a)
+
+    def _runParallel(self, options, processFunc, jobs=3):
+        saved = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            out = sys.stdout
+            Scheduler.runParallel(Scheduler.OptionScheduler(options), processFunc, jobs)
+        finally:
+            sys.stdout = saved
+        return out.getvalue()
+
+    def test_runParallel(self):
+        """Test that the output of parallel processing is in declaration order"""
+        options = [Opt("a"), Opt("b"), Opt("c")]
+        options.append(Opt("d", [options[0]]))
+        def process(option):
+            # The first options finish last
+            time.sleep({"a":0.2, "b":0.1}.get(option.name, 0))
+            print "processing %s" % option.name
+        output = self._runParallel(options, process)
+        assert output == "processing a\nprocessing b\nprocessing c\nprocessing d\n", output
+
+    def test_runParallelFailure(self):
+        """Test that the first failure is raised once the running options are done"""
+        done = []
+        def process(option):
+            if "a" == option.name:
+                raise ValueError(option.name)
+            time.sleep(0.1)
+            done.append(option.name)
+        try:
+            self._runParallel([Opt("a"), Opt("b")], process)
+        except ValueError:
+            pass
+        else:
+            assert False, "failure was not raised"
+        assert done == ["b"], done
+
+    def test_runParallelRestoresStdout(self):
+        """Test that sys.stdout is restored when the workers can not be set up"""
+        out = sys.stdout
+        try:
+            Scheduler.runParallel(Scheduler.OptionScheduler([Opt("a")]), None, "two")
+        except TypeError:
+            pass
+        else:
+            assert False, "bad job count was accepted"
+        assert sys.stdout is out
+
+    def test_callInMainThread(self):
+        """Test that calls from worker threads are run in the main thread"""
+        threads = {}
+        def process(option):
+            threads[option.name] = (threading.currentThread(),
+                                    Scheduler.callInMainThread(threading.currentThread))
+        self._runParallel([Opt("a"), Opt("b")], process, 2)
+        main = threading.currentThread()
+        for (worker, called) in threads.values():
+            assert worker is not main
+            assert called is main
+        assert Scheduler.callInMainThread(threading.currentThread) is main
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(SchedulerTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -0,0 +1,138 @@
+"""SConsAddons.Options.Transcript
+
+Transcripts record everything options find out about the host while they are
+processed: the output of config commands, flagpoll and pkg-config answers,
+configure check results and the file tests the options make (see
+SConsAddons.Util.probe).  Replaying a transcript answers all of these from the
+recording without running or reading anything, so a build node that lacks the
+real tools configures exactly like the machine the transcript was recorded on.
+Queries the recording has no answer for are answered negatively and reported.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import types, copy, threading
+import SConsAddons.Util as sca_util
+import CacheFile
+import ResultCache
+import CheckCache
+
+TRANSCRIPT_VERSION = 1
+
+RECORD = "record"
+REPLAY = "replay"
+
+# The transcript in use, if any
+activeTranscript = None
+
+
+def activate(transcript):
+   """ Record probes to (or answer them from) transcript from now on. """
+   global activeTranscript
+   activeTranscript = transcript
+   sca_util.setProbeHandler(transcript.answer)
+
+def deactivate():
+   global activeTranscript
+   activeTranscript = None
+   sca_util.setProbeHandler(None)
+
+def describe(kind, key):
+   """ Return a readable description of a probe. """
+   if "command" == kind:
+      return "command: %s" % " ".join(key[0])
+   if "check" == kind:
+      return "check: %s%s" % (key[0], key[1])
+   return "%s: %s" % (kind, key)
+
+
+class Transcript(object):
+   """ The answers to the probes of one run. """
+   label = "replayed"
+
+   def __init__(self, mode):
+      self.mode = mode
+      self.entries = {}        # (kind, key) -> answer
+      self.missing = []        # (kind, key) of the probes without answer when replaying
+      self._lock = threading.Lock()
+
+   def answer(self, kind, key, compute, missing=None):
+      """ Probe handler (see SConsAddons.Util.setProbeHandler). """
+      entry = (kind, key)
+      if REPLAY == self.mode:
+         self._lock.acquire()
+         try:
+            if self.entries.has_key(entry):
+               # Callers may modify what they get back
+               return copy.deepcopy(self.entries[entry])
+            if entry not in self.missing:
+               self.missing.append(entry)
+            return missing
+         finally:
+            self._lock.release()
+
+      value = compute()
+      self._lock.acquire()
+      try:
+         self.entries[entry] = copy.deepcopy(value)
+      finally:
+         self._lock.release()
+      return value
+
+   # Configure checks (see CheckCache.CachedCheck)
+   def getKey(self, env, checkName, args, kw):
+      edict = env.Dictionary()
+      return (checkName, repr(tuple(ResultCache.canonical(list(args)))),
+              repr(ResultCache.canonical(kw)),
+              repr([(v, ResultCache.canonical(edict.get(v))) for v in CheckCache.keyVars]))
+
+   def lookup(self, key):
+      """ Return (found, result) for the check with the given key. """
+      if RECORD == self.mode:
+         return (False, None)
+      return (True, self.answer("check", key, None, False))
+
+   def store(self, key, result):
+      if RECORD == self.mode:
+         self.answer("check", key, lambda: result)
+
+   def getMissing(self):
+      """ Return the descriptions of the probes that had no answer. """
+      return [describe(kind, key) for (kind, key) in self.missing]
+
+   def save(self, filename):
+      CacheFile.save(filename, {"version":TRANSCRIPT_VERSION, "entries":self.entries})
+
+   def load(filename):
+      """ Return the transcript stored in filename for replaying.  Raises
+          CacheFile.CacheFileError if the file does not exist or can not be used.
+      """
+      data = CacheFile.load(filename, legacy=False)
+      if data is None:
+         raise CacheFile.CacheFileError("file does not exist")
+      if type(data) is not types.DictType or data.get("version") != TRANSCRIPT_VERSION:
+         raise CacheFile.CacheFileError("unsupported transcript version")
+      transcript = Transcript(REPLAY)
+      transcript.entries = data.get("entries", {})
+      return transcript
+   load = staticmethod(load)
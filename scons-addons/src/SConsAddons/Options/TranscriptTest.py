@@ -0,0 +1,129 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SCons.Environment
+import SCons.Node.FS
+import SCons.SConf
+import SConsAddons.Options as Options
+import SConsAddons.Options.CacheFile as CacheFile
+import SConsAddons.Options.Transcript as Transcript
+import SConsAddons.Util as sca_util
+
+
+class ConfigOption(Options.PackageOption):
+    """ Package option that is found by running its config command. """
+    def __init__(self, name, configCmd):
+        Options.PackageOption.__init__(self, name, [name + "_config"], "help")
+        self.configCmd = configCmd
+        self.libs = None
+
+    def validate(self, env):
+        self.available = False
+        if sca_util.isFile(self.configCmd):
+            result = sca_util.runCommand([self.configCmd, "--libs"])
+            self.libs = result.output.split()
+            self.available = result.succeeded()
+
+    def getSettings(self):
+        return []
+
+
+class TranscriptTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        # Start with a new file system, SCons keeps the first one it makes for good
+        SCons.Node.FS.default_fs = None
+        SCons.SConf.SConfFS = None
+        self.env = SCons.Environment.Environment()
+
+    def tearDown(self):
+        Transcript.deactivate()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_answer(self):
+        """Test recording answers and replaying them"""
+        transcript = Transcript.Transcript(Transcript.RECORD)
+        assert transcript.answer("isfile", "/a", lambda: True) is True
+        assert transcript.answer("listdir", "/b", lambda: ["x"]) == ["x"]
+        transcript.save("probes.transcript")
+        transcript = Transcript.Transcript.load("probes.transcript")
+        assert transcript.answer("isfile", "/a", None) is True
+        # Callers can change the answers they get
+        transcript.answer("listdir", "/b", None).append("y")
+        assert transcript.answer("listdir", "/b", None) == ["x"]
+        assert transcript.answer("isfile", "/c", None, False) is False
+        assert transcript.getMissing() == ["isfile: /c"]
+
+    def test_load(self):
+        """Test that unusable transcripts are rejected"""
+        for contents in (None, "not a transcript"):
+            if contents is not None:
+                CacheFile.save("probes.transcript", contents)
+            try:
+                Transcript.Transcript.load("probes.transcript")
+            except CacheFile.CacheFileError:
+                pass
+            else:
+                assert False, "transcript %r was loaded" % contents
+
+    def test_recordReplay(self):
+        """Test that replaying configures like the recording without probing the host"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        log = os.path.join(self.tmpdir, "log")
+        script = os.path.join(self.tmpdir, "foo-config")
+        fh = open(script, "w")
+        fh.write('#!/bin/sh\necho "$@" >> %s\necho "-lfoo -lbar"\n' % log)
+        fh.close()
+        os.chmod(script, 0755)
+
+        def process(mode):
+            opts = Options.Options()
+            opts.AddOption(ConfigOption("Foo", script))
+            opts.AddOption(Options.StandardPackageOption("Stdio", "help", header="stdio.h"))
+            getattr(opts, mode)("probes.transcript")
+            opts.Process(self.env)
+            return opts.options
+        options = process("RecordTranscript")
+        assert [o.isAvailable() for o in options] == [True, True]
+        os.remove(script)
+        os.remove(log)
+        options = process("ReplayTranscript")
+        assert [o.isAvailable() for o in options] == [True, True]
+        assert options[0].libs == ["-lfoo", "-lbar"]
+        assert not os.path.exists(log)
+        assert sca_util.runCommand([script]).status is None
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TranscriptTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -98,17 +98,17 @@ class JugglerCommon(SConsAddons.Options.PackageOption):
       
       # Find cmd-config and call it to get the other arguments
       sys.stdout.write("searching...\n")
-      self.configCmdFullPath = WhereIs(self.configCmdName)
+      self.configCmdFullPath = sca_util.whereIs(self.configCmdName)
       if None == self.configCmdFullPath:
          self.checkRequired("   could not find %s."%self.configCmdName)
       else:
          sys.stdout.write("   found %s.\n"%self.configCmdName)
-         found_ver_str = os.popen(self.configCmdFullPath + " --version").read().strip()
+         found_ver_str = sca_util.readCommand([self.configCmdFullPath, "--version"])
          sys.stdout.write("   version:%s"%found_ver_str)
          
          # find base dir
-         self.baseDir = os.popen(self.configCmdFullPath + " --prefix").read().strip()
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = sca_util.readCommand([self.configCmdFullPath, "--prefix"])
+         if not sca_util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"% self.baseDir)
             self.baseDir = None
          else:
@@ -120,18 +120,18 @@ class JugglerCommon(SConsAddons.Options.PackageOption):
       # Check that an include file: include/vpr/vprConfig.h  exists
       # Update the temps for later usage
       passed = True;
-      if not os.path.isdir(self.baseDir):
+      if not sca_util.isDir(self.baseDir):
          passed = False
          self.checkRequired("vrj base dir does not exist:%s"%self.baseDir)
       
       # If we have the -config command to help out
-      have_config_cmd = os.path.isfile(self.configCmdFullPath)
+      have_config_cmd = sca_util.isFile(self.configCmdFullPath)
       if not have_config_cmd:
          print "Can not find: %s.  Attempting to limp along."%(self.configCmdName)         
          
       # Check version requirement
       if have_config_cmd:         
-         found_ver_str = os.popen(self.configCmdFullPath + " --version").read().strip()
+         found_ver_str = sca_util.readCommand([self.configCmdFullPath, "--version"])
          req_ver = [int(n) for n in self.requiredVersion.split(".")]
          found_ver = [int(n) for n in found_ver_str.split(".")]
          if found_ver < req_ver:
@@ -145,7 +145,7 @@ class JugglerCommon(SConsAddons.Options.PackageOption):
       # Set of files to check for
       for f in self.filesToCheckRelBase:
          check_file = pj(self.baseDir, f)
-         if not os.path.isfile(check_file):
+         if not sca_util.isFile(check_file):
             passed = False
             self.checkRequired("%s not found:%s"%(f,check_file))
          
@@ -171,10 +171,10 @@ class JugglerCommon(SConsAddons.Options.PackageOption):
          link_from_lib_re = re.compile(r'(?: |^)(-[^lL]\S*)', re.MULTILINE)
          
          # Returns lists of the options we want
-         self.found_incs = inc_re.findall(os.popen(self.configCmdFullPath + " --includes").read().strip())
-         self.found_libs = lib_re.findall(os.popen(self.configCmdFullPath + " --libs --extra-libs").read().strip())
-         self.found_lib_paths = lib_path_re.findall(os.popen(self.configCmdFullPath + " --libs --extra-libs").read().strip())
-         self.found_link_from_libs = link_from_lib_re.findall(os.popen(self.configCmdFullPath + " --extra-libs").read().strip())
+         self.found_incs = inc_re.findall(sca_util.readCommand([self.configCmdFullPath, "--includes"]))
+         self.found_libs = lib_re.findall(sca_util.readCommand([self.configCmdFullPath, "--libs", "--extra-libs"]))
+         self.found_lib_paths = lib_path_re.findall(sca_util.readCommand([self.configCmdFullPath, "--libs", "--extra-libs"]))
+         self.found_link_from_libs = link_from_lib_re.findall(sca_util.readCommand([self.configCmdFullPath, "--extra-libs"]))
       
       else:
          # Just guess
@@ -207,6 +207,28 @@ class JugglerCommon(SConsAddons.Options.PackageOption):
       if self.found_link_from_libs:
          env.AppendUnique(LINKFLAGS = self.found_link_from_libs)
    
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      queries = []
+      if base_dir:
+         cmd = pj(base_dir, 'bin', self.configCmdName)
+         queries.extend([pj(base_dir, f) for f in self.filesToCheckRelBase])
+      else:
+         cmd = WhereIs(self.configCmdName)
+         if not cmd:
+            return []
+         queries.append([cmd, "--prefix"])
+      for args in (["--version"], ["--includes"], ["--libs", "--extra-libs"], ["--extra-libs"]):
+         queries.append([cmd] + args)
+      return queries
+
+   def getCacheDependencies(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if not base_dir:
+         return [WhereIs(self.configCmdName)]
+      return [pj(base_dir, 'bin', self.configCmdName)] + \
+             [pj(base_dir, f) for f in self.filesToCheckRelBase]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
    
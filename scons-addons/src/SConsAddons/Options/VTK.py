@@ -28,6 +28,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment   # Get the environment crap
 import SCons
 import SConsAddons.Options   # Get the modular options stuff
+import SConsAddons.Util
 import SCons.Util
 import sys
 import os
@@ -114,12 +115,12 @@ class VTK(SConsAddons.Options.PackageOption):
          self.checkRequired("VTK base dir (VtkBaseDir) was not specified")
          return
 
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          self.checkRequired("VTK base dir %s does not exist" % self.baseDir)
          return
          
       vtk_version_file = pj(self.baseDir, 'include', self.vtkVersion, 'vtkConfigure.h')
-      if not os.path.isfile(vtk_version_file):
+      if not SConsAddons.Util.isFile(vtk_version_file):
          self.checkRequired("%s not found" % vtk_version_file)
          return
       else:
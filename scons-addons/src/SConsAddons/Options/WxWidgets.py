@@ -34,8 +34,8 @@ import sys, os, re, string
 from SCons.Util import WhereIs
 pj = os.path.join
 
-import SCons.SConf
-Configure = SCons.SConf.SConf     # Use same alias as SConsctruct sees
+import SConsAddons.Options.Checks as Checks
+Configure = SConsAddons.Options.Configure    # Holds the SCons lock while the context is open
 
 
 class WxWidgets(SConsAddons.Options.PackageOption):
@@ -94,18 +94,18 @@ class WxWidgets(SConsAddons.Options.PackageOption):
       
       # Find cppunit-config and call it to get the other arguments
       sys.stdout.write("searching...\n");
-      self.wxwidgetsconfig_cmd = WhereIs('wx-config');
+      self.wxwidgetsconfig_cmd = SConsAddons.Util.whereIs('wx-config');
       if None == self.wxwidgetsconfig_cmd:
          self.checkRequired("   could not find wx-config. Use %s to specify it: Ex: %s=/usr/local"% 
                            (self.baseDirKey, self.baseDirKey) );
       else:
          sys.stdout.write("   found wx-config.\n");
-         found_ver_str = os.popen(self.wxwidgetsconfig_cmd + " --version").read().strip();
+         found_ver_str = SConsAddons.Util.readCommand([self.wxwidgetsconfig_cmd, "--version"]);
          sys.stdout.write("   version:%s"%found_ver_str);
          
          # find base dir
-         self.baseDir = os.popen(self.wxwidgetsconfig_cmd + " --prefix").read().strip();
-         if not os.path.isdir(self.baseDir):
+         self.baseDir = SConsAddons.Util.readCommand([self.wxwidgetsconfig_cmd, "--prefix"]);
+         if not SConsAddons.Util.isDir(self.baseDir):
             self.checkRequired("   returned directory does not exist:%s"% self.baseDir);
             self.baseDir = None;
          else:
@@ -121,11 +121,11 @@ class WxWidgets(SConsAddons.Options.PackageOption):
       if not self.baseDir:
          self.checkRequired("wxwidgets base dir not found");
          return
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          passed = False
          self.checkRequired("wxwidgets base dir does not exist:%s"%self.baseDir);
          return
-      has_config_cmd = os.path.isfile(self.wxwidgetsconfig_cmd)
+      has_config_cmd = SConsAddons.Util.isFile(self.wxwidgetsconfig_cmd)
       
       if not has_config_cmd:
          self.checkRequired("Can not find %s. "%self.wxwidgetsconfig_cmd);
@@ -155,15 +155,16 @@ class WxWidgets(SConsAddons.Options.PackageOption):
       conf_env = env.Clone()                # Make a copy of the env
       self.apply(conf_env)                  # Update it with the guessed values
       conf_ctxt = Configure(conf_env);
-      if not conf_ctxt.CheckCXXHeader(pj("wx", "setup.h")):
-         passed = False;
-         self.checkRequired("Can't compile with wx/wx.h");
-      if len(self.found_libs):
-         if not conf_ctxt.CheckLib(self.found_libs[0], autoadd=0):
-            passed = False
-            self.checkRequired("Can't compile with wx.")
-         
-      conf_ctxt.Finish()
+      try:
+         if not Checks.checkHeader(conf_ctxt, pj("wx", "setup.h")):
+            passed = False;
+            self.checkRequired("Can't compile with wx/wx.h");
+         if len(self.found_libs):
+            if not conf_ctxt.CheckLib(self.found_libs[0], autoadd=0):
+               passed = False
+               self.checkRequired("Can't compile with wx.")
+      finally:
+         conf_ctxt.Finish()
      
       # If we don't pass, then clear everything out
       if not passed:
@@ -198,6 +199,18 @@ class WxWidgets(SConsAddons.Options.PackageOption):
       if self.found_cxxflags:
          env.Append(CPPDEFINES = self.found_cxxflags)
 
+   def getPrefetchQueries(self, optDict):
+      base_dir = optDict.get(self.baseDirKey)
+      if base_dir:
+         cmd = pj(base_dir, 'bin', 'wx-config')
+         queries = []
+      else:
+         cmd = WhereIs('wx-config')
+         if not cmd:
+            return []
+         queries = [[cmd, "--prefix"]]
+      return queries + [[cmd, arg] for arg in ("--version", "--cxxflags", "--cflags", "--libs")]
+
    def getSettings(self):
       return [(self.baseDirKey, self.baseDir),]
 
@@ -28,6 +28,7 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import SCons.Environment   # Get the environment crap
 import SCons
 import SConsAddons.Options   # Get the modular options stuff
+import SConsAddons.Util
 import SCons.Util
 import sys
 import os
@@ -107,12 +108,12 @@ class Xerces(SConsAddons.Options.PackageOption):
          self.checkRequired("Xerces base dir (XercesBaseDir) was not specified")
          return
 
-      if not os.path.isdir(self.baseDir):
+      if not SConsAddons.Util.isDir(self.baseDir):
          self.checkRequired("Xerces base dir %s does not exist" % self.baseDir)
          return
          
       xerces_version_file = pj(self.baseDir,'include','xercesc','util','XercesVersion.hpp')
-      if not os.path.isfile(xerces_version_file):
+      if not SConsAddons.Util.isFile(xerces_version_file):
          self.checkRequired("%s not found" % xerces_version_file)
          return
       else:
@@ -40,4 +40,5 @@ __developer__ = "__DEVELOPER__"
 from SConsAddons.Options.Options import Option, OptionProxy, LocalUpdateOption, PackageOption, \
                                         StandardPackageOption, MultiNamePackageOption, \
                                         SimpleOption, BoolOption, SeparatorOption, ListOption, \
-                                        EnumOption, Options, OptionError
+                                        EnumOption, Options, OptionError, RequiredOptionsError, \
+                                        Configure
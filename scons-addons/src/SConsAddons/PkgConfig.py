@@ -0,0 +1,172 @@
+"""
+In process pkg-config.
+
+Builds an index of the .pc files in PKG_CONFIG_PATH and the system pkg-config
+directories once per process and resolves modules from it: variables,
+Requires, Requires.private and the --static closure are all evaluated in
+memory, so detecting many packages costs one directory sweep instead of a
+pkg-config launch per query.  The .pc format is read with the .fpc reader in
+SConsAddons.FlagPoll.
+"""
+
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import os, glob, threading
+import FlagPoll
+from Util import probe
+
+# Directories searched after PKG_CONFIG_PATH unless PKG_CONFIG_LIBDIR is set
+systemSearchDirs = ['/usr/lib/pkgconfig', '/usr/lib64/pkgconfig', '/usr/share/pkgconfig',
+                    '/usr/local/lib/pkgconfig', '/usr/local/lib64/pkgconfig',
+                    '/usr/local/share/pkgconfig']
+
+# Flags for these directories are left out, like pkg-config does
+systemIncludeDirs = ['/usr/include']
+systemLibDirs = ['/usr/lib', '/usr/lib64', '/lib', '/lib64']
+
+_indexes = {}              # search path -> FlagPoll.FpcIndex
+_lock = threading.Lock()
+
+
+def getSearchPath():
+   dirs = [d for d in os.environ.get("PKG_CONFIG_PATH", "").split(os.pathsep) if d]
+   libdir = os.environ.get("PKG_CONFIG_LIBDIR")
+   if libdir is not None:
+      dirs.extend([d for d in libdir.split(os.pathsep) if d])
+   else:
+      dirs.extend(systemSearchDirs)
+      dirs.extend(glob.glob('/usr/lib/*-linux-gnu*/pkgconfig'))
+   return tuple(dirs)
+
+def getIndex():
+   """ Return the index of the .pc files in the current search path.  It is only built once. """
+   search_path = getSearchPath()
+   _lock.acquire()
+   try:
+      index = _indexes.get(search_path)
+      if index is None:
+         index = FlagPoll.FpcIndex(search_path, ".pc")
+         _indexes[search_path] = index
+      return index
+   finally:
+      _lock.release()
+
+
+class Package(object):
+   """ The flags of a module and everything it requires. """
+   def __init__(self, path, version, cflags, libs, dependencies):
+      self.path = path
+      self.version = version
+      self.cflags = cflags
+      self.libs = libs
+      self.dependencies = dependencies
+
+   def getState(self):
+      """ Return the package as plain data.  Package(*state) creates it again. """
+      return (self.path, self.version, self.cflags, self.libs, self.dependencies)
+
+   def getIncludes(self):
+      return [t[2:] for t in self.cflags if t.startswith("-I")]
+
+   def getDefines(self):
+      return [t[2:] for t in self.cflags if t.startswith("-D")]
+
+   def getLibs(self):
+      return [t[2:] for t in self.libs if t.startswith("-l")]
+
+   def getLibPaths(self):
+      return [t[2:] for t in self.libs if t.startswith("-L")]
+
+   def getLinkFlags(self):
+      """ Return the flags in Libs that are neither libraries nor library paths. """
+      flags = []
+      for t in self.libs:
+         if not (t.startswith("-l") or t.startswith("-L")):
+            flags.append(t)
+      return flags
+
+   def getDependencies(self):
+      """ Return the .pc files the flags came from. """
+      return self.dependencies
+
+
+def _collect(closure, field, skip):
+   tokens = []
+   for f in closure:
+      tokens.extend(FlagPoll.token_re.findall(f.get(field)))
+   seen = {}
+   result = []
+   for t in tokens:
+      t = t.strip('"')
+      if t in skip or seen.has_key(t):
+         continue
+      seen[t] = True
+      result.append(t)
+   return result
+
+def resolve(moduleName, static=False, pcFile=None, op=None, version=None):
+   """
+   Return the Package for moduleName or None if there is no .pc file for it.
+   pcFile  - Use this .pc file instead of looking the module up.
+   static  - Include Requires.private and Libs.private in the libraries, like --static.
+   Raises FlagPoll.Unsupported if the module can not be resolved (missing requirements and such).
+   """
+   state = probe("pkgconfig", (moduleName, static, pcFile, op, version),
+                 lambda: _resolve(moduleName, static, pcFile, op, version))
+   if state is None:
+      return None
+   return Package(*state)
+
+def _resolve(moduleName, static, pcFile, op, version):
+   """ Return the state of the Package for moduleName or None. """
+   index = getIndex()
+   if pcFile:
+      pc = FlagPoll.readFpcFile(pcFile)
+   else:
+      pc = index.find(moduleName, op, version)
+   if pc is None:
+      return None
+
+   # The cflags of private requirements are always needed.  Their libraries only when static.
+   cflags_closure = FlagPoll.getClosure(index, pc, ("requires", "requires.private"))
+   if static:
+      libs_closure = cflags_closure
+   else:
+      libs_closure = FlagPoll.getClosure(index, pc, ("requires",))
+
+   allow_cflags = os.environ.has_key("PKG_CONFIG_ALLOW_SYSTEM_CFLAGS")
+   allow_libs = os.environ.has_key("PKG_CONFIG_ALLOW_SYSTEM_LIBS")
+   skip_cflags = {}
+   skip_libs = {}
+   if not allow_cflags:
+      for d in systemIncludeDirs:
+         skip_cflags["-I" + d] = True
+   if not allow_libs:
+      for d in systemLibDirs:
+         skip_libs["-L" + d] = True
+
+   cflags = _collect(cflags_closure, "cflags", skip_cflags)
+   libs = _collect(libs_closure, "libs", skip_libs)
+   if static:
+      libs.extend([t for t in _collect(libs_closure, "libs.private", skip_libs) if t not in libs])
+   return (pc.path, pc.getVersion(), cflags, libs, [f.path for f in cflags_closure])
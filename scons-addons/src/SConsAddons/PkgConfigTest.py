@@ -0,0 +1,105 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import SConsAddons.PkgConfig as PkgConfig
+import SConsAddons.FlagPoll as FlagPoll
+
+
+class PkgConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        # Each test has its own search path, the indexes are kept per search path
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_env = {}
+        for var in ("PKG_CONFIG_PATH", "PKG_CONFIG_LIBDIR"):
+            self.saved_env[var] = os.environ.get(var)
+        os.environ["PKG_CONFIG_PATH"] = self.tmpdir
+        os.environ["PKG_CONFIG_LIBDIR"] = ""
+        self._write("bar", "Version: 2.0\nCflags: -I/opt/bar/include -DBAR\n"
+                    "Libs: -L/opt/bar/lib -lbar\nLibs.private: -lbarextra\n")
+        self._write("baz", "Version: 1.0\nCflags: -I/opt/baz/include\nLibs: -lbaz\n")
+        self._write("foo", "prefix=/opt/foo\nVersion: 1.2.3\nRequires: bar >= 1.5\n"
+                    "Requires.private: baz\nCflags: -I${prefix}/include -I/usr/include\n"
+                    "Libs: -L${prefix}/lib -L/usr/lib -lfoo -Wl,--as-needed\n")
+
+    def tearDown(self):
+        for (var, value) in self.saved_env.items():
+            if value is None:
+                del os.environ[var]
+            else:
+                os.environ[var] = value
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name + ".pc")
+        fh = open(path, "w")
+        fh.write(text)
+        fh.close()
+        return path
+
+    def test_resolve(self):
+        """Test the flags of a module and its requirements"""
+        package = PkgConfig.resolve("foo")
+        assert package.version == "1.2.3"
+        # The cflags of private requirements are included, the system directories are not
+        assert package.getIncludes() == ["/opt/foo/include", "/opt/bar/include",
+                                         "/opt/baz/include"], package.getIncludes()
+        assert package.getDefines() == ["BAR"]
+        assert package.getLibs() == ["foo", "bar"], package.getLibs()
+        assert package.getLibPaths() == ["/opt/foo/lib", "/opt/bar/lib"], package.getLibPaths()
+        assert package.getLinkFlags() == ["-Wl,--as-needed"]
+
+    def test_static(self):
+        """Test that static linking adds the private libraries"""
+        package = PkgConfig.resolve("foo", static=True)
+        assert package.getLibs() == ["foo", "bar", "baz", "barextra"], package.getLibs()
+
+    def test_dependencies(self):
+        """Test that the dependencies are the .pc files of the closure"""
+        package = PkgConfig.resolve("foo")
+        deps = [os.path.basename(p) for p in package.getDependencies()]
+        deps.sort()
+        assert deps == ["bar.pc", "baz.pc", "foo.pc"], deps
+        assert PkgConfig.Package(*package.getState()).getDependencies() == package.getDependencies()
+
+    def test_notFound(self):
+        """Test modules that are missing or have missing requirements"""
+        assert PkgConfig.resolve("nosuch") is None
+        assert PkgConfig.resolve("foo", op=">=", version="2.0") is None
+        qux_pc = self._write("qux", "Version: 1.0\nRequires: nosuch\n")
+        try:
+            PkgConfig.resolve("qux", pcFile=qux_pc)
+        except FlagPoll.Unsupported:
+            pass
+        else:
+            assert False, "missing requirement was not reported"
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(PkgConfigTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
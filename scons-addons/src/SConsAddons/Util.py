@@ -32,6 +32,10 @@ __revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
 import os
 import sys
 import re
+import threading
+import time
+import subprocess
+import FlagPoll
 import distutils.util
 import string
 import SCons.Environment
@@ -134,8 +138,8 @@ def GetVersionFromHeader(name, header_file_path):
        Ex:
          res = GetVersionFromHeader('MY_PKG', '/path/to/my_pkg/Version.h')
    """
-   if os.path.exists(header_file_path):
-      ver_file_contents = file(header_file_path).read()
+   ver_file_contents = readFile(header_file_path)
+   if ver_file_contents is not None:
       major_ver_match = re.search(r'define\s+' + name + r'_VERSION_MAJOR\s+(\d+)',
                                   ver_file_contents)
       minor_ver_match = re.search(r'define\s+' + name + r'_VERSION_MINOR\s+(\d+)',
@@ -250,6 +254,326 @@ def getHeadersRecursive(tree_root):
    return getFilesRecursiveByExt(tree_root, ['.h','.hpp'])
 
 
+# -------------------- #
+# Probes
+# -------------------- #
+# Everything options find out about the host (command output, file tests, flagpoll
+# answers, ...) goes through probe() so a probe handler can record or answer it.
+# See SConsAddons.Options.Transcript.
+
+_probe_handler = None
+
+def setProbeHandler(handler):
+   """
+   Answer all probes with handler(kind, key, compute, missing) from now on.  The handler
+   returns compute() or an answer of its own, missing if it has none.  None removes it.
+   """
+   global _probe_handler
+   _probe_handler = handler
+
+def hasProbeHandler():
+   return _probe_handler is not None
+
+def probe(kind, key, compute, missing=None):
+   """
+   Return compute() unless the probe handler answers the probe.
+   kind - Kind of probe ("isfile", "command", ...).
+   key - Plain data identifying the probe among those of its kind.
+   missing - Answer to use when the handler has no answer.
+   """
+   handler = _probe_handler
+   if handler is None:
+      return compute()
+   return handler(kind, key, compute, missing)
+
+def isFile(path):
+   return probe("isfile", path, lambda: os.path.isfile(path), False)
+
+def isDir(path):
+   return probe("isdir", path, lambda: os.path.isdir(path), False)
+
+def pathExists(path):
+   return probe("exists", path, lambda: os.path.exists(path), False)
+
+def listDir(path):
+   """ Return the entries of directory path, [] if it can not be listed. """
+   def list_dir():
+      try:
+         return os.listdir(path)
+      except OSError:
+         return []
+   return probe("listdir", path, list_dir, [])
+
+def readFile(path):
+   """ Return the contents of the file at path or None if it can not be read. """
+   def read_file():
+      try:
+         fh = open(path)
+         try:
+            return fh.read()
+         finally:
+            fh.close()
+      except IOError:
+         return None
+   return probe("read", path, read_file)
+
+def whereIs(name, path=None, pathext=None):
+   """ SCons.Util.WhereIs as a probe. """
+   return probe("whereis", (name, path, pathext), lambda: WhereIs(name, path, pathext))
+
+
+# -------------------- #
+# Running commands
+# -------------------- #
+# All external probes (config scripts, flagpoll, compilers) are run through runCommand().
+# It runs argv lists without a shell, limits how long and how many commands run, runs
+# concurrent identical commands only once, and keeps a trace of everything that was run.
+# prefetchCommand() starts a command in the background ahead of the runCommand() that
+# needs its output.
+
+commandTimeout = 120          # Seconds a command may run before it is killed (None: no limit)
+if os.environ.has_key("SCONSADDONS_COMMAND_TIMEOUT"):
+   commandTimeout = float(os.environ["SCONSADDONS_COMMAND_TIMEOUT"]) or None
+maxConcurrentCommands = 8     # Number of commands that may run at the same time
+commandTraceFile = os.environ.get("SCONSADDONS_COMMAND_TRACE")   # File to log commands to
+
+commandTrace = []             # CommandResult of every command run
+_command_hooks = []           # Called with each CommandResult
+_command_slots = threading.Semaphore(maxConcurrentCommands)
+_command_lock = threading.Lock()
+_commands_running = {}        # key -> _RunningCommand, for coalescing identical commands
+_commands_prefetched = {}     # key -> CommandResult of commands started with prefetchCommand()
+
+class CommandResult:
+   """ Result of running a command through runCommand(). """
+   def __init__(self, argv, status, output, errors, duration, timedOut=False):
+      self.argv = argv
+      self.status = status          # Exit status, None if the command could not be started
+      self.output = output          # What the command wrote to stdout
+      self.errors = errors          # What the command wrote to stderr
+      self.duration = duration
+      self.timedOut = timedOut
+
+   def succeeded(self):
+      return 0 == self.status
+
+class _RunningCommand:
+   def __init__(self, prefetch=False):
+      self.done = threading.Event()
+      self.result = None
+      self.prefetch = prefetch      # If true, the result is kept for later runs of the command
+
+def setMaxConcurrentCommands(num):
+   """ Set the number of commands that may run at the same time. """
+   global maxConcurrentCommands, _command_slots
+   maxConcurrentCommands = num
+   _command_slots = threading.Semaphore(num)
+
+def addCommandHook(hook):
+   """ Call hook with the CommandResult of every command run from now on. """
+   _command_hooks.append(hook)
+
+def removeCommandHook(hook):
+   if hook in _command_hooks:
+      _command_hooks.remove(hook)
+
+def splitCommand(cmd):
+   """ Split a command line into an argv list.  Double quotes group words. """
+   return [a.strip('"') for a in re.findall(r'"[^"]*"|\S+', cmd)]
+
+def _killProcess(proc):
+   if hasattr(proc, "kill"):
+      proc.kill()
+   else:
+      import signal
+      os.kill(proc.pid, signal.SIGKILL)
+
+def _execute(argv, timeout, cwd, mergeStderr):
+   start = time.time()
+   timer = None
+   timed_out = []
+   if mergeStderr:
+      stderr = subprocess.STDOUT
+   else:
+      stderr = subprocess.PIPE
+   try:
+      proc = subprocess.Popen(argv, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=stderr)
+   except OSError, ex:
+      return CommandResult(argv, None, "", str(ex), time.time() - start)
+   if timeout:
+      def kill():
+         timed_out.append(True)
+         try:
+            _killProcess(proc)
+         except OSError:
+            pass
+      timer = threading.Timer(timeout, kill)
+      timer.start()
+   try:
+      (output, errors) = proc.communicate()
+   finally:
+      if timer is not None:
+         timer.cancel()
+   if timed_out:
+      print "Command timed out after %ss: %s" % (timeout, " ".join(argv))
+   return CommandResult(argv, proc.returncode, output or "", errors or "",
+                        time.time() - start, bool(timed_out))
+
+def _trace(result):
+   _command_lock.acquire()
+   try:
+      commandTrace.append(result)
+      if commandTraceFile:
+         try:
+            fh = open(commandTraceFile, "a")
+            try:
+               fh.write("%.3fs exit=%s%s %s\n" % (result.duration, result.status,
+                                                   (result.timedOut and " (timed out)") or "",
+                                                   " ".join(result.argv)))
+            finally:
+               fh.close()
+         except IOError:
+            pass
+   finally:
+      _command_lock.release()
+   for hook in _command_hooks[:]:
+      hook(result)
+
+def _commandKey(argv, cwd, mergeStderr):
+   if SCons.Util.is_String(argv):
+      argv = splitCommand(argv)
+   argv = [str(a) for a in argv]
+   return (argv, (tuple(argv), cwd, mergeStderr))
+
+def _runOwned(running, key, argv, timeout, cwd, mergeStderr):
+   """ Run the command registered as running under key and hand the result to its waiters. """
+   try:
+      slots = _command_slots
+      slots.acquire()
+      try:
+         running.result = _execute(argv, timeout, cwd, mergeStderr)
+      finally:
+         slots.release()
+   finally:
+      if running.result is None:
+         running.result = CommandResult(argv, None, "", "command failed", 0.0)
+      _command_lock.acquire()
+      try:
+         del _commands_running[key]
+         if running.prefetch:
+            _commands_prefetched[key] = running.result
+      finally:
+         _command_lock.release()
+      running.done.set()
+   _trace(running.result)
+
+def runCommand(argv, timeout=-1, cwd=None, mergeStderr=False):
+   """
+   Run argv (a list, or a string that is split with splitCommand) without a shell.
+   timeout - Seconds before the command is killed.  Defaults to commandTimeout.
+   cwd - Directory to run the command in.
+   mergeStderr - If true, stderr is part of the output.
+   Returns a CommandResult.  If the same command is already running in another thread,
+   waits for it and returns its result instead of running it again.  Commands started
+   with prefetchCommand() are not run again either.
+   """
+   if _probe_handler is None:
+      return _runCommand(argv, timeout, cwd, mergeStderr)
+   (argv, key) = _commandKey(argv, cwd, mergeStderr)
+   def run():
+      result = _runCommand(argv, timeout, cwd, mergeStderr)
+      return (result.status, result.output, result.errors, result.timedOut)
+   (status, output, errors, timed_out) = probe("command", key, run,
+                                               (None, "", "no answer for command", False))
+   return CommandResult(argv, status, output, errors, 0.0, timed_out)
+
+def _runCommand(argv, timeout, cwd, mergeStderr):
+   (argv, key) = _commandKey(argv, cwd, mergeStderr)
+   if -1 == timeout:
+      timeout = commandTimeout
+
+   _command_lock.acquire()
+   try:
+      result = _commands_prefetched.get(key)
+      running = _commands_running.get(key)
+      owner = result is None and running is None
+      if owner:
+         running = _RunningCommand()
+         _commands_running[key] = running
+   finally:
+      _command_lock.release()
+   if result is not None:
+      return result
+   if not owner:
+      running.done.wait()
+      return running.result
+
+   _runOwned(running, key, argv, timeout, cwd, mergeStderr)
+   return running.result
+
+def prefetchCommand(argv, cwd=None, mergeStderr=False):
+   """
+   Start running argv in the background.  runCommand() of the same command waits for
+   it (or returns its result right away if it is done) instead of running it again.
+   Returns false if the command was already prefetched or is running.
+   """
+   if _probe_handler is not None:
+      return False            # The command may not be run at all
+   (argv, key) = _commandKey(argv, cwd, mergeStderr)
+   _command_lock.acquire()
+   try:
+      if _commands_prefetched.has_key(key) or _commands_running.has_key(key):
+         return False
+      running = _RunningCommand(prefetch=True)
+      _commands_running[key] = running
+   finally:
+      _command_lock.release()
+
+   worker = threading.Thread(target=_runOwned,
+                             args=(running, key, argv, commandTimeout, cwd, mergeStderr))
+   worker.setDaemon(True)        # Never keep scons alive for a hint
+   worker.start()
+   return True
+
+def prefetchFiles(paths):
+   """ Stat paths in the background so checking them later does not wait on the disk. """
+   def statAll():
+      for p in paths:
+         try:
+            os.stat(p)
+         except OSError:
+            pass
+   worker = threading.Thread(target=statAll)
+   worker.setDaemon(True)
+   worker.start()
+
+def clearPrefetchedCommands():
+   """ Forget the results of prefetched commands so they are run again. """
+   _command_lock.acquire()
+   try:
+      _commands_prefetched.clear()
+   finally:
+      _command_lock.release()
+
+def readCommand(argv, **kw):
+   """ Run argv with runCommand and return its stripped output. """
+   return runCommand(argv, **kw).output.strip()
+
+
+# (config command, arg) -> results parsed from its output.  Shared by all ConfigCmdParsers.
+_config_cmd_results = {}
+_config_cmd_key_locks = {}
+_config_cmd_lock = threading.Lock()
+
+def clearConfigCmdCache():
+   """ Forget the output of all config commands run so far. """
+   _config_cmd_lock.acquire()
+   try:
+      _config_cmd_results.clear()
+   finally:
+      _config_cmd_lock.release()
+
 class ConfigCmdParser:
    """
    Helper class for calling a given *-config command and extracting
@@ -260,13 +584,14 @@ class ConfigCmdParser:
       " configCmd: The config command to call (python/flagpoll/etc)"
 
       self.configCmd = configCmd
+      self.configArgv = [configCmd]
       self.valid = True
       # Ensure that command is valid.
-      if not os.path.isfile(self.configCmd):
+      if not isFile(self.configCmd):
          self.valid = False
          raise ValueError("ConfigCmd not found: %s"%self.configCmd)
 
-      if configScript and not os.path.isfile(configScript):
+      if configScript and not isFile(configScript):
          self.valid = False
          raise ValueError("configScript not found: %s"%configScript)
 
@@ -274,6 +599,7 @@ class ConfigCmdParser:
       # contain both the interpreter command and script.
       if configScript:
          self.configCmd = configCmd + ' ' + configScript         
+         self.configArgv = [configCmd, configScript]
 
       # Initialize regular expressions
       # Res that when matched against config output should match the options we want
@@ -292,65 +618,70 @@ class ConfigCmdParser:
          self.lib_path_re = re.compile(r'(?: |^)-L(\S*)', re.MULTILINE)
          self.cxx_flags_re = re.compile(r'(?: |^)-D(\S*)', re.MULTILINE)
 
+   def _query(self, arg):
+      """ Return dict of everything parsed from the output of the command run with arg.
+          Each distinct (command, arg) is only run once per process.
+      """
+      key = (self.configCmd, arg.strip())
+      _config_cmd_lock.acquire()
+      try:
+         key_lock = _config_cmd_key_locks.setdefault(key, threading.Lock())
+      finally:
+         _config_cmd_lock.release()
+
+      # Concurrent queries for the same key wait for the one that runs the command
+      key_lock.acquire()
+      try:
+         result = _config_cmd_results.get(key)
+         if result is None:
+            output = readCommand(self.configArgv + splitCommand(arg))
+            result = {"output":output}
+            for (name, regex) in (("libs", self.lib_re), ("frameworks", self.framework_re),
+                                  ("lib_paths", self.lib_path_re), ("includes", self.inc_re),
+                                  ("cxx_flags", self.cxx_flags_re)):
+               result[name] = [os.path.expandvars(a) for a in regex.findall(output)]
+            _config_cmd_results[key] = result
+         return result
+      finally:
+         key_lock.release()
+
    def findLibs(self, arg="--libs"):
       if not self.valid:
          return ""
-
-      args = self.lib_re.findall(os.popen(self.configCmd + " " + arg).read().strip())
-      for i, arg in enumerate(args):
-         args[i] = os.path.expandvars(arg)
-
-      return args
+      return self._query(arg)["libs"][:]
 
    def findFrameworks(self, arg="--libs"):
       if not self.valid:
          return ""
-
-      args = self.framework_re.findall(os.popen(self.configCmd + " " + arg).read().strip())
-      for i, arg in enumerate(args):
-         args[i] = os.path.expandvars(arg)
-
-      return args
+      return self._query(arg)["frameworks"][:]
 
    def findLibPaths(self, arg="--libs"):
       if not self.valid:
          return ""
-
-      args = self.lib_path_re.findall(os.popen(self.configCmd + " " + arg).read().strip())
-      for i, arg in enumerate(args):
-         args[i] = os.path.expandvars(arg)
-
-      return args
+      return self._query(arg)["lib_paths"][:]
 
    def findIncludes(self, arg="--cflags"):
       if not self.valid:
          return ""
-
-      args = self.inc_re.findall(os.popen(self.configCmd + " " + arg).read().strip()) 
-      for i, arg in enumerate(args):
-         args[i] = os.path.expandvars(arg)
-
-      return args
+      return self._query(arg)["includes"][:]
 
    def findCXXFlags(self, arg="--cflags"):
       if not self.valid:
          return ""
-
-      args = self.cxx_flags_re.findall(os.popen(self.configCmd + " " + arg).read().strip())
-      for i, arg in enumerate(args):
-         args[i] = os.path.expandvars(arg)
-
-      return args
+      return self._query(arg)["cxx_flags"][:]
 
    def getVersion(self, arg="--version"):
       if not self.valid:
          return ""
-      return os.popen(self.configCmd + " " + arg).read().strip()
+      return self._query(arg)["output"]
 
 class PythonScriptParser(ConfigCmdParser):
    def __init__(self, configScript):
       ConfigCmdParser.__init__(self, sys.executable, configScript)
 
+# (module, fpc file, flags) -> answer.  Shared by all FlagPollParsers.
+_flagpoll_results = {}
+
 class FlagPollParser:
    """
    Helper class for calling flagpoll and extracting
@@ -365,25 +696,29 @@ class FlagPollParser:
          self.fpcFile = self.fpcFile.strip()
       self.valid = True
 
-      self.flagpoll_cmd = WhereIs('flagpoll')
-      if None == self.flagpoll_cmd:
-         print "FlagPollParser: Could not find flagpoll."
-         self.valid = False
-         return
-      if self.fpcFile is not None and not os.path.isfile(self.fpcFile):
+      # Queries are answered from the .fpc files directly when possible (see FlagPoll).
+      # flagpoll itself is only run for the ones that can not be answered that way.
+      flagpoll_path = whereIs('flagpoll')
+      self.haveFlagPoll = flagpoll_path is not None
+      if not self.haveFlagPoll:
+         flagpoll_path = 'flagpoll'
+      if self.fpcFile is not None and not isFile(self.fpcFile):
          print "FlagPollParser: Could not find fpc file:", self.fpcFile
          self.valid = False
          return
 
       # All calls to flagpoll need module name now.
+      self.flagpoll_argv = [flagpoll_path, self.moduleName]
       if 'win32' == GetPlatform():
-         self.flagpoll_cmd = '"%s" %s' % (self.flagpoll_cmd, self.moduleName)
+         self.flagpoll_cmd = '"%s" %s' % (flagpoll_path, self.moduleName)
       else:
-         self.flagpoll_cmd += " %s"%self.moduleName
+         self.flagpoll_cmd = "%s %s" % (flagpoll_path, self.moduleName)
 
       # Find out if the module exists.
       exists_resp = self.callFlagPoll("--exists")
       if "yes" != exists_resp.strip().lower():
+         if not self.haveFlagPoll:
+            print "FlagPollParser: Could not find flagpoll."
          self.valid = False
          return
 
@@ -445,19 +780,39 @@ class FlagPollParser:
    def callFlagPoll(self, cmdFlags):
       """ Return result of calling flagpoll.
           Checks for error state and outputs error and returns ''
+          Results are shared by all parsers for the rest of the process.
       """
-      if self.fpcFile is not None:
-         cmdFlags = "--from-file=%s %s" % (self.fpcFile.strip(), cmdFlags)
-
-      cur_cmd = "%s %s"%(self.flagpoll_cmd, cmdFlags)
-      #print "Calling: ", cur_cmd
-      cmd_call = os.popen(cur_cmd)
-      cmd_str = cmd_call.read().strip()
-      if None != cmd_call.close():
-         self.valid = False 
-         print "FlagPollParser: call failed: %s"%cur_cmd
+      key = (self.moduleName, self.fpcFile, cmdFlags.strip())
+      cmd_str = _flagpoll_results.get(key)
+      if cmd_str is not None:
+         return cmd_str
+
+      (succeeded, cmd_str) = probe("flagpoll", key, lambda: self._queryFlagPoll(cmdFlags),
+                                   (False, ""))
+      if not succeeded:
+         self.valid = False
+         return cmd_str
+      _flagpoll_results[key] = cmd_str
       return cmd_str
 
+   def _queryFlagPoll(self, cmdFlags):
+      """ Return (succeeded, answer) for cmdFlags. """
+      try:
+         return (True, FlagPoll.query(self.moduleName, self.fpcFile, cmdFlags))
+      except (FlagPoll.Unsupported, IOError, OSError):
+         pass
+      if not self.haveFlagPoll:
+         return (False, '')
+      argv = self.flagpoll_argv[:]
+      if self.fpcFile is not None:
+         argv.append("--from-file=%s" % self.fpcFile.strip())
+      argv.extend(splitCommand(cmdFlags))
+
+      result = runCommand(argv)
+      if not result.succeeded():
+         print "FlagPollParser: call failed: %s"%" ".join(argv)
+      return (result.succeeded(), result.output.strip())
+
 
 
 # -------------------- #
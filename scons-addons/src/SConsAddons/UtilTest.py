@@ -0,0 +1,184 @@
+#
+# __COPYRIGHT__
+#
+# This file is part of scons-addons.
+#
+# Scons-addons is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Scons-addons is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with scons-addons; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+__revision__ = "__FILE__ __REVISION__ __DATE__ __DEVELOPER__"
+
+import unittest
+import tempfile
+import shutil
+import threading
+import time
+import sys
+import os
+
+import SConsAddons.Util as sca_util
+
+
+class UtilTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, "log")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _script(self, name, body):
+        """ Write a shell script that logs its arguments and then runs body. """
+        path = os.path.join(self.tmpdir, name)
+        fh = open(path, "w")
+        fh.write('#!/bin/sh\necho "$@" >> %s\n%s\n' % (self.log, body))
+        fh.close()
+        os.chmod(path, 0755)
+        return path
+
+    def _calls(self):
+        if not os.path.exists(self.log):
+            return []
+        return open(self.log).read().splitlines()
+
+    def test_configCmdParser(self):
+        """Test that each argument is run once and parsed into every category"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("foo-config", """case "$1" in
+  --cflags) echo "-I/opt/foo/include -DFOO=1 -I/opt/bar/include" ;;
+  --libs) echo "-L/opt/foo/lib -lfoo -framework Foo -lbar" ;;
+  --version) echo "1.2.3" ;;
+esac""")
+        parser = sca_util.ConfigCmdParser(script)
+        assert parser.findIncludes() == ["/opt/foo/include", "/opt/bar/include"]
+        assert parser.findCXXFlags() == ["FOO=1"]
+        assert parser.findLibs() == ["foo", "bar"]
+        assert parser.findLibPaths() == ["/opt/foo/lib"]
+        assert parser.findFrameworks() == ["Foo"]
+        assert parser.getVersion() == "1.2.3"
+        # Other parsers of the same command share the results
+        assert sca_util.ConfigCmdParser(script).findLibs("--libs ") == ["foo", "bar"]
+        calls = self._calls()
+        calls.sort()
+        assert calls == ["--cflags", "--libs", "--version"], calls
+        # The results are copies
+        parser.findLibs().append("other")
+        assert parser.findLibs() == ["foo", "bar"]
+
+    def test_configCmdParserMissing(self):
+        """Test that missing config commands are rejected"""
+        try:
+            sca_util.ConfigCmdParser(os.path.join(self.tmpdir, "nosuch-config"))
+        except ValueError:
+            pass
+        else:
+            assert False, "missing command was accepted"
+
+    def test_clearConfigCmdCache(self):
+        """Test that config commands run again once the cache is cleared"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("bar-config", 'echo "-lbar"')
+        assert sca_util.ConfigCmdParser(script).findLibs() == ["bar"]
+        sca_util.clearConfigCmdCache()
+        assert sca_util.ConfigCmdParser(script).findLibs() == ["bar"]
+        assert self._calls() == ["--libs", "--libs"]
+
+    def test_runCommand(self):
+        """Test running commands and collecting their output"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("cmd", 'echo "out $PWD"; echo err >&2; exit 3')
+        result = sca_util.runCommand([script, "a b"], cwd=self.tmpdir)
+        assert result.status == 3 and not result.succeeded()
+        assert result.output == "out %s\n" % os.path.realpath(self.tmpdir), result.output
+        assert result.errors == "err\n"
+        result = sca_util.runCommand('%s "a b" c' % script, mergeStderr=True)
+        assert result.output.find("err") >= 0, result.output
+        assert self._calls() == ["a b", "a b c"], self._calls()
+        assert sca_util.readCommand([script]).startswith("out")
+
+    def test_runCommandMissing(self):
+        """Test that commands that can not be started have no status"""
+        result = sca_util.runCommand([os.path.join(self.tmpdir, "nosuch")])
+        assert result.status is None and not result.succeeded()
+        assert result.output == ""
+
+    def test_runCommandTimeout(self):
+        """Test that commands are killed when they run too long"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("slow", "exec sleep 10")
+        start = time.time()
+        result = sca_util.runCommand([script], timeout=0.5)
+        assert result.timedOut and not result.succeeded()
+        assert time.time() - start < 5
+
+    def test_runCommandCoalescing(self):
+        """Test that identical commands running at the same time are only run once"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("once", "sleep 0.5; echo done")
+        results = []
+        def run():
+            results.append(sca_util.runCommand([script, "x"]))
+        threads = [threading.Thread(target=run) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert [r.output for r in results] == ["done\n"] * 3
+        assert self._calls() == ["x"], self._calls()
+        # Commands run again once they are done
+        sca_util.runCommand([script, "x"])
+        assert self._calls() == ["x", "x"], self._calls()
+
+    def test_commandHook(self):
+        """Test that hooks and the trace see every command"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("hooked", "")
+        seen = []
+        hook = lambda result: seen.append(result.argv)
+        sca_util.addCommandHook(hook)
+        try:
+            sca_util.runCommand([script, "1"])
+        finally:
+            sca_util.removeCommandHook(hook)
+        sca_util.runCommand([script, "2"])
+        assert seen == [[script, "1"]], seen
+        assert sca_util.commandTrace[-1].argv == [script, "2"]
+
+    def test_prefetchCommand(self):
+        """Test that prefetched commands are not run again"""
+        if "win32" == sca_util.GetPlatform():
+            return
+        script = self._script("prefetched", "sleep 0.2; echo result")
+        assert sca_util.prefetchCommand([script, "--libs"])
+        assert not sca_util.prefetchCommand([script, "--libs"])
+        # Waits for the prefetched command
+        assert sca_util.runCommand([script, "--libs"]).output == "result\n"
+        assert sca_util.runCommand([script, "--libs"]).output == "result\n"
+        assert self._calls() == ["--libs"], self._calls()
+        sca_util.clearPrefetchedCommands()
+        sca_util.runCommand([script, "--libs"])
+        assert self._calls() == ["--libs", "--libs"], self._calls()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(UtilTestCase, 'test_')
+    if not unittest.TextTestRunner().run(suite).wasSuccessful():
+        sys.exit(1)
@@ -84,11 +84,13 @@ class VariantsHelper(object):
       else:
          self.variants["arch"] = [["default"], True]
 
-   def iterate(self, vars, baseEnvBuilder, baseEnv=None):
+   def iterate(self, vars, baseEnvBuilder, baseEnv=None, options=None):
       """
          vars: locals() to use
          baseEnvBuilder: Environment builder to start with
          baseEnv: baseEnvironment to start with, if none, don't build environment
+         options: SConsAddons.Options object whose package options should be resolved
+                  for each variant.  Results are shared by all environments of a variant.
          
          Local variables exported:
             variant_pass: Iterates from 0 to number of combos            
@@ -161,6 +163,8 @@ class VariantsHelper(object):
          build_env = None
          if baseEnv:
             build_env = env_bldr.applyToEnvironment(baseEnv.Clone(), variant=combo)      
+            if options is not None:
+               options.ResolveVariant(build_env)
          
          # export the locals
          vars["variant_pass"] = variant_pass